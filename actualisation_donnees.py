@@ -8,45 +8,249 @@
 import tarfile
 import requests
 import pandas as pd
-import boto3
+from s3_client import get_s3_client, get_transfer_config
 from pathlib import Path
 import os
-from logger_write import log_memory_usage
+import sys
+import json
+import time
+import hashlib
+import multiprocessing
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from botocore.exceptions import ClientError
+from logger_write import log_memory_usage, get_peak_memory_mb
+from schema import to_jsonl
 
 # --------- CONFIGURATION ----------
-URL_TAR = "https://request.openradiation.net/openradiation_dataset.tar.gz" # URL pour récupérer le fichier compressé
+URL_TAR = os.environ.get("OPENRADIATION_URL", "https://request.openradiation.net/openradiation_dataset.tar.gz") # URL pour récupérer le fichier compressé
 LOCAL_DIR = Path("cache") # Dossier cache
 LOCAL_TAR = LOCAL_DIR / "openradiation_dataset.tar.gz" # Emplacement du fichier compressé
+PART_TAR = LOCAL_DIR / "openradiation_dataset.tar.gz.part" # Téléchargement en cours (repris s'il a été interrompu)
+PART_STATE_FILE = LOCAL_DIR / "openradiation_dataset.tar.gz.part.json" # Validateurs (ETag, Last-Modified) du téléchargement en cours
+DOWNLOAD_STATE_FILE = LOCAL_DIR / "download_state.json" # ETag, Last-Modified et empreinte du dernier fichier téléchargé
+UNCHANGED_FLAG = LOCAL_DIR / "unchanged.flag" # Indique à table_creation.py que rien n'a changé en amont
 JSON_FILE = LOCAL_DIR / "openradiation.jsonl" # Emplacement du fichier JSON
+PROFILE_FILE = LOCAL_DIR / "openradiation.profile.json" # Profil des colonnes du fichier JSON (types, valeurs manquantes)
+DELTA_FILE = LOCAL_DIR / "openradiation_delta.jsonl" # Nouvelles lignes seulement (mode incrémental)
 
 # AWS S3
 bucket_name = os.environ['S3_BUCKET_NAME'] # Le nom du bucket
 S3_OBJECT_NAME = "data/openradiation.jsonl" # Chemin pour mettre le fichier parquet dans le S3
+S3_PROFILE_NAME = "data/openradiation.profile.json" # Chemin du profil des colonnes dans le S3
+S3_DELTA_NAME = "data/openradiation_delta.jsonl" # Chemin des nouvelles lignes dans le S3 (mode incrémental)
+S3_MANIFEST_NAME = "data/manifest.json" # Manifeste de la dernière actualisation (date maximale, derniers reportUuid)
+S3_DOWNLOAD_STATE_NAME = "data/download_state.json" # État du dernier téléchargement traité jusqu'au bout
+
+# Téléchargement
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get("DOWNLOAD_CHUNK_SIZE", 1024 * 1024)) # Taille des morceaux lus sur le réseau
+DOWNLOAD_RETRIES = int(os.environ.get("DOWNLOAD_RETRIES", 5)) # Nombre de tentatives (avec reprise) en cas de coupure
+DOWNLOAD_TIMEOUT = int(os.environ.get("DOWNLOAD_TIMEOUT", 60)) # Délai maximal sans réponse du serveur (secondes)
+
+# Mode incrémental (seules les nouvelles mesures sont traitées et fusionnées avec les tables existantes)
+INCREMENTAL_MODE = os.environ.get("INCREMENTAL_MODE", "false").lower() == "true"
+LOOKBACK_DAYS = int(os.environ.get("LOOKBACK_DAYS", 3)) # Fenêtre de rattrapage des mesures arrivées en retard
+FULL_REFRESH_DAYS = int(os.environ.get("FULL_REFRESH_DAYS", 7)) # Actualisation complète au moins tous les N jours
+
+# Mode streaming (mémoire constante quelle que soit la taille du jeu de données)
+STREAMING_MODE = os.environ.get("STREAMING_MODE", "true").lower() == "true" # Lecture du CSV par morceaux
+STREAM_TARGET = os.environ.get("STREAM_TARGET", "disk") # "disk" (fichier local puis téléversement) ou "s3" (multipart direct)
+CHUNK_ROWS = int(os.environ.get("CHUNK_ROWS", 100_000)) # Nombre de lignes lues par morceau
+S3_PART_SIZE = 8 * 1024 * 1024 # Taille d'une partie du téléversement multipart (minimum 5 MB côté S3)
+
+# Conversion en JSON dans plusieurs processus (to_json garde le GIL : plusieurs fils ne convertissent pas plus vite)
+SERIALIZE_WORKERS = int(os.environ.get("SERIALIZE_WORKERS", os.cpu_count() or 1)) # 1 : conversion dans le processus principal
+
+# Types fixés pour que chaque morceau donne le même JSON que la lecture complète
+# (sinon une colonne entière sans valeur manquante dans un morceau devient un int et s'écrit "1" au lieu de "1.0")
+CSV_DTYPES = {
+    "reportUuid": str,
+    "apparatusId": str,
+    "deviceUuid": str,
+    "userId": str,
+    "temperature": "float64",
+    "value": "float64",
+    "hitsNumber": "float64",
+    "latitude": "float64",
+    "longitude": "float64",
+    "rain": "float64",
+    "storm": "float64",
+    "windowSeat": "float64",
+    "flightId": "float64",
+}
 
 # ----------------------------------
 
 LOCAL_DIR.mkdir(parents=True, exist_ok=True) # Créer le dossier s'il n'existe pas
 
-def download_tar():
+def load_download_state():
+    """
+    Fonction : permet de récupérer l'état du dernier téléchargement traité (ETag, Last-Modified, empreinte SHA-256)
+
+    Renvoie :
+    - state : dictionnaire de l'état (vide s'il n'y en a pas encore)
+    """
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+
+    # L'état du S3 fait foi (les runners sont éphémères), sinon celui du cache local
+    try:
+        return json.loads(s3.get_object(Bucket=bucket_name, Key=S3_DOWNLOAD_STATE_NAME)['Body'].read())
+    except ClientError:
+        pass
+    if DOWNLOAD_STATE_FILE.exists():
+        return json.loads(DOWNLOAD_STATE_FILE.read_text(encoding="utf-8"))
+    return {}
+
+def save_download_state_s3():
+    """
+    Fonction : Téléversement de l'état du téléchargement vers le S3, une fois toutes les tables publiées
+    (si le traitement échoue avant, le prochain passage ne sera pas court-circuité)
+    """
+
+    if not DOWNLOAD_STATE_FILE.exists():
+        return
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+    s3.upload_file(str(DOWNLOAD_STATE_FILE), bucket_name, S3_DOWNLOAD_STATE_NAME)
+
+def file_sha256(path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Fonction : calcule l'empreinte SHA-256 d'un fichier en le lisant par morceaux
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(chunk_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+def download_tar(chunk_size=DOWNLOAD_CHUNK_SIZE, retries=DOWNLOAD_RETRIES):
     """
     Fonction : permet de télécharger le fichier compressé (TAR) contenant le fichier CSV à extraire.
+    La requête est conditionnelle (If-None-Match / If-Modified-Since) : si le fichier n'a pas changé en amont,
+    rien n'est téléchargé. Un téléchargement interrompu reprend là où il s'était arrêté (requête Range).
+
+    Arguments :
+    - chunk_size (par défaut : DOWNLOAD_CHUNK_SIZE) : taille des morceaux lus sur le réseau
+    - retries (par défaut : DOWNLOAD_RETRIES) : nombre de tentatives en cas de coupure
+
+    Renvoie :
+    - bool : True si un nouveau fichier a été téléchargé, False s'il est identique au dernier traité
     """
     msg = "Téléchargement du fichier compressé de la requête HTML..."
     log_memory_usage(msg)
     print(msg)
 
-    # Requête en streaming
-    response = requests.get(URL_TAR, stream=True)
-    response.raise_for_status()
+    state = load_download_state()
+
+    # En-têtes conditionnels à partir du dernier fichier traité
+    conditions = {}
+    if state.get("etag"):
+        conditions["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        conditions["If-Modified-Since"] = state["last_modified"]
+
+    for tentative in range(1, retries + 1):
+        headers = dict(conditions)
+
+        # Reprise d'un téléchargement interrompu, seulement si le fichier en amont n'a pas changé entre-temps
+        offset = PART_TAR.stat().st_size if PART_TAR.exists() else 0
+        part_state = json.loads(PART_STATE_FILE.read_text(encoding="utf-8")) if PART_STATE_FILE.exists() else {}
+        validator = part_state.get("etag") or part_state.get("last_modified")
+        if offset and validator:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+
+        try:
+            # Requête en streaming
+            with requests.get(URL_TAR, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as response:
+                if response.status_code == 304:
+                    msg = "Le fichier compressé n'a pas changé depuis le dernier traitement."
+                    log_memory_usage(msg)
+                    print(msg)
+                    return False
+                response.raise_for_status()
+
+                # 206 : le serveur reprend à l'octet demandé, sinon on repart de zéro
+                if response.status_code != 206:
+                    offset = 0
+                part_state = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+                PART_STATE_FILE.write_text(json.dumps(part_state), encoding="utf-8")
+
+                # Taille attendue (Content-Range: bytes debut-fin/total, sinon Content-Length)
+                content_range = response.headers.get("Content-Range", "")
+                if "/" in content_range and not content_range.endswith("*"):
+                    expected = int(content_range.rsplit("/", 1)[1])
+                elif response.headers.get("Content-Length"):
+                    expected = offset + int(response.headers["Content-Length"])
+                else:
+                    expected = None
+
+                if offset:
+                    msg = f"Reprise du téléchargement à l'octet {offset}..."
+                    log_memory_usage(msg)
+                    print(msg)
+
+                # Récupération du contenue
+                with open(PART_TAR, "ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+
+            if expected is not None and PART_TAR.stat().st_size != expected:
+                raise requests.ConnectionError(f"Téléchargement incomplet : {PART_TAR.stat().st_size}/{expected} octets")
+            break
 
-    # Récupération du contenue
-    with open(LOCAL_TAR, "wb") as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if tentative == retries:
+                raise
+            msg = f"Téléchargement interrompu ({e}), nouvelle tentative {tentative + 1}/{retries}..."
+            log_memory_usage(msg)
+            print(msg)
+            time.sleep(2 ** tentative)
+
+    # Un serveur sans ETag ni Last-Modified peut renvoyer le même fichier : on compare l'empreinte
+    sha256 = file_sha256(PART_TAR, chunk_size)
+    PART_TAR.replace(LOCAL_TAR)
+    PART_STATE_FILE.unlink(missing_ok=True)
+    new_state = dict(part_state, sha256=sha256, size=LOCAL_TAR.stat().st_size)
+    DOWNLOAD_STATE_FILE.write_text(json.dumps(new_state), encoding="utf-8")
+
+    if sha256 == state.get("sha256"):
+        msg = "Le fichier compressé téléchargé est identique au dernier traité."
+        log_memory_usage(msg)
+        print(msg)
+        return False
 
     msg = "Téléchargement terminé."
     log_memory_usage(msg)
     print(msg)
+    return True
+
+def open_csv_from_tar(tar):
+    """
+    Fonction : permet de trouver et d'ouvrir le fichier measurements.csv dans l'archive TAR sans l'extraire sur le disque.
+
+    Arguments :
+    - tar : archive TAR ouverte
+
+    Renvoie :
+    - file : objet fichier (binaire) du CSV, lu au fil de la décompression
+    """
+
+    # Trouver le fichier CSV (on s'arrête au premier trouvé plutôt que de lister toute l'archive)
+    member = next((m for m in tar if m.name.endswith("measurements.csv")), None)
+    if not member:
+        raise FileNotFoundError("measurements.csv introuvable dans l'archive")
+
+    # Extraction du fichier CSV
+    file = tar.extractfile(member)
+    if not file:
+        raise RuntimeError("Impossible d'extraire le fichier CSV.")
+
+    return file
 
 def extract_csv_from_tar():
     """
@@ -59,16 +263,9 @@ def extract_csv_from_tar():
 
     # Ouvrir le fichier compressé TAR
     with tarfile.open(LOCAL_TAR, mode="r:gz") as tar:
-        
-        # Trouver le fichier CSV
-        member = next((m for m in tar.getmembers() if m.name.endswith("measurements.csv")), None)
-        if not member:
-            raise FileNotFoundError("measurements.csv introuvable dans l'archive")
-
-        # Extraction du fichier CSV
-        file = tar.extractfile(member)
-        if not file:
-            raise RuntimeError("Impossible d'extraire le fichier CSV.")
+
+        # Récupération du fichier CSV dans l'archive
+        file = open_csv_from_tar(tar)
         
         # Retourne le DataFrame du fichier CSV
         return pd.read_csv(file, 
@@ -79,13 +276,230 @@ def extract_csv_from_tar():
     log_memory_usage(msg)
     print(msg)
 
-def convert_to_json(df: pd.DataFrame, path: str):
+def profile_chunk(df: pd.DataFrame, profile: dict):
+    """
+    Fonction : met à jour le profil des colonnes avec un morceau de données.
+    Le profil permet de retrouver, sans relire tout le fichier, les types que pandas.read_json déduirait
+    sur le fichier JSON complet (une colonne numérique avec au moins une valeur manquante devient float, etc).
+
+    Arguments :
+    - df : DataFrame (morceau) à profiler
+    - profile : dictionnaire du profil à compléter (modifié sur place)
+    """
+
+    for col in df.columns:
+        serie = df[col]
+        entry = profile.setdefault(col, {"kind": None, "has_null": False, "integral": True})
+        non_null = serie.dropna()
+        entry["has_null"] = entry["has_null"] or len(non_null) < len(serie)
+
+        # Colonne entièrement vide dans ce morceau : elle ne renseigne pas sur le type
+        if non_null.empty:
+            continue
+
+        # Type du morceau (les chaînes purement numériques sont converties par read_json, on les compte comme nombres)
+        if pd.api.types.is_bool_dtype(serie):
+            kind = "bool"
+        elif pd.api.types.is_numeric_dtype(serie):
+            kind = "numeric"
+        else:
+            numbers = pd.to_numeric(non_null, errors="coerce")
+            kind = "numeric" if numbers.notna().all() else "object"
+            non_null = numbers if kind == "numeric" else non_null
+
+        integral = kind != "numeric" or bool((non_null.astype("float64") % 1 == 0).all())
+
+        # Fusion avec les morceaux précédents
+        merge_profile_entry(entry, {"kind": kind, "has_null": False, "integral": integral})
+
+def merge_profile_entry(entry: dict, other: dict):
+    """
+    Fonction : fusionne le profil d'une colonne avec celui d'un autre morceau (ou d'un autre fichier) de la même colonne.
+
+    Arguments :
+    - entry : profil de la colonne à compléter (modifié sur place)
+    - other : profil de la même colonne à y ajouter
+    """
+
+    entry["has_null"] = entry["has_null"] or other["has_null"]
+    entry["integral"] = entry["integral"] and other["integral"]
+
+    if other["kind"] is None or entry["kind"] == other["kind"]:
+        return
+    if entry["kind"] is None:
+        entry["kind"] = other["kind"]
+    elif "object" in (entry["kind"], other["kind"]):
+        entry["kind"] = "object"
+    else:
+        # Mélange de booléens et de nombres : read_json le convertit en nombres (True/False valent 1/0)
+        entry["kind"] = "numeric"
+
+def merge_profiles(base: dict, other: dict):
+    """
+    Fonction : fusionne deux profils de colonnes, par exemple celui des données déjà publiées et celui des nouvelles lignes.
+
+    Arguments :
+    - base : profil des colonnes de référence
+    - other : profil des colonnes à y ajouter
+
+    Renvoie :
+    - merged : nouveau profil (les profils donnés ne sont pas modifiés)
+    """
+
+    merged = {col: dict(entry) for col, entry in base.items()}
+    for col, entry in other.items():
+        merge_profile_entry(merged.setdefault(col, {"kind": None, "has_null": False, "integral": True}), entry)
+    return merged
+
+def profile_dtypes(profile: dict):
+    """
+    Fonction : traduit le profil des colonnes en types pandas, identiques à ceux de pandas.read_json sur le fichier complet.
+
+    Arguments :
+    - profile : profil des colonnes (voir profile_chunk)
+
+    Renvoie :
+    - dtypes : dictionnaire colonne -> type pandas
+    """
+
+    dtypes = {}
+    for col, entry in profile.items():
+        if entry["kind"] == "object":
+            dtypes[col] = "object"
+        elif entry["kind"] == "bool" and not entry["has_null"]:
+            dtypes[col] = "bool"
+        elif entry["kind"] is not None and not entry["has_null"] and entry["integral"]:
+            dtypes[col] = "int64"
+        else:
+            dtypes[col] = "float64"
+    return dtypes
+
+def write_profile(profile: dict, nb_lignes: int, path=PROFILE_FILE, mode="full", watermark=None):
+    """
+    Fonction : enregistre le profil des colonnes à côté du fichier JSON.
+
+    Arguments :
+    - profile : profil des colonnes
+    - nb_lignes : nombre de lignes du fichier JSON décrit
+    - path (par défaut : PROFILE_FILE) : chemin du fichier du profil
+    - mode (par défaut : "full") : "full" si le fichier contient tout l'historique, "incremental" s'il ne contient que les nouvelles lignes
+    - watermark (par défaut : None) : date maximale du manifeste à partir de laquelle les nouvelles lignes ont été sélectionnées
+
+    Renvoie :
+    - contenu : le profil sérialisé en JSON
+    """
+
+    contenu = json.dumps({"rows": nb_lignes, "columns": profile, "mode": mode, "watermark": watermark})
+    Path(path).write_text(contenu, encoding="utf-8")
+    return contenu
+
+def load_manifest():
+    """
+    Fonction : permet de récupérer le manifeste de la dernière actualisation (date maximale, derniers reportUuid, profil)
+
+    Renvoie :
+    - manifest : le manifeste (dictionnaire) ou None s'il n'existe pas encore
+    """
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+
+    try:
+        response = s3.get_object(Bucket=bucket_name, Key=S3_MANIFEST_NAME)
+    except ClientError:
+        return None
+
+    return json.loads(response['Body'].read())
+
+def needs_full_refresh(manifest):
+    """
+    Fonction : indique si une actualisation complète est nécessaire (pas de manifeste, ou dernière actualisation
+    complète trop ancienne pour prendre en compte les corrections et suppressions faites en amont)
+
+    Arguments :
+    - manifest : le manifeste de la dernière actualisation (ou None)
+
+    Renvoie :
+    - bool : True s'il faut tout recalculer
+    """
+
+    if manifest is None or manifest.get("max_date") is None:
+        return True
+
+    derniere = pd.Timestamp(manifest["last_full_refresh"])
+    return pd.Timestamp.now(tz="UTC") - derniere > pd.Timedelta(days=FULL_REFRESH_DAYS)
+
+def new_rows_mask(chunk: pd.DataFrame, manifest: dict):
+    """
+    Fonction : sélectionne les lignes à traiter en mode incrémental : plus récentes que la date maximale
+    du dernier passage, ou dans la fenêtre de rattrapage avec un reportUuid jamais vu.
+
+    Arguments :
+    - chunk : morceau de données
+    - manifest : le manifeste de la dernière actualisation
+
+    Renvoie :
+    - mask : série booléenne des lignes à garder
+    """
+
+    dates = pd.to_datetime(chunk["dateAndTimeOfCreation"], utc=True, errors="coerce", format="ISO8601")
+    watermark = pd.Timestamp(manifest["max_date"])
+    lookback = watermark - pd.Timedelta(days=manifest["lookback_days"])
+
+    recent = (dates > lookback) & ~chunk["reportUuid"].isin(manifest["recent"].keys())
+    return (dates > watermark) | recent
+
+def serialize_pool(workers=SERIALIZE_WORKERS):
+    """
+    Fonction : groupe de processus pour la conversion en JSON, à utiliser dans un bloc with
+    (les processus sont lancés à neuf, sans copier les fils en cours du processus principal).
+
+    Arguments :
+    - workers (par défaut : SERIALIZE_WORKERS) : nombre de processus
+
+    Renvoie :
+    - executor : le groupe de processus, ou None (dans le bloc with) si workers vaut 1
+    """
+    if workers <= 1:
+        return nullcontext()
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def iter_jsonl(df: pd.DataFrame, chunksize=CHUNK_ROWS, executor=None, window=2 * SERIALIZE_WORKERS):
+    """
+    Fonction : fonction génératrice qui convertit un DataFrame en JSON par tranches de chunksize lignes.
+    Avec un groupe de processus, plusieurs tranches sont converties en même temps ; au plus window tranches
+    sont en cours, la mémoire reste bornée.
+
+    Arguments :
+    - df : DataFrame à convertir
+    - chunksize (par défaut : CHUNK_ROWS) : nombre de lignes par tranche
+    - executor (par défaut : None) : groupe de processus (voir serialize_pool), ou None pour convertir ici
+    - window (par défaut : 2 x SERIALIZE_WORKERS) : nombre maximal de tranches en cours de conversion
+
+    Renvoit en yield :
+    - text : texte JSON d'une tranche, dans l'ordre des lignes
+    """
+    tranches = (df.iloc[debut:debut + chunksize] for debut in range(0, len(df), chunksize))
+    if executor is None:
+        yield from map(to_jsonl, tranches)
+        return
+
+    en_cours = deque()
+    for tranche in tranches:
+        en_cours.append(executor.submit(to_jsonl, tranche))
+        if len(en_cours) >= window:
+            yield en_cours.popleft().result()
+    while en_cours:
+        yield en_cours.popleft().result()
+
+def convert_to_json(df: pd.DataFrame, path: str, executor=None):
     """
     Fonction : Conversion en JSON les données du DataFrame.
 
     Arguments :
     - df : DataFrame des données à convertir en JSON
     - path : chemin qui permet d'aller chercher ses données en JSON
+    - executor (par défaut : None) : groupe de processus pour convertir plusieurs tranches en même temps (voir serialize_pool)
 
     Renvoit :
     - Path : renvoit le chemin utilisé pour chercher les données
@@ -95,31 +509,187 @@ def convert_to_json(df: pd.DataFrame, path: str):
     msg = "Conversion en JSON des données..."
     log_memory_usage(msg)
     print(msg)
-    df.to_json(path, orient="records", lines=True)
+
+    # Écriture par tranches de CHUNK_ROWS lignes : le texte JSON du DataFrame entier n'est jamais en mémoire
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for texte in iter_jsonl(df, CHUNK_ROWS, executor):
+            f.write(texte)
     msg = f"Fichier JSON généré : {path}"
     log_memory_usage(msg)
     print(msg)
 
     return path
 
-def upload_to_s3():
+def iter_csv_chunks(chunksize=CHUNK_ROWS):
+    """
+    Fonction : fonction génératrice permettant de lire le fichier CSV de l'archive par morceaux de taille bornée.
+
+    Arguments :
+    - chunksize (par défaut : CHUNK_ROWS) : nombre de lignes par morceau
+
+    Renvoit en yield :
+    - chunk : DataFrame contenant au plus chunksize lignes
+    """
+
+    with tarfile.open(LOCAL_TAR, mode="r:gz") as tar:
+        file = open_csv_from_tar(tar)
+        with pd.read_csv(file, sep=";", header=0, dtype=CSV_DTYPES, chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield chunk
+
+class S3MultipartWriter:
+    """
+    Classe : objet fichier (écriture binaire seulement) qui envoie les données vers le S3 en téléversement multipart,
+    au fur et à mesure, sans jamais garder plus d'une partie en mémoire.
+    """
+
+    def __init__(self, key, part_size=S3_PART_SIZE):
+        self.key = key
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.parts = []
+
+        # Client du S3 d'AWS
+        self.s3 = get_s3_client()
+        self.upload_id = self.s3.create_multipart_upload(Bucket=bucket_name, Key=key)["UploadId"]
+
+    def write(self, data: bytes):
+        """
+        Fonction : ajoute des données au téléversement ; chaque partie complète (part_size octets) est envoyée aussitôt.
+
+        Arguments :
+        - data : données à écrire (en octets)
+
+        Renvoie :
+        - nombre d'octets écrits
+        """
+        self.buffer += data
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, body: bytes):
+        number = len(self.parts) + 1
+        response = self.s3.upload_part(Bucket=bucket_name, Key=self.key, UploadId=self.upload_id,
+                                       PartNumber=number, Body=body)
+        self.parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+    def close(self):
+        """
+        Fonction : envoie la dernière partie (plus petite si besoin) et termine le téléversement : l'objet apparaît dans le S3.
+        """
+        # La dernière partie peut être plus petite que la taille minimale
+        if self.buffer or not self.parts:
+            self._upload_part(bytes(self.buffer))
+            self.buffer.clear()
+        self.s3.complete_multipart_upload(Bucket=bucket_name, Key=self.key, UploadId=self.upload_id,
+                                          MultipartUpload={"Parts": self.parts})
+
+    def abort(self):
+        """
+        Fonction : annule le téléversement (le S3 supprime les parties déjà envoyées).
+        """
+        self.s3.abort_multipart_upload(Bucket=bucket_name, Key=self.key, UploadId=self.upload_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # En cas d'erreur, on annule le téléversement pour ne pas laisser de parties orphelines (facturées)
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+def convert_to_json_streaming(target=STREAM_TARGET, chunksize=CHUNK_ROWS, manifest=None, path=JSON_FILE, delta_path=DELTA_FILE):
+    """
+    Fonction : Conversion en JSON des données de l'archive, morceau par morceau, avec écriture au fil de l'eau
+    sur le disque ou directement dans le S3 (téléversement multipart).
+    La mémoire utilisée reste bornée par la taille d'un morceau, quelle que soit la taille du jeu de données.
+
+    Arguments :
+    - target (par défaut : STREAM_TARGET) : "disk" pour écrire dans JSON_FILE, "s3" pour écrire dans S3_OBJECT_NAME
+    - chunksize (par défaut : CHUNK_ROWS) : nombre de lignes par morceau
+    - manifest (par défaut : None) : manifeste de la dernière actualisation ; s'il est donné, seules les nouvelles
+      lignes sont écrites (dans DELTA_FILE / S3_DELTA_NAME)
+    - path (par défaut : JSON_FILE) : fichier écrit sur le disque (target "disk", actualisation complète)
+    - delta_path (par défaut : DELTA_FILE) : fichier écrit sur le disque (target "disk", nouvelles lignes seulement)
+
+    Renvoit :
+    - profil : profil du fichier écrit (nombre de lignes, colonnes, mode complet ou incrémental)
+    """
+
+    mode = "full" if manifest is None else "incremental"
+    msg = f"Conversion en JSON des données en streaming (morceaux de {chunksize} lignes, destination : {target}, mode : {mode})..."
+    log_memory_usage(msg)
+    print(msg)
+
+    if target == "s3":
+        sink = S3MultipartWriter(S3_OBJECT_NAME if manifest is None else S3_DELTA_NAME)
+    else:
+        sink = open(path if manifest is None else delta_path, "wb")
+
+    nb_lignes = 0
+    profile = {}
+    with sink:
+        for chunk in iter_csv_chunks(chunksize):
+
+            # En mode incrémental, on ne garde que les lignes pas encore publiées
+            if manifest is not None:
+                chunk = chunk[new_rows_mask(chunk, manifest)]
+
+            profile_chunk(chunk, profile)
+            if chunk.empty:
+                continue
+            sink.write(to_jsonl(chunk).encode("utf-8"))
+            nb_lignes += len(chunk)
+
+    # Les nouvelles lignes doivent garder les types des données déjà publiées, sinon on recalcule tout
+    if manifest is not None:
+        merged = merge_profiles(manifest["columns"], profile)
+        if profile_dtypes(merged) != profile_dtypes(manifest["columns"]):
+            msg = "Les types des nouvelles lignes diffèrent des données publiées, passage en actualisation complète..."
+            log_memory_usage(msg)
+            print(msg)
+            return convert_to_json_streaming(target, chunksize, path=path, delta_path=delta_path)
+
+    # Le profil des colonnes permet à table_creation.py de découper le fichier en une seule lecture
+    watermark = None if manifest is None else manifest["max_date"]
+    contenu = write_profile(profile, nb_lignes, PROFILE_FILE, mode, watermark)
+    if target == "s3":
+        sink.s3.put_object(Bucket=bucket_name, Key=S3_PROFILE_NAME, Body=contenu.encode("utf-8"))
+
+    msg = f"Fichier JSON généré en streaming : {nb_lignes} lignes, pic mémoire (RSS) : {get_peak_memory_mb():.2f} MB"
+    log_memory_usage(msg)
+    print(msg)
+
+    return json.loads(contenu)
+
+def upload_to_s3(incremental=False):
     """
     Fonction : Téléversement du fichier JSON vers le bucket S3
+
+    Arguments :
+    - incremental (par défaut : False) : téléverse seulement les nouvelles lignes (DELTA_FILE) au lieu du fichier complet
     """
-    
-    msg = f"Téléversement vers S3 ({bucket_name}/{S3_OBJECT_NAME})..."
+
+    path_fichier, path_s3 = (DELTA_FILE, S3_DELTA_NAME) if incremental else (JSON_FILE, S3_OBJECT_NAME)
+
+    msg = f"Téléversement vers S3 ({bucket_name}/{path_s3})..."
     log_memory_usage(msg)
     print(msg)
 
     # Client du S3 d'AWS
-    s3 = boto3.client("s3",
-                      aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-                      aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
-                      region_name=os.environ['AWS_REGION'])
+    s3 = get_s3_client()
 
     # Téléversement du fichier
-    with open(JSON_FILE, "rb") as f:
-        s3.upload_fileobj(f, bucket_name, S3_OBJECT_NAME)
+    s3.upload_file(str(path_fichier), bucket_name, path_s3, Config=get_transfer_config())
+
+    # Téléversement du profil des colonnes s'il a été généré
+    if PROFILE_FILE.exists():
+        s3.upload_file(str(PROFILE_FILE), bucket_name, S3_PROFILE_NAME)
     
     msg = "Fichier envoyé avec succès sur S3."
     log_memory_usage(msg)
@@ -127,7 +697,33 @@ def upload_to_s3():
 
 if __name__ == "__main__":
     # Exécution des différentes étapes
-    download_tar() # Téléchargement du fichier compressé
-    df = extract_csv_from_tar() # Extraire le fichier CSV du fichier compressé
-    convert_to_json(df, JSON_FILE) # Conversion en PARQUET
-    upload_to_s3() # Téléversement du fichier vers le S3
+    UNCHANGED_FLAG.unlink(missing_ok=True)
+    if not download_tar(): # Téléchargement du fichier compressé
+        # Rien de nouveau en amont : toute la chaîne de traitement est court-circuitée
+        UNCHANGED_FLAG.touch()
+        msg = "Aucune nouvelle donnée, actualisation terminée sans traitement."
+        log_memory_usage(msg)
+        print(msg)
+        sys.exit(0)
+
+    if STREAMING_MODE:
+        # En mode incrémental, seules les lignes postérieures au dernier passage sont converties
+        manifest = load_manifest() if INCREMENTAL_MODE else None
+        if manifest is not None and needs_full_refresh(manifest):
+            manifest = None
+
+        profil = convert_to_json_streaming(manifest=manifest) # Extraction et conversion par morceaux (mémoire constante)
+        if STREAM_TARGET != "s3":
+            upload_to_s3(profil["mode"] == "incremental") # Téléversement du fichier vers le S3
+    else:
+        df = extract_csv_from_tar() # Extraire le fichier CSV du fichier compressé
+        with serialize_pool() as processes:
+            convert_to_json(df, JSON_FILE, processes) # Conversion en PARQUET
+        profile = {}
+        profile_chunk(df, profile)
+        write_profile(profile, len(df), PROFILE_FILE) # Profil des colonnes pour table_creation.py
+        upload_to_s3() # Téléversement du fichier vers le S3
+
+    msg = f"Pic mémoire (RSS) de l'actualisation : {get_peak_memory_mb():.2f} MB"
+    log_memory_usage(msg)
+    print(msg)
@@ -5,33 +5,31 @@
 ###############################-
 
 # Importation des librairies
-from flask import Flask, Response, redirect, request
-import sys
-from logger_write import log_memory_usage, LOG_FILE
-import boto3
-import json
-import datetime
-
-# Selon le système auquel est lancé cette application (Windows, Linux), on va faire différemennt le calcul de mémoire
-if sys.platform == "win32":
-    import psutil
-
-    def get_memory_usage_mb():
-        """
-        Fonction : utilisation de la mémoire avec psutil en MB sous Windows.
-        """
-        process = psutil.Process(os.getpid())
-        return process.memory_info().rss / (1024 ** 2)
-else:
-    import resource
-
-    def get_memory_usage_mb():
-        """
-        Fonction : utilisation de la mémoire avec psutil en MB sous Linux.
-        """
-        usage = resource.getrusage(resource.RUSAGE_SELF)
-        return usage.ru_maxrss / 1024
+import time
+IMPORT_STARTED = time.perf_counter() # Début du chargement de l'application (durée renvoyée par /ready)
+from flask import Flask, Response, g, redirect, request, send_file, url_for
 import os
+import html
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logger_write import log_memory_usage, get_memory_usage_mb, read_log_tail, reset_log as truncate_log
+from s3_client import get_s3_client, presigned_url
+import json
+from time_index import ranges_for_window, parse_date_bounds
+from tile_index import ranges_for_bbox
+from filters import build_line_filter, LineFilter
+from parquet_store import generate_parquet, index_key
+from content_encoding import negotiate, compress_stream, VARIANT_SUFFIXES
+from pagination import encode_cursor, decode_cursor, parse_limit, read_page
+from stats_tables import select_rows, stats_key, STATS_KINDS
+from lookup_db import (LookupDatabase, find_record, select_measurements, generate_rows, parse_key,
+                       encode_lookup_cursor, decode_lookup_cursor, DIMENSION_KEYS, MEASUREMENT_KEYS)
+from join_table import JoinDecoder, read_join_s3, CORE_TABLE
+from output_formats import negotiate_format, convert_stream, table_dtypes, MEDIA_TYPES
+from botocore.exceptions import ClientError
+from disk_cache import DiskCache, CACHE_REVALIDATE_SECONDS
+from broadcast import Broadcaster, ChunkBody
+import metrics
 
 # Création de l'application
 app = Flask(__name__)
@@ -43,61 +41,421 @@ url_open_radiation = "https://request.openradiation.net/openradiation_dataset.ta
 bucket_name = os.environ['S3_BUCKET_NAME'] # Le nom du bucket
 EXPIRES_IN = 300  # 5 minutes
 
+# Index temporels (date -> octets) et spatial (tuile -> octets) des tables des mesures
+INDEX_TTL = 300 # Durée (secondes) pendant laquelle un index chargé est réutilisé
+S3_TILES_INDEX = "data/measurements_tiles.index.json"
+S3_MANIFEST = "data/manifest.json" # Manifeste de la dernière actualisation (types des colonnes des sorties CSV et Arrow)
+STREAM_CHUNK_SIZE = 64 * 1024 # Taille des blocs renvoyés tels quels quand aucun filtre n'est demandé
+indexes = {} # chemin S3 de l'index -> (date de chargement, index)
+variants = {} # chemin S3 d'une variante compressée -> (date de vérification, existe)
+decoders = {} # ETag de la table détaillée publiée sans les colonnes des appareils et des vols -> JoinDecoder
+
+# Cache disque des fichiers JSON du S3 (voir disk_cache.py)
+disk_cache = DiskCache()
+
+# Copie locale de la base des recherches par identifiant (voir lookup_db.py)
+lookup_db = LookupDatabase(revalidate_seconds=CACHE_REVALIDATE_SECONDS)
+
+# Lectures du S3 partagées entre les requêtes simultanées d'un même fichier (voir broadcast.py)
+broadcaster = Broadcaster()
+
+# Mesures des requêtes (voir metrics.py) et taille de la page /memoire
+MEMOIRE_MAX_LINES = int(os.environ.get("MEMOIRE_MAX_LINES", "500")) # Dernières lignes du log affichées
+METRICS_EXCLUDED = ("/metrics", "/ready") # Routes non mesurées (interrogées régulièrement par le collecteur ou la sonde)
+
+# Préchauffage en arrière-plan au démarrage (voir warm_up) : la première requête ne paie plus l'import de boto3,
+# la résolution des identifiants, la connexion TLS au S3 ni le chargement des index
+APP_WARMUP = os.environ.get("APP_WARMUP", "true").lower() == "true"
+WARMUP_TYPES = [t.strip() for t in os.environ.get("WARMUP_TYPES", "measurements,openradiation").split(",") if t.strip()]
+WARMUP_BYTES = int(os.environ.get("WARMUP_BYTES", 64 * 1024)) # Octets lus au début de chaque fichier préchauffé
+WARMUP_MAX_SECONDS = float(os.environ.get("WARMUP_MAX_SECONDS", "30")) # Au-delà, /ready répond 200 même si le préchauffage continue
+warmup = {"state": "disabled", "pid": None, "started": None, "seconds": None, "steps": {}, "errors": {}}
+warmup_lock = threading.Lock()
+
 ##########################################-
 # Création des différentes fct utilitaires pour l'application
 ##########################################-
 
-# Fonction génératrice pour streamer ligne par ligne avec filtrage optionnel
-def generate(s3_body, filter_last_two_years=False, annee_courante=0, annee_precedente=0):
-        """
-        Fonction : fonction génératrice permettant de streamer ligne par ligne avec filtrage des deux dernières années optionnel.
+def load_index(s3, s3_index_name):
+    """
+    Fonction : récupère un index (temporel ou spatial) depuis le S3, gardé en mémoire pendant INDEX_TTL secondes.
+
+    Arguments :
+    - s3 : client S3
+    - s3_index_name : chemin de l'index dans le S3
+
+    Renvoie :
+    - index : l'index ou None s'il n'existe pas
+    """
+
+    charge = indexes.get(s3_index_name)
+    if charge and time.monotonic() - charge[0] < INDEX_TTL:
+        return charge[1]
+
+    try:
+        index = json.loads(s3.get_object(Bucket=bucket_name, Key=s3_index_name)['Body'].read())
+    except ClientError:
+        index = None
+
+    indexes[s3_index_name] = (time.monotonic(), index)
+    return index
+
+def join_decoder(s3):
+    """
+    Fonction : reconstitution de la table détaillée quand elle est publiée sans les colonnes des appareils et des vols
+    (voir join_table.py). Les références sont rechargées quand ce fichier change : publiées avant lui, elles contiennent
+    toujours celles de ses lignes.
 
-        Arguments :
-        - s3_body : corps du document JSON récupéré du S3
-        - filter_last_two_years (par défaut : False) : permet le filtrage sur l'année actuelle et l'année précédente
-        - annee_courante : l'année actuelle à utiliser pour filtrer
-        - annee_precedente : l'année dernière à utiliser pour filtrer
+    Arguments :
+    - s3 : client S3
 
-        Renvoit en yield :
-        - line : la ligne JSON parcourue
-        """
+    Renvoie :
+    - decoder : JoinDecoder, ou None si la table détaillée est publiée en entier
+    """
+    try:
+        etag = s3.head_object(Bucket=bucket_name, Key=f"data/{CORE_TABLE}.jsonl")['ETag']
+    except ClientError:
+        return None
+    if etag not in decoders:
+        reference = read_join_s3(s3, bucket_name)
+        if reference is None:
+            return None # Références supprimées : la table entière est de nouveau publiée
+        decoders.clear()
+        decoders[etag] = JoinDecoder(reference)
+    return decoders[etag]
+
+def warm_up():
+    """
+    Fonction : préchauffage du processus, lancé en arrière-plan au démarrage : client S3 (import de boto3, identifiants,
+    connexion TLS), premiers octets des fichiers de WARMUP_TYPES, index temporels, index spatial, manifeste et références
+    de la table détaillée chargés en mémoire. Une étape qui échoue est notée puis ignorée (la requête la refera).
+    """
+    debut = time.perf_counter()
+
+    def etape(nom, fonction, *args):
+        t = time.perf_counter()
+        try:
+            return fonction(*args)
+        except Exception as e:
+            warmup["errors"][nom] = f"{e.__class__.__name__}: {e}"
+        finally:
+            warmup["steps"][nom] = round(time.perf_counter() - t, 3)
+
+    def premiers_octets(s3, s3_object_name):
+        return s3.get_object(Bucket=bucket_name, Key=s3_object_name, Range=f"bytes=0-{WARMUP_BYTES - 1}")['Body'].read()
+
+    try:
+        s3 = etape("s3_client", get_s3_client)
+        if s3 is None:
+            return
+
+        # Lectures indépendantes (une requête au S3 chacune) : faites en même temps
+        etapes = [("tiles_index", load_index, s3, S3_TILES_INDEX), ("manifest", load_index, s3, S3_MANIFEST)]
+        for type in WARMUP_TYPES:
+            stockage = type
+            if type == "openradiation" and etape("join_reference", join_decoder, s3) is not None:
+                stockage = CORE_TABLE
+            etapes += [(f"first_bytes:{type}", premiers_octets, s3, f"data/{stockage}.jsonl"),
+                       (f"index:{type}", load_index, s3, f"data/{stockage}.index.json")]
+        with ThreadPoolExecutor(max_workers=len(etapes)) as pool:
+            for nom, fonction, *args in etapes:
+                pool.submit(etape, nom, fonction, *args)
+    finally:
+        warmup["seconds"] = round(time.perf_counter() - debut, 3)
+        warmup["state"] = "done"
+        msg = (f"Préchauffage terminé en {warmup['seconds']} s : {warmup['steps']}"
+               + (f", erreurs : {warmup['errors']}" if warmup["errors"] else ""))
+        log_memory_usage(msg)
+        print(msg)
+
+def start_warmup():
+    """
+    Fonction : lance le préchauffage dans un fil (une fois par processus : un worker créé par fork le relance pour lui).
+    """
+    if warmup["pid"] == os.getpid():
+        return
+    with warmup_lock:
+        if warmup["pid"] == os.getpid():
+            return
+        warmup.update({"pid": os.getpid(), "started": time.time(), "seconds": None, "steps": {}, "errors": {},
+                       "state": "running" if APP_WARMUP else "disabled"})
+        if APP_WARMUP:
+            threading.Thread(target=warm_up, name="warm_up", daemon=True).start()
+
+def variant_exists(s3, s3_object_name):
+    """
+    Fonction : indique si une variante compressée est publiée dans le S3 (réponse gardée en mémoire pendant INDEX_TTL secondes).
+    """
+    verifie = variants.get(s3_object_name)
+    if verifie and time.monotonic() - verifie[0] < INDEX_TTL:
+        return verifie[1]
+    try:
+        s3.head_object(Bucket=bucket_name, Key=s3_object_name)
+        existe = True
+    except ClientError:
+        existe = False
+    variants[s3_object_name] = (time.monotonic(), existe)
+    return existe
+
+def generate(s3_body, line_filter=None, sorted_desc=False):
+    """
+    Fonction : fonction génératrice permettant de streamer le fichier avec filtrage optionnel.
+    Sans filtre, le fichier est renvoyé par blocs tels quels ; avec filtre, les lignes retenues sont renvoyées
+    telles quelles, sans être décodées ni réécrites.
+
+    Arguments :
+    - s3_body : corps du document JSON récupéré du S3
+    - line_filter (par défaut : None) : filtre à appliquer (voir filters.build_line_filter)
+    - sorted_desc (par défaut : False) : si les lignes sont triées par date décroissante, on s'arrête à la première trop ancienne
+
+    Renvoit en yield :
+    - bloc ou ligne JSON (en octets)
+    """
+
+    # Le corps est fermé dès la fin du parcours, même interrompu (fenêtre dépassée, client déconnecté) :
+    # fichier du cache disque, connexion S3 ou abonnement à une lecture partagée
+    try:
+        # Pas de filtrage : on ne découpe même pas en lignes
+        if line_filter is None or line_filter.is_empty():
+            yield from s3_body.iter_chunks(STREAM_CHUNK_SIZE)
+            return
 
-        # Pour parcourir chaque ligne du fichier JSON en question
         for line in s3_body.iter_lines():
-            
-            # Si la ligne est non vide
-            if line:
+            if not line:
+                continue
+            if line_filter.matches(line):
+                yield line + b"\n"
+            elif sorted_desc and line_filter.older_than_window(line):
+                break # On a atteint les mesures trop vieilles (ordre décroissant)
+    finally:
+        s3_body.close()
+
+def generate_ranges(s3, s3_object_name, ranges, line_filter):
+    """
+    Fonction : fonction génératrice qui ne lit dans le S3 que les intervalles d'octets donnés par un index
+    (une requête Range par intervalle) et renvoie telles quelles les lignes qui vérifient le filtre.
+
+    Arguments :
+    - s3 : client S3
+    - s3_object_name : chemin du fichier JSON dans le S3
+    - ranges : intervalles [début, fin[ à lire
+    - line_filter : filtre à appliquer (les périodes et les tuiles en bordure contiennent aussi des lignes hors des bornes)
+
+    Renvoit en yield :
+    - line : la ligne JSON (en octets)
+    """
+
+    for start, end in ranges:
+        s3_object = s3.get_object(Bucket=bucket_name, Key=s3_object_name, Range=f"bytes={start}-{end - 1}")
+        for line in s3_object['Body'].iter_lines():
+            if line and line_filter.matches(line):
+                yield line + b"\n"
+
+def generate_tiles(s3, index, line_filter):
+    """
+    Fonction : fonction génératrice qui lit, dans chaque fichier de l'index spatial (nouvelles mesures d'abord),
+    seulement les tuiles qui touchent l'emprise demandée.
+
+    Arguments :
+    - s3 : client S3
+    - index : index spatial
+    - line_filter : filtre à appliquer (contient l'emprise)
+
+    Renvoit en yield :
+    - line : la ligne JSON (en octets)
+    """
+    for entry in index["files"]:
+        ranges = ranges_for_bbox(entry, line_filter.bbox, index["tile_size"])
+        yield from generate_ranges(s3, entry["key"], ranges, line_filter)
 
-                # On essaye de le récupérer pour l'enregistrer dans notre base de données
-                try:
+def json_response(chunks, encoding=None, precompressed=False, output_format=None, dtypes=None):
+    """
+    Fonction : réponse JSON en streaming, compressée à la volée si le client accepte un encodage.
 
-                    # Dans le cas où filter_last_two_years=true alors on vérifie si la date de création de cette ligne est dans l'année n ou n-1
-                    data = json.loads(line)
+    Arguments :
+    - chunks : blocs ou lignes à envoyer
+    - encoding (par défaut : None) : encodage négocié ("gzip", "zstd") ou None
+    - precompressed (par défaut : False) : les blocs sont déjà compressés (variante précompressée du S3)
+    - output_format (par défaut : None) : format négocié ("ndjson", "csv", "arrow") si la route en propose plusieurs
+    - dtypes (par défaut : None) : types des colonnes des sorties CSV et Arrow (voir output_formats.table_dtypes)
 
-                    # Filtrage optionnel si on l'a précisé
-                    if filter_last_two_years:
+    Renvoie :
+    - response : la réponse Flask
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    mimetype = "application/json"
+    if output_format is not None:
+        headers["Vary"] = "Accept, Accept-Encoding"
+        mimetype = MEDIA_TYPES[output_format]
+        chunks = convert_stream(chunks, output_format, dtypes)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        if not precompressed:
+            chunks = compress_stream(chunks, encoding)
+    return Response(chunks, mimetype=mimetype, headers=headers)
+
+def open_object(s3, s3_object_name):
+    """
+    Fonction : accès au fichier complet : abonnement à une lecture du S3 qui vient de commencer pour une autre requête,
+    sinon copie du cache disque si son ETag est toujours celui du S3, sinon nouvelle lecture partagée du S3
+    (qui écrit aussi le fichier dans le cache).
 
-                        # Convertit la date en objet datetime
-                        date_mesure = datetime.datetime.fromisoformat(data["dateAndTimeOfCreation"].replace("Z", "+00:00"))
+    Arguments :
+    - s3 : client S3
+    - s3_object_name : chemin du fichier dans le S3
 
-                        # Condition dans les deux années
-                        if date_mesure.year in (annee_courante, annee_precedente):
-                            yield json.dumps(data) + "\n"
-                        else:
-                            break # On arrête l'extraction des données car on a atteint les mesures trop vieilles (ordre décroissante)
-                    
-                    # Si le filtrage n'est pas à appliquer, alors on le mets directement
-                    else:
-                        yield line.decode("utf-8") + "\n"
+    Renvoie :
+    - (path_cache, etag, abonnement) : chemin de la copie locale (ou None), son ETag, et abonnement (lecture, identifiant) sinon
 
-                except Exception as e:
-                    # En cas de problème de parsing JSON ou date, on passe cette ligne
-                    pass
+    Lève :
+    - ClientError si le fichier n'existe pas dans le S3
+    """
+    with broadcaster.opening(s3_object_name):
+        abonnement = broadcaster.join(s3_object_name)
+        if abonnement is not None:
+            return None, abonnement[0].etag, abonnement
+        path_cache, etag, s3_object = disk_cache.get(s3, bucket_name, s3_object_name)
+        if path_cache is None:
+            abonnement = broadcaster.start(s3_object_name, lambda: disk_cache.fill(s3_object_name, s3_object), etag)
+        return path_cache, etag, abonnement
+
+def json_page(s3, type, line_filter, sorted_desc, encoding, decoder=None, output_format="ndjson", dtypes=None):
+    """
+    Fonction : une page du fichier JSON (paramètres limit et cursor) : une seule requête Range au S3, à partir de la position
+    du curseur (ou du début de la fenêtre de dates donnée par l'index temporel pour la première page).
+    Le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor (absent sur la dernière page).
+
+    Arguments :
+    - s3 : client S3
+    - type : table demandée
+    - line_filter : filtre à appliquer
+    - sorted_desc : si les lignes sont triées par date décroissante, on s'arrête à la première trop ancienne
+    - encoding : encodage négocié ("gzip", "zstd") ou None
+    - decoder (par défaut : None) : JoinDecoder si la table détaillée est reconstruite (voir join_decoder)
+    - output_format (par défaut : "ndjson") : format de la réponse (voir output_formats.negotiate_format)
+    - dtypes (par défaut : None) : types des colonnes des sorties CSV et Arrow
+
+    Renvoie :
+    - response : la réponse Flask
+    """
+    stockage = type if decoder is None else CORE_TABLE # Fichier lu dans le S3 (le curseur reste celui de la table demandée)
+    s3_object_name = f"data/{stockage}.jsonl"
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        if request.args.get("cursor"):
+            start, end, etag = decode_cursor(request.args["cursor"], type)
+        else:
+            start, end, etag = 0, None, None
+            # Première page d'une fenêtre de dates : on part du premier octet indiqué par l'index temporel
+            if line_filter.has_date_window():
+                index = load_index(s3, f"data/{stockage}.index.json")
+                head = s3.head_object(Bucket=bucket_name, Key=s3_object_name)
+                if index is not None and head['ContentLength'] == index["size"]:
+                    ranges = ranges_for_window(index, line_filter.lower, line_filter.upper)
+                    start, end, etag = (min(s for s, _ in ranges), max(e for _, e in ranges), head['ETag']) if ranges else (0, 0, head['ETag'])
+    except ValueError as e:
+        return Response(f"Paramètre de pagination invalide : {e}", status=400)
+
+    try:
+        lines, next_offset, end, etag = read_page(s3, bucket_name, s3_object_name, start, end, etag, limit, line_filter, sorted_desc)
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("PreconditionFailed", "412"):
+            return Response("Le fichier a été actualisé depuis la première page : recommencer sans curseur", status=410)
+        if code in ("InvalidRange", "416"):
+            lines, next_offset = [], None # Fichier vide
+        else:
+            raise
+
+    msg = f"Page JSON de {type} à partir de l'octet {start} : {len(lines)} ligne(s)"
+    log_memory_usage(msg)
+    print(msg)
+
+    if decoder is not None:
+        lines = decoder.join_chunks(lines)
+    response = json_response(report_filter(lines, line_filter, type), encoding, output_format=output_format, dtypes=dtypes)
+    if next_offset is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(type, next_offset, end, etag)
+    return response
+
+def report_filter(lines, line_filter, type, count_rows=True):
+    """
+    Fonction : fonction génératrice qui transmet les lignes puis enregistre, à la fin du streaming (même interrompu),
+    le nombre de lignes lues, envoyées, filtrées et mal formées, et les ajoute aux mesures de la requête.
+
+    Arguments :
+    - lines : lignes ou blocs JSON (en octets, non compressés)
+    - line_filter : filtre appliqué
+    - type : table demandée
+    - count_rows (par défaut : True) : compter les lignes envoyées (impossible pour une variante précompressée)
+    """
+    envoyees = 0
+    try:
+        for bloc in lines:
+            if count_rows:
+                envoyees += bloc.count(b"\n")
+            yield bloc
+    finally:
+        requete = metrics.current_request()
+        if requete is not None and count_rows:
+            requete.add_rows(envoyees, None if line_filter.is_empty() else line_filter.stats["filtered"])
+        if not line_filter.is_empty():
+            stats = line_filter.stats
+            msg = (f"Filtrage {type} : {stats['read']} lues, {stats['sent']} envoyées, "
+                   f"{stats['filtered']} filtrées, {stats['malformed']} mal formées")
+            log_memory_usage(msg)
+            print(msg)
+
+@app.before_request
+def start_metrics():
+    """
+    Fonction : commence les mesures de la requête et la rattache au fil (pour lui attribuer les appels au S3 de la route).
+    """
+    start_warmup()
+    if request.path not in METRICS_EXCLUDED:
+        g.metrics = metrics.RequestMetrics(request.url_rule.rule if request.url_rule else None, request.path)
+        metrics.attach(g.metrics)
+
+@app.after_request
+def finish_metrics(response):
+    """
+    Fonction : fait suivre les mesures pendant le streaming de la réponse, et les enregistre à sa fin.
+    Les réponses en un bloc et les fichiers envoyés directement par le serveur (send_file, sans passage par l'application)
+    sont enregistrés tout de suite, avec leur taille.
+    """
+    requete = g.pop("metrics", None)
+    if requete is None:
+        return response
+    if response.is_streamed and not response.direct_passthrough:
+        response.response = requete.wrap(response.response, response.status_code)
+    else:
+        requete.record["bytes"] = response.content_length or 0
+        requete.finish(response.status_code)
+    return response
+
+@app.teardown_request
+def detach_metrics(exception=None):
+    """
+    Fonction : détache la requête du fil (le streaming la rattache à nouveau à chaque bloc).
+    """
+    metrics.attach(None)
 
 ##########################################-
 # Création des différentes routes 
 ##########################################-
 
+# Disponibilité du processus
+@app.route("/ready", methods=["GET"])
+def ready():
+    """
+    Fonction : sonde de disponibilité : 200 une fois le préchauffage terminé (ou désactivé, ou plus long que WARMUP_MAX_SECONDS),
+    503 pendant. Ne lit rien dans le S3 : renvoie la durée de chargement de l'application et celles des étapes du préchauffage.
+    """
+    en_cours = warmup["state"] == "running" and time.time() - warmup["started"] < WARMUP_MAX_SECONDS
+    resume = {"ready": not en_cours, "import_seconds": IMPORT_SECONDS, "uptime_seconds": round(time.time() - warmup["started"], 3),
+              "warmup": {cle: warmup[cle] for cle in ("state", "seconds", "steps", "errors")}}
+    return Response(json.dumps(resume), status=503 if en_cours else 200, mimetype="application/json")
+
 # Ajout d'une page main
 @app.route('/', methods=["GET"]) # Préciser les requêtes http possibles, sinon erreur 405 (si autre que GET)
 def index():
@@ -116,20 +474,17 @@ def memoire_utilisee():
     mem_used = get_memory_usage_mb()
     log_memory_usage(f"Consultation mémoire actuelle : {mem_used:.2f} MB")
 
-    # Récupérer les différents logs concernant l'extraction
-    if LOG_FILE :
-        logs = LOG_FILE.read_text(encoding="utf-8")
-    else:
-        logs = "Aucun log trouvé."
+    # Récupérer les dernières lignes des logs concernant l'extraction (le fichier n'est pas lu en entier)
+    logs = read_log_tail(MEMOIRE_MAX_LINES) or "Aucun log trouvé."
 
     # Ajout dans un HTML
-    html = f"""
+    html_page = f"""
         <h1>Utilisation mémoire actuelle : {mem_used:.2f} MB</h1>
-        <h2>Historique d'utilisation mémoire</h2>
-        <pre>{logs}</pre>
+        <h2>Historique d'utilisation mémoire ({MEMOIRE_MAX_LINES} dernières lignes)</h2>
+        <pre>{html.escape(logs)}</pre>
     """
 
-    return html
+    return html_page
 
 # Nettoyer le log
 @app.route("/memoire/reset", methods=["GET"])
@@ -137,10 +492,26 @@ def reset_log():
     """
     Fonction : Enlever tous les logs enregistrés jusqu'à maintenant
     """
-    if LOG_FILE.exists():
-        LOG_FILE.unlink()
+    truncate_log()
     return "<h1>Log mémoire réinitialisé</h1>"
 
+@app.route("/metrics", methods=["GET"])
+def metrics_page():
+    """
+    Fonction : mesures du processus au format texte de Prometheus, ou en JSON avec ?format=json
+    (paramètre optionnel limit : nombre de derniers enregistrements joints, requêtes et étapes).
+    Les étapes de la dernière actualisation sont lues dans le S3 (publiées par pipeline.py).
+    """
+    try:
+        limit = int(request.args.get("limit", "0"))
+    except ValueError:
+        return Response("limit doit être un entier", status=400)
+    etl = load_index(get_s3_client(), metrics.ETL_METRICS_KEY)
+    resume = metrics.snapshot(limit=max(limit, 0), etl=etl)
+    if request.args.get("format") == "json":
+        return Response(json.dumps(resume), mimetype="application/json")
+    return Response(metrics.render_prometheus(resume), mimetype="text/plain; version=0.0.4")
+
 # Api pour récupérer les mesures d'OpenRadiation
 #@profile
 @app.route('/api/data/<type>', methods=["GET"])
@@ -149,43 +520,99 @@ def streaming_json(type):
     Fonction : permet d'avvoir les données JSON selon le type d'extraction que veut l'utilisateur parmi openradiation, measurements, devices, apparatus et flight.
     Selon le type d'extraction, plusieurs filtrages peuvent être utilisées.
 
-    Retour : résultat JSON de la requête HTTP
+    Retour : résultat JSON de la requête HTTP (ou CSV, flux Arrow IPC selon le paramètre format ou l'en-tête Accept)
     """
 
-    # Pour savoir si on peut utiliser ou non le paramètre optionnel
-    if type in ('openradiation', 'measurements'):
-        # Lecture du paramètre de requête (par défaut False)
-        filter_last_two_years = request.args.get("filter_last_two_years", "false").lower() == "true"
-
-    else:
-        filter_last_two_years = False
+    # Filtres optionnels selon le type d'extraction : from/to ou filter_last_two_years, bbox, identifiants, seuils sur la valeur
+    try:
+        line_filter = build_line_filter(request.args, type)
+    except ValueError as e:
+        return Response(f"Paramètre de filtrage invalide : {e}", status=400)
+    filter_last_two_years = request.args.get("filter_last_two_years", "false").lower() == "true"
+
+    # Format de la réponse : paramètre format, sinon en-tête Accept (NDJSON par défaut, CSV ou flux Arrow IPC)
+    try:
+        output_format = negotiate_format(request.args.get("format"), request.headers.get("Accept"))
+    except ValueError as e:
+        return Response(f"Paramètre de format invalide : {e}", status=400)
+
+    # Encodage de la réponse selon l'en-tête Accept-Encoding du client (zstd, gzip ou aucun)
+    encoding = negotiate(request.headers.get("Accept-Encoding"))
     
-    # Création du client S3
-    s3 = boto3.client(
-        's3',
-        region_name=os.environ['AWS_REGION'],
-        aws_access_key_id=os.environ["AWS_ACCESS_KEY_ID"],
-        aws_secret_access_key=os.environ["AWS_SECRET_ACCESS_KEY"]
-    )
+    # Client S3 partagé par le processus (connexions réutilisées d'une requête à l'autre)
+    s3 = get_s3_client()
+
+    # Types des colonnes des sorties CSV et Arrow : ceux de la dernière actualisation
+    dtypes = table_dtypes(load_index(s3, S3_MANIFEST)) if output_format != "ndjson" else None
+
+    # Table détaillée publiée sans les colonnes des appareils et des vols : elles sont remises dans chaque ligne envoyée
+    decoder = join_decoder(s3) if type == "openradiation" else None
+    stockage = type if decoder is None else CORE_TABLE
 
     # Récupérons maintenant les données
-    s3_object_name = f"data/{type}.jsonl" # Chemin pour mettre le fichier JSON dans le S3
-    
-    # Calcul de la date limite si filtrage actif
-    if filter_last_two_years:
-        now = datetime.datetime.now(datetime.timezone.utc)
-        annee_courante = now.year
-        annee_precedente = annee_courante - 1
-    else :
-        annee_courante = 0
-        annee_precedente = 0
-
-    # Récupération du fichier S3 et du corps du fichier
-    s3_object = s3.get_object(Bucket=bucket_name, Key=s3_object_name)
-    s3_body = s3_object['Body']
+    s3_object_name = f"data/{stockage}.jsonl" # Chemin pour mettre le fichier JSON dans le S3
+
+    # Pagination : une page de limit lignes, et le curseur de la page suivante
+    if "limit" in request.args or "cursor" in request.args:
+        if request.args.get("columns"):
+            return Response("La pagination n'est pas disponible avec le paramètre columns", status=400)
+        return json_page(s3, type, line_filter, filter_last_two_years, encoding, decoder, output_format, dtypes)
+
+    # Colonnes demandées : lecture du jeu Parquet (seuls les partitions, groupes de lignes et colonnes utiles sont lus)
+    if request.args.get("columns"):
+        index = load_index(s3, index_key(type))
+        if index is None:
+            return Response(f"Jeu Parquet indisponible pour {type}", status=404)
+        colonnes = [col.strip() for col in request.args["columns"].split(",") if col.strip()]
+        inconnues = [col for col in colonnes if col not in index["columns"]]
+        if inconnues:
+            return Response(f"Colonnes inconnues : {', '.join(inconnues)}", status=400)
+
+        msg = f"Streaming JSON de {type} depuis Parquet : colonnes {colonnes}, entre {line_filter.lower} et {line_filter.upper}"
+        log_memory_usage(msg)
+        print(msg)
+        return json_response(report_filter(generate_parquet(s3, bucket_name, index, line_filter, colonnes), line_filter, type), encoding,
+                             output_format=output_format, dtypes=dtypes)
+
+    # Emprise : on ne lit que les tuiles de l'index spatial qui la touchent, si les fichiers correspondent bien
+    if line_filter.bbox is not None:
+        index = load_index(s3, S3_TILES_INDEX)
+        if index is not None and all(s3.head_object(Bucket=bucket_name, Key=entry["key"])['ContentLength'] == entry["size"]
+                                     for entry in index["files"]):
+            msg = f"Streaming JSON de {type} dans l'emprise {line_filter.bbox} entre {line_filter.lower} et {line_filter.upper}"
+            log_memory_usage(msg)
+            print(msg)
+            return json_response(report_filter(generate_tiles(s3, index, line_filter), line_filter, type), encoding,
+                                 output_format=output_format, dtypes=dtypes)
+
+    # Fenêtre de dates : on ne lit que les octets indiqués par l'index temporel, s'il correspond bien au fichier
+    elif line_filter.has_date_window():
+        index = load_index(s3, f"data/{stockage}.index.json")
+        if index is not None and s3.head_object(Bucket=bucket_name, Key=s3_object_name)['ContentLength'] == index["size"]:
+            ranges = ranges_for_window(index, line_filter.lower, line_filter.upper)
+            msg = (f"Streaming JSON de {type} entre {line_filter.lower} et {line_filter.upper} : "
+                   f"{len(ranges)} intervalle(s), {sum(e - s for s, e in ranges)} octets")
+            log_memory_usage(msg)
+            print(msg)
+            lines = generate_ranges(s3, s3_object_name, ranges, line_filter)
+            if decoder is not None:
+                lines = decoder.join_chunks(lines)
+            return json_response(report_filter(lines, line_filter, type), encoding, output_format=output_format, dtypes=dtypes)
+
+    # Sans filtre, un client qui accepte la compression reçoit la variante précompressée du S3 telle quelle
+    # (aucune variante pour une table reconstruite ou une sortie CSV ou Arrow)
+    variante = None
+    if line_filter.is_empty() and encoding is not None and decoder is None and output_format == "ndjson":
+        try:
+            path_cache, etag, abonnement = open_object(s3, s3_object_name + VARIANT_SUFFIXES[encoding])
+            s3_object_name, variante = s3_object_name + VARIANT_SUFFIXES[encoding], encoding
+        except ClientError:
+            pass # Variante pas encore publiée : fichier JSON compressé à la volée
+    if variante is None:
+        path_cache, etag, abonnement = open_object(s3, s3_object_name)
 
     mem = get_memory_usage_mb()
-    msg = f"Mémoire utilisée pour la récupération du JSON : {mem:.2f}"
+    msg = f"Mémoire utilisée (RSS actuelle) pour la récupération du JSON : {mem:.2f} MB ({'cache disque' if path_cache else 'S3'})"
     log_memory_usage(msg)
     print(msg)
 
@@ -193,9 +620,149 @@ def streaming_json(type):
     print(msg)
     log_memory_usage(msg)
 
-    # Retourne les données en streaming
-    return Response(generate(s3_body, filter_last_two_years, 
-                             annee_courante, annee_precedente), mimetype="application/json")
+    if path_cache is not None:
+        # Sans filtre : la copie locale est envoyée directement (sendfile si le serveur le permet)
+        if line_filter.is_empty() and decoder is None and output_format == "ndjson":
+            response = send_file(path_cache, mimetype="application/json", etag=etag.strip('"'), conditional=True)
+            response.headers["Vary"] = "Accept, Accept-Encoding"
+            if variante is not None:
+                response.headers["Content-Encoding"] = variante
+            return response
+        from botocore.response import StreamingBody
+        s3_body = StreamingBody(open(path_cache, "rb"), path_cache.stat().st_size)
+    else:
+        lecture, identifiant = abonnement
+
+        def fallback(position):
+            """
+            Fonction : suite du fichier à partir d'une position, lue à part par un client trop lent pour la lecture partagée.
+            """
+            suite = s3.get_object(Bucket=bucket_name, Key=s3_object_name, Range=f"bytes={position}-", IfMatch=lecture.etag)
+            return suite['Body'].iter_chunks(STREAM_CHUNK_SIZE)
+
+        s3_body = ChunkBody(lecture.stream(identifiant, fallback))
+
+    # Retourne les données en streaming (parcours complet, avec filtrage éventuel)
+    lines = generate(s3_body, line_filter, filter_last_two_years)
+    if decoder is not None:
+        lines = decoder.join_chunks(lines)
+    return json_response(report_filter(lines, line_filter, type, count_rows=variante is None),
+                         encoding, precompressed=variante is not None, output_format=output_format, dtypes=dtypes)
+
+@app.route("/api/stats", methods=["GET"])
+def stats_list():
+    """
+    Fonction : liste des tables de statistiques précalculées des mesures et date de leur calcul.
+    """
+    s3 = get_s3_client()
+    resume = {}
+    for kind in STATS_KINDS:
+        table = load_index(s3, stats_key(kind))
+        if table is not None:
+            resume[kind] = {"generated": table["generated"], "rows": len(table["rows"]), "url": f"/api/stats/{kind}"}
+    return Response(json.dumps(resume), mimetype="application/json")
+
+@app.route("/api/stats/<kind>", methods=["GET"])
+def stats_table(kind):
+    """
+    Fonction : table de statistiques précalculée par l'actualisation (daily, cells, apparatus ou devices),
+    gardée en mémoire pendant INDEX_TTL secondes. Paramètres optionnels : from/to (daily), bbox (cells),
+    apparatusId ou deviceUuid (apparatus, devices) et limit.
+
+    Retour : résultat JSON de la requête HTTP
+    """
+    if kind not in STATS_KINDS:
+        return Response(f"Statistiques inconnues : {kind} (parmi {', '.join(STATS_KINDS)})", status=404)
+    table = load_index(get_s3_client(), stats_key(kind))
+    if table is None:
+        return Response(f"Statistiques {kind} pas encore calculées", status=404)
+
+    try:
+        rows = select_rows(kind, table, request.args)
+    except ValueError as e:
+        return Response(f"Paramètre invalide : {e}", status=400)
+
+    resultat = {key: value for key, value in table.items() if key != "rows"}
+    resultat["rows"] = rows
+    return Response(json.dumps(resultat), mimetype="application/json")
+
+@app.route("/api/<any(devices, apparatus, flight):table>/<id>", methods=["GET"])
+def lookup_record(table, id):
+    """
+    Fonction : détails d'un appareil (devices, apparatus) ou d'un vol (flight), lus dans la base des recherches
+    par identifiant (recherche par clé primaire, sans parcourir la table).
+
+    Retour : la ligne JSON de l'appareil ou du vol
+    """
+    try:
+        value = parse_key(DIMENSION_KEYS[table], id)
+    except ValueError as e:
+        return Response(f"Identifiant invalide : {e}", status=400)
+
+    con = lookup_db.connect(get_s3_client(), bucket_name)
+    if con is None:
+        return Response("Base des recherches pas encore publiée", status=503)
+    try:
+        line = find_record(con, table, value)
+    finally:
+        con.close()
+
+    if line is None:
+        return Response(f"{DIMENSION_KEYS[table]} inconnu : {id}", status=404)
+    return Response(line, mimetype="application/json")
+
+@app.route("/api/<any(devices, apparatus, flight, users):table>/<id>/measurements", methods=["GET"])
+def lookup_measurements(table, id):
+    """
+    Fonction : mesures d'un appareil, d'un vol ou d'un utilisateur par date de création décroissante, lues dans
+    la base des recherches par l'index de l'identifiant. Paramètres optionnels : from/to, et limit/cursor pour
+    une page (le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor).
+
+    Retour : résultat JSON de la requête HTTP (une mesure par ligne)
+    """
+    key = MEASUREMENT_KEYS[table]
+    try:
+        value = parse_key(key, id)
+        lower, upper = parse_date_bounds(request.args.get("from"), request.args.get("to"))
+        paginee = "limit" in request.args or "cursor" in request.args
+        limit = parse_limit(request.args.get("limit")) if paginee else None
+        after = decode_lookup_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except ValueError as e:
+        return Response(f"Paramètre invalide : {e}", status=400)
+
+    con = lookup_db.connect(get_s3_client(), bucket_name)
+    if con is None:
+        return Response("Base des recherches pas encore publiée", status=503)
+
+    msg = f"Mesures de {key}={value} depuis la base des recherches, entre {lower} et {upper}"
+    log_memory_usage(msg)
+    print(msg)
+
+    encoding = negotiate(request.headers.get("Accept-Encoding"))
+    cursor = select_measurements(con, key, value, lower, upper, limit, after)
+    if limit is None:
+        return json_response(report_filter(generate_rows(con, cursor), LineFilter(), "measurements"), encoding)
+
+    # Page : ses lignes sont lues d'un coup pour connaître le curseur de la suivante
+    try:
+        rows = cursor.fetchall()
+    finally:
+        con.close()
+    lines = ["".join(row[2] + "\n" for row in rows).encode("utf-8")] if rows else []
+    response = json_response(report_filter(lines, LineFilter(), "measurements"), encoding)
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_lookup_cursor(rows[-1][1], rows[-1][0])
+    return response
+
+@app.route("/cache", methods=["GET"])
+def cache_stats():
+    """
+    Fonction : compteurs du cache disque (succès, échecs, revalidations, évictions), place occupée
+    et compteurs des lectures partagées du S3 (lectures lancées, requêtes abonnées à une lecture en cours).
+    """
+    resume = disk_cache.summary()
+    resume["broadcast"] = dict(broadcaster.stats)
+    return Response(json.dumps(resume), mimetype="application/json")
 
 @app.route('/s3-url/<type>', methods=["GET"])
 def generate_signed_url(type):
@@ -203,21 +770,23 @@ def generate_signed_url(type):
     Fonction : permet de générer une URL du S3 avec accès et de récupérer le fichier JSON en question (cela le télécharge directement)
     """
 
+    # Table détaillée publiée sans les colonnes des appareils et des vols : seule l'API la reconstruit
+    if type == "openradiation" and join_decoder(get_s3_client()) is not None:
+        return redirect(url_for("streaming_json", type=type))
+
     # Récupérons maintenant les données
     s3_object_name = f"data/{type}.jsonl" # Chemin pour mettre le fichier JSON dans le S3
 
-    # Client boto3
-    s3 = boto3.client('s3', region_name=os.environ['AWS_REGION'])
+    # Variante compressée si le client l'accepte (le S3 la sert avec l'en-tête Content-Encoding correspondant)
+    encoding = negotiate(request.headers.get("Accept-Encoding"))
+    if encoding is not None and variant_exists(get_s3_client(), s3_object_name + VARIANT_SUFFIXES[encoding]):
+        s3_object_name += VARIANT_SUFFIXES[encoding]
 
-    # Permet de générer une URL temporairer pour télécharger le fichier
-    url = s3.generate_presigned_url(
-        'get_object',
-        Params={'Bucket': bucket_name, 'Key': s3_object_name},
-        ExpiresIn=EXPIRES_IN
-    )
+    # Permet de générer une URL temporairer pour télécharger le fichier (réutilisée pendant la majeure partie de sa validité)
+    url = presigned_url(bucket_name, s3_object_name, EXPIRES_IN)
 
     mem = get_memory_usage_mb()
-    msg = f"Mémoire utilisée pour la récupération du JSON : {mem:.2f}"
+    msg = f"Mémoire utilisée (RSS actuelle) pour la récupération du JSON : {mem:.2f} MB"
     log_memory_usage(msg)
     print(msg)
 
@@ -226,9 +795,15 @@ def generate_signed_url(type):
     print(msg)
 
     # Retourne l'URL générer temporairement
-    return redirect(url)
+    response = redirect(url)
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
 #################################-
 #################################-
 
+# Durée de chargement de l'application, puis préchauffage en arrière-plan
+IMPORT_SECONDS = round(time.perf_counter() - IMPORT_STARTED, 3)
+start_warmup()
+
 if __name__=="__main__":
     app.run(debug=True)
\ No newline at end of file
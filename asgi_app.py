@@ -0,0 +1,250 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Service asynchrone (ASGI) de l'application Flask : beaucoup de téléchargements longs simultanés dans un seul processus
+###################-
+
+# Lancement : uvicorn asgi_app:application --host 0.0.0.0 --port $PORT
+#
+# Les routes et les réponses sont celles de app.py. Seule la façon de servir change :
+# - une réponse en cours n'occupe pas de fil ni de worker : les lectures bloquantes (S3, disque, filtrage) d'un bloc
+#   sont faites dans un groupe de ASGI_THREADS fils partagé, puis le fil est rendu ;
+# - le bloc suivant n'est lu qu'une fois le précédent accepté par le client (contre-pression : un client lent
+#   ne fait pas grossir la mémoire, il ralentit seulement sa propre lecture) ;
+# - au plus ASGI_MAX_STREAMS réponses sont servies en même temps, les suivantes attendent une place
+#   pendant ASGI_QUEUE_SECONDS secondes puis reçoivent une erreur 503.
+
+# Chargement des librairies
+import io
+import os
+import sys
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.wsgi import FileWrapper
+from app import app, STREAM_CHUNK_SIZE
+from logger_write import log_memory_usage
+
+# Configuration du service asynchrone
+ASGI_MAX_STREAMS = int(os.environ.get("ASGI_MAX_STREAMS", "500")) # Réponses servies en même temps
+ASGI_QUEUE_SECONDS = float(os.environ.get("ASGI_QUEUE_SECONDS", "10")) # Attente maximale d'une place avant l'erreur 503
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", "16")) # Fils pour les lectures bloquantes
+ASGI_BATCH_BYTES = STREAM_CHUNK_SIZE # Octets regroupés avant un envoi au client
+ASGI_BATCH_SECONDS = 0.25 # Durée maximale de regroupement (réponses filtrées où peu de lignes sont gardées)
+
+executor = None
+streams = None
+stats = {"served": 0, "active": 0, "peak": 0, "refused": 0, "disconnected": 0}
+
+class ChunkFileWrapper(FileWrapper):
+    """
+    Classe : fichier envoyé par send_file (cache disque), lu par blocs de STREAM_CHUNK_SIZE octets au lieu de 8 KB.
+    """
+
+    def __init__(self, file, buffer_size=8192):
+        super().__init__(file, max(buffer_size, STREAM_CHUNK_SIZE))
+
+def wsgi_environ(scope, body):
+    """
+    Fonction : traduit une requête ASGI en environnement WSGI pour l'application Flask.
+
+    Arguments :
+    - scope : description ASGI de la requête
+    - body : corps de la requête (en octets)
+
+    Renvoie :
+    - environ : environnement WSGI
+    """
+    serveur = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": serveur[0],
+        "SERVER_PORT": str(serveur[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        "wsgi.file_wrapper": ChunkFileWrapper,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+
+    for nom, valeur in scope.get("headers", []):
+        nom = nom.decode("latin-1").upper().replace("-", "_")
+        valeur = valeur.decode("latin-1")
+        if nom not in ("CONTENT_LENGTH", "CONTENT_TYPE"):
+            nom = "HTTP_" + nom
+        environ[nom] = f"{environ[nom]},{valeur}" if nom in environ else valeur
+    return environ
+
+def start_wsgi(environ):
+    """
+    Fonction : appelle l'application Flask (dans un fil du groupe) et récupère le statut, les en-têtes et les blocs de la réponse.
+
+    Arguments :
+    - environ : environnement WSGI de la requête
+
+    Renvoie :
+    - reponse : dictionnaire rempli par start_response (status, headers)
+    - iterable : blocs de la réponse
+    """
+    reponse = {}
+
+    def start_response(status, headers, exc_info=None):
+        reponse["status"] = int(status.split(" ", 1)[0])
+        reponse["headers"] = headers
+
+    return reponse, app(environ, start_response)
+
+def next_batch(iterateur):
+    """
+    Fonction : lit (dans un fil du groupe) les blocs suivants de la réponse, jusqu'à ASGI_BATCH_BYTES octets
+    ou ASGI_BATCH_SECONDS secondes.
+
+    Arguments :
+    - iterateur : itérateur des blocs de la réponse
+
+    Renvoie :
+    - data : octets à envoyer
+    - fini : True si la réponse est entièrement lue
+    """
+    blocs = []
+    taille = 0
+    debut = time.monotonic()
+    while taille < ASGI_BATCH_BYTES and time.monotonic() - debut < ASGI_BATCH_SECONDS:
+        bloc = next(iterateur, None)
+        if bloc is None:
+            return b"".join(blocs), True
+        if bloc:
+            blocs.append(bloc)
+            taille += len(bloc)
+    return (blocs[0] if len(blocs) == 1 else b"".join(blocs)), False
+
+async def read_body(receive):
+    """
+    Fonction : lit le corps de la requête.
+
+    Arguments :
+    - receive : fonction ASGI de réception
+
+    Renvoie :
+    - body : corps de la requête (en octets)
+    """
+    morceaux = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        morceaux.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(morceaux)
+
+async def send_error(send, status, texte, headers=()):
+    """
+    Fonction : envoie une réponse texte courte (erreur).
+    """
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8"), *headers]})
+    await send({"type": "http.response.body", "body": texte.encode("utf-8")})
+
+async def serve(scope, receive, send, body):
+    """
+    Fonction : sert une requête avec l'application Flask, bloc par bloc, sans garder de fil entre deux blocs.
+
+    Arguments :
+    - scope : description ASGI de la requête
+    - receive : fonction ASGI de réception (pour repérer la déconnexion du client)
+    - send : fonction ASGI d'envoi
+    - body : corps de la requête (en octets)
+    """
+    loop = asyncio.get_running_loop()
+    reponse, iterable = await loop.run_in_executor(executor, start_wsgi, wsgi_environ(scope, body))
+
+    # Un client qui se déconnecte arrête la lecture (et libère sa connexion au S3)
+    deconnecte = asyncio.Event()
+
+    async def surveiller():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        deconnecte.set()
+
+    surveillance = asyncio.create_task(surveiller())
+    iterateur = iter(iterable)
+    lecture = None
+    try:
+        lecture = loop.run_in_executor(executor, next_batch, iterateur)
+        data, fini = await asyncio.shield(lecture)
+        await send({"type": "http.response.start", "status": reponse["status"],
+                    "headers": [(nom.lower().encode("latin-1"), valeur.encode("latin-1")) for nom, valeur in reponse["headers"]]})
+        while not deconnecte.is_set():
+            await send({"type": "http.response.body", "body": data, "more_body": not fini})
+            if fini:
+                return
+            lecture = loop.run_in_executor(executor, next_batch, iterateur)
+            data, fini = await asyncio.shield(lecture)
+        stats["disconnected"] += 1
+    except OSError:
+        stats["disconnected"] += 1
+    finally:
+        surveillance.cancel()
+        # La lecture en cours (requête annulée) se termine avant la fermeture de la réponse
+        if lecture is not None and not lecture.done():
+            await asyncio.wait([lecture])
+        if hasattr(iterable, "close"):
+            await loop.run_in_executor(executor, iterable.close)
+
+async def application(scope, receive, send):
+    """
+    Fonction : point d'entrée ASGI (uvicorn asgi_app:application).
+
+    Arguments :
+    - scope : description ASGI de la connexion
+    - receive : fonction ASGI de réception
+    - send : fonction ASGI d'envoi
+    """
+    global executor, streams
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    # Créés au premier appel, dans le processus (et la boucle) qui sert les requêtes
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="asgi")
+        streams = asyncio.Semaphore(ASGI_MAX_STREAMS)
+
+    body = await read_body(receive)
+    try:
+        await asyncio.wait_for(streams.acquire(), ASGI_QUEUE_SECONDS)
+    except asyncio.TimeoutError:
+        stats["refused"] += 1
+        msg = f"Service asynchrone : {ASGI_MAX_STREAMS} réponses déjà en cours, requête {scope['path']} refusée"
+        log_memory_usage(msg)
+        print(msg)
+        await send_error(send, 503, "Serveur occupé, réessayer plus tard", [(b"retry-after", b"5")])
+        return
+
+    stats["active"] += 1
+    stats["peak"] = max(stats["peak"], stats["active"])
+    try:
+        await serve(scope, receive, send, body)
+    finally:
+        stats["active"] -= 1
+        stats["served"] += 1
+        streams.release()
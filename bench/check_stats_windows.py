@@ -0,0 +1,80 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Vérification des fenêtres de dates de /api/stats/daily : mêmes bornes from/to que /api/data (time_index.in_bounds)
+###################-
+
+# Exemple : python bench/check_stats_windows.py
+#
+# Pour chaque cas (date seule, date et heure, fuseau horaire, borne d'un seul côté, fenêtre vide), les journées retenues
+# par stats_tables.select_rows doivent être exactement celles qui contiennent au moins un instant retenu par
+# time_index.in_bounds (le filtre des lignes de /api/data) ; le script se termine en erreur sinon.
+
+# Chargement des librairies
+import sys
+import datetime
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+from time_index import parse_date_bounds, in_bounds
+from stats_tables import select_rows
+
+# Journées de la table (du 1er au 10 janvier 2024) et paramètres from/to vérifiés
+DAYS = [(datetime.date(2024, 1, 1) + datetime.timedelta(days=i)).isoformat() for i in range(10)]
+CASES = [
+    {"to": "2024-01-05"},
+    {"from": "2024-01-05"},
+    {"from": "2024-01-05", "to": "2024-01-05"},
+    {"from": "2024-01-03", "to": "2024-01-06"},
+    {"from": "2024-01-03T12:00:00", "to": "2024-01-06T08:30:00"},
+    {"to": "2024-01-05T00:00:00"},
+    {"to": "2024-01-04T23:59:59"},
+    {"from": "2024-01-05T23:59:59"},
+    {"from": "2024-01-05T00:00:00+02:00", "to": "2024-01-06T01:00:00+02:00"},
+    {"from": "2024-01-06", "to": "2024-01-04"},
+    {"from": "2023-12-01", "to": "2024-02-01"},
+]
+
+def expected_days(lower, upper):
+    """
+    Fonction : journées qui contiennent au moins un instant retenu par in_bounds. La fenêtre étant d'un seul tenant,
+    il suffit de tester le début et la fin de chaque journée, et les bornes elles-mêmes quand elles y tombent.
+
+    Arguments :
+    - lower : borne inférieure incluse (voir parse_date_bounds)
+    - upper : borne supérieure exclue (voir parse_date_bounds)
+
+    Renvoie :
+    - days : liste des journées retenues
+    """
+    derniere = None
+    if upper is not None:
+        derniere = (datetime.datetime.fromisoformat(upper) - datetime.timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%S")
+    days = []
+    for day in DAYS:
+        instants = [f"{day}T00:00:00", f"{day}T23:59:59"] + [b for b in (lower, derniere) if b is not None and b[:10] == day]
+        if any(in_bounds(instant, lower, upper) for instant in instants):
+            days.append(day)
+    return days
+
+def run():
+    """
+    Fonction : compare les journées de select_rows à celles de in_bounds pour chaque cas.
+
+    Renvoie :
+    - ok : True si tous les cas sont identiques
+    """
+    table = {"rows": [{"day": day, "count": 1} for day in DAYS]}
+    ok = True
+    for args in CASES:
+        lower, upper = parse_date_bounds(args.get("from"), args.get("to"))
+        obtenu = [row["day"] for row in select_rows("daily", table, args)]
+        attendu = expected_days(lower, upper)
+        identique = obtenu == attendu
+        ok = ok and identique
+        print(f"{'ok' if identique else 'DIFFÉRENT':<10} {args} -> {obtenu}" + ("" if identique else f" (attendu {attendu})"))
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,168 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Mesure du démarrage à froid de l'API (chargement, disponibilité, première requête), avec et sans préchauffage
+###################-
+
+# Exemple : python bench/run_benchmarks.py --rows 1e5 --keep    (remplit le S3 local de bench/work/run/s3)
+#           python bench/cold_start.py --s3-root bench/work/run/s3 --runs 5
+#
+# Pour chaque passage, l'API est lancée dans un nouveau processus (cache disque vide), puis on mesure :
+# - import_seconds : chargement de l'application (renvoyé par /ready) ;
+# - listen_s : du lancement du processus à sa première réponse HTTP (/ready, quel que soit son statut) ;
+# - ready_s : du lancement à /ready en 200 (préchauffage terminé) ;
+# - first_ttfb_s : premier octet de la première requête --path, envoyée dès la première réponse
+#   (instance qui se réveille pour une requête), ou une fois /ready en 200 avec --wait-ready ;
+# - first_from_spawn_s : du lancement au premier octet de cette requête (l'attente du premier client) ;
+# - second_ttfb_s : premier octet de la même requête, processus chaud.
+# Les passages sont faits avec APP_WARMUP=false puis APP_WARMUP=true et leurs médianes comparées.
+# Sans --s3-root, le S3 est celui de l'environnement (S3_ENDPOINT_URL, S3_BUCKET_NAME, identifiants...).
+
+# Chargement des librairies
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import statistics
+import subprocess
+import http.client
+from pathlib import Path
+from datetime import datetime, timezone
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+MEASURES = ("import_seconds", "listen_s", "ready_s", "first_ttfb_s", "first_from_spawn_s", "second_ttfb_s")
+
+sys.path.insert(0, str(BENCH_DIR))
+from run_benchmarks import free_port, fetch, start_local_s3, api_command, peak_rss_mb, git_commit, BUCKET
+
+def poll(port, path, debut, ok_only=False, timeout=120):
+    """
+    Fonction : interroge une route jusqu'à obtenir une réponse (ou une réponse 200 avec ok_only).
+
+    Arguments :
+    - port : port de l'API
+    - path : route interrogée
+    - debut : instant du lancement du processus (time.perf_counter)
+    - ok_only (par défaut : False) : attendre le statut 200
+    - timeout (par défaut : 120) : attente maximale en secondes
+
+    Renvoie :
+    - (secondes depuis le lancement, corps JSON de la réponse)
+    """
+    while time.perf_counter() - debut < timeout:
+        connexion = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        try:
+            connexion.request("GET", path)
+            reponse = connexion.getresponse()
+            corps = reponse.read()
+            if reponse.status == 200 or not ok_only:
+                return time.perf_counter() - debut, json.loads(corps or b"{}")
+        except (OSError, ValueError):
+            pass
+        finally:
+            connexion.close()
+        time.sleep(0.01)
+    raise RuntimeError(f"Pas de réponse de {path} en {timeout} s")
+
+def cold_start(server, env, path, wait_ready, workdir):
+    """
+    Fonction : lance l'API dans un nouveau processus, mesure son démarrage puis l'arrête.
+
+    Arguments :
+    - server : "uvicorn" ou "gunicorn"
+    - env : variables d'environnement du processus
+    - path : requête mesurée
+    - wait_ready : envoyer la première requête une fois /ready en 200 (sinon dès la première réponse)
+    - workdir : dossier de travail (cache disque de l'API, vidé avant le lancement)
+
+    Renvoie :
+    - mesure : dictionnaire des durées (voir MEASURES) et pic mémoire du serveur
+    """
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir(parents=True)
+    port = free_port()
+    debut = time.perf_counter()
+    processus = subprocess.Popen(api_command(server, port), cwd=workdir, env={**env, "PYTHONPATH": str(REPO_DIR)})
+    try:
+        listen, _ = poll(port, "/ready", debut)
+        if wait_ready:
+            poll(port, "/ready", debut, ok_only=True)
+        depart = time.perf_counter() - debut
+        premiere = fetch(port, path)
+        ready, etat = poll(port, "/ready", debut, ok_only=True)
+        seconde = fetch(port, path)
+        if premiere["status"] != 200 or seconde["status"] != 200:
+            raise RuntimeError(f"{path} : statuts {premiere['status']}, {seconde['status']}")
+        return {"import_seconds": etat["import_seconds"], "listen_s": round(listen, 4), "ready_s": round(ready, 4),
+                "first_ttfb_s": premiere["ttfb_s"], "first_from_spawn_s": round(depart + premiere["ttfb_s"], 4),
+                "second_ttfb_s": seconde["ttfb_s"], "warmup": etat["warmup"], "peak_rss_mb": peak_rss_mb(processus.pid)}
+    finally:
+        processus.terminate()
+        processus.wait()
+
+def run(args):
+    """
+    Fonction : exécute les passages avec et sans préchauffage et affiche leurs médianes.
+
+    Renvoie :
+    - run : résultats (médianes et passages de chaque mode)
+    """
+    s3_process = None
+    env = dict(os.environ)
+    if args.s3_root:
+        s3_process, s3_url = start_local_s3(Path(args.s3_root).resolve(), args.latency_ms)
+        env.update({"S3_ENDPOINT_URL": s3_url, "S3_BUCKET_NAME": BUCKET, "AWS_ACCESS_KEY_ID": "bench",
+                    "AWS_SECRET_ACCESS_KEY": "bench", "AWS_REGION": "us-east-1"})
+    resultats = {}
+    try:
+        for warmup in ("false", "true"):
+            passages = []
+            for i in range(args.runs):
+                mesure = cold_start(args.server, {**env, "APP_WARMUP": warmup}, args.path, args.wait_ready,
+                                    Path(args.workdir).resolve())
+                passages.append(mesure)
+                print(f"[cold] APP_WARMUP={warmup} #{i + 1} : " + ", ".join(f"{nom} {mesure[nom]:.3f}" for nom in MEASURES), flush=True)
+            resultats[f"warmup_{warmup}"] = {
+                "median": {nom: round(statistics.median(p[nom] for p in passages), 4) for nom in MEASURES},
+                "runs": passages,
+            }
+    finally:
+        if s3_process is not None:
+            s3_process.terminate()
+            s3_process.wait()
+        shutil.rmtree(args.workdir, ignore_errors=True)
+
+    print(f"\nMédianes sur {args.runs} passage(s), requête {args.path}" + (" (après /ready)" if args.wait_ready else ""))
+    print(f"  {'':<20}" + "".join(f"{mode:>16}" for mode in resultats))
+    for nom in MEASURES:
+        print(f"  {nom:<20}" + "".join(f"{resultats[mode]['median'][nom] * 1000:>13.1f} ms" for mode in resultats))
+
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "settings": {"server": args.server, "path": args.path, "wait_ready": args.wait_ready, "runs": args.runs,
+                     "latency_ms": args.latency_ms},
+        "results": resultats,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure du démarrage à froid de l'API.")
+    parser.add_argument("--server", choices=("uvicorn", "gunicorn"), default="gunicorn", help="serveur de l'API")
+    parser.add_argument("--path", default="/api/data/measurements?limit=100", help="requête mesurée")
+    parser.add_argument("--runs", type=int, default=3, help="passages par mode (avec et sans préchauffage)")
+    parser.add_argument("--wait-ready", action="store_true", help="envoyer la première requête une fois /ready en 200")
+    parser.add_argument("--s3-root", default=None, help="dossier du S3 local rempli par run_benchmarks.py --keep")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="délai ajouté à chaque réponse du S3 local")
+    parser.add_argument("--workdir", default=str(BENCH_DIR / "work" / "cold"), help="dossier de travail (vidé à chaque passage)")
+    parser.add_argument("--results", default=str(BENCH_DIR / "cold_start.json"), help="fichier JSON des résultats")
+    args = parser.parse_args()
+
+    resultat = run(args)
+    path = Path(args.results)
+    historique = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"runs": []}
+    historique["runs"].append(resultat)
+    path.write_text(json.dumps(historique, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nRésultats ajoutés à {path}")
@@ -0,0 +1,311 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Vérification du schéma compact (schema.py) : tables identiques, à l'octet près, à celles de l'ancien découpage en mémoire
+###################-
+
+# Exemple : python bench/compare_schema.py --rows 1e5
+#
+# 1. une archive synthétique est générée avec une graine et une date de fin fixes (voir generate_dataset.py) ;
+# 2. son CSV est converti en fichier JSON des mesures et en profil des colonnes comme par actualisation_donnees.py
+#    (CSV_DTYPES, profile_chunk, to_jsonl), après avoir rendu une partie des lignes plus difficiles (voir messy_chunk) :
+#    identifiants en majuscules, entre guillemets, avec espaces, vides ou manquants, nombres décimaux non arrondis ;
+# 3. les cinq tables (measurements, devices, apparatus, flight, openradiation) sont créées à partir de ce fichier par :
+#    - before : l'ancien découpage (lecture complète sans types, huit passes de nettoyage des identifiants,
+#      colonnes object/float64, to_json du DataFrame entier), recopié ci-dessous tel qu'il était avant schema.py ;
+#    - legacy : l'actualisation sans streaming actuelle (read_json_file, create_*_table, convert_to_json) ;
+#    - streaming : le découpage en streaming actuel (split_tables_streaming) ;
+# 4. chaque table doit être identique, à l'octet près, à celle de before ; le script se termine en erreur sinon.
+#
+# Chaque chemin est exécuté dans un nouveau processus : le pic mémoire (RSS) affiché est celui du chemin seul.
+
+# Chargement des librairies
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+import warnings
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+TABLES = ("measurements", "devices", "apparatus", "flight", "openradiation")
+PATHS = ("before", "legacy", "streaming")
+SOURCE_NAME = "openradiation_source.jsonl"
+PROFILE_NAME = "openradiation.profile.json"
+
+sys.path.insert(0, str(BENCH_DIR))
+from generate_dataset import generate, parse_rows
+from run_benchmarks import peak_rss_mb
+
+# Identifiants difficiles, tirés d'une ligne sur MESSY_EVERY (fonction de l'identifiant d'origine, ou valeur fixe) :
+# certains redeviennent, une fois nettoyés, l'identifiant d'autres lignes (doublons des tables des appareils)
+MESSY_EVERY = 13
+MESSY_IDS = (
+    lambda v: v.lower(),
+    lambda v: f"  {v}  ",
+    lambda v: f'"{v.lower()}"',
+    lambda v: f' "{v.upper()}" ',
+    lambda v: "",
+    lambda v: '""',
+    lambda v: "   ",
+    lambda v: None,
+    lambda v: " Mixed Case ID ",
+)
+
+# Décimaux non arrondis, très petits ou très grands (l'écriture JSON ne doit pas changer avec les types du schéma)
+MESSY_FLOATS = ("value", "temperature", "latitude", "longitude", "hitsNumber")
+
+def messy_chunk(chunk, rng):
+    """
+    Fonction : rend plus difficiles une partie des lignes d'un morceau du CSV (identifiants et décimaux).
+
+    Arguments :
+    - chunk : morceau du CSV lu avec CSV_DTYPES
+    - rng : générateur aléatoire numpy (graine fixe)
+
+    Renvoie :
+    - chunk : le morceau modifié
+    """
+    import numpy as np
+
+    chunk = chunk.copy()
+    lignes = np.flatnonzero(rng.random(len(chunk)) < 1 / MESSY_EVERY)
+    for col in ("deviceUuid", "apparatusId"):
+        valeurs = chunk[col].to_numpy(dtype=object, copy=True)
+        for i, variante in zip(lignes, rng.integers(0, len(MESSY_IDS), len(lignes))):
+            origine = valeurs[i] if isinstance(valeurs[i], str) else "Missing-Id"
+            valeurs[i] = MESSY_IDS[variante](origine)
+        chunk[col] = valeurs
+
+    for col in MESSY_FLOATS:
+        valeurs = chunk[col].to_numpy(copy=True)
+        choix = rng.random(len(lignes))
+        valeurs[lignes] = np.where(choix < 0.5, rng.normal(0, 50, len(lignes)),
+                                   np.where(choix < 0.75, rng.lognormal(-20, 3, len(lignes)), rng.lognormal(15, 2, len(lignes))))
+        chunk[col] = valeurs
+    return chunk
+
+def make_source(archive, path, chunksize, seed):
+    """
+    Fonction : écrit le fichier JSON des mesures et son profil (PROFILE_NAME) à partir du CSV de l'archive,
+    morceau par morceau, comme actualisation_donnees.convert_to_json_streaming, avec les lignes difficiles de messy_chunk.
+
+    Renvoie :
+    - info : nombre de lignes et taille du fichier
+    """
+    import tarfile
+    import numpy as np
+    import pandas as pd
+    from actualisation_donnees import open_csv_from_tar, profile_chunk, write_profile, CSV_DTYPES
+    from schema import to_jsonl
+
+    rng = np.random.default_rng(seed)
+    nb_lignes = 0
+    profile = {}
+    with tarfile.open(archive, mode="r:gz") as tar, open(path, "w", encoding="utf-8") as f:
+        with pd.read_csv(open_csv_from_tar(tar), sep=";", header=0, dtype=CSV_DTYPES, chunksize=chunksize) as reader:
+            for chunk in reader:
+                chunk = messy_chunk(chunk, rng)
+                profile_chunk(chunk, profile)
+                f.write(to_jsonl(chunk))
+                nb_lignes += len(chunk)
+    write_profile(profile, nb_lignes, PROFILE_NAME)
+    return {"rows": nb_lignes, "bytes": Path(path).stat().st_size}
+
+## Ancien découpage en mémoire (table_creation.py avant schema.py), recopié tel quel ##########################
+def before_clean_ids(df):
+    """
+    Fonction : ancien nettoyage des identifiants (quatre passes par colonne, DataFrame modifié sur place).
+    """
+    df["deviceUuid"] = df["deviceUuid"].str.lower()
+    df["deviceUuid"] = df["deviceUuid"].str.replace('"', '', regex=False)
+    df["deviceUuid"] = df["deviceUuid"].replace('', None)
+    df["deviceUuid"] = df["deviceUuid"].str.strip()
+    df["apparatusId"] = df["apparatusId"].str.lower()
+    df["apparatusId"] = df["apparatusId"].str.replace('"', '', regex=False)
+    df["apparatusId"] = df["apparatusId"].replace('', None)
+    df["apparatusId"] = df["apparatusId"].str.strip()
+    df["flightId"] = df["flightId"].astype("Int64")
+    return df
+
+def before_tables(df):
+    """
+    Fonction : anciennes create_*_table (colonnes des tranches modifiées après sélection, comme avant schema.py).
+
+    Renvoie :
+    - tables : dictionnaire nom -> DataFrame des cinq tables
+    """
+    from table_creation import MEASUREMENTS_COLUMNS, DEVICE_COLUMNS, APPARATUS_COLUMNS, FLIGHT_COLUMNS
+
+    df_measurements = df[MEASUREMENTS_COLUMNS]
+    df_measurements["rain"] = df_measurements["rain"].fillna(0)
+    df_measurements["storm"] = df_measurements["storm"].fillna(0)
+
+    df_device = df[DEVICE_COLUMNS].dropna(subset=["deviceUuid"]).drop_duplicates(subset=["deviceUuid"])
+    df_apparatus = df[APPARATUS_COLUMNS].dropna(subset=["apparatusId"]).drop_duplicates(subset=["apparatusId"])
+
+    df_flight = df[FLIGHT_COLUMNS].dropna(subset=["flightId"]).drop_duplicates(subset=["flightId"])
+    df_flight["windowSeat"] = df_flight["windowSeat"].astype("Int64")
+
+    return {"measurements": df_measurements, "devices": df_device, "apparatus": df_apparatus,
+            "flight": df_flight, "openradiation": df}
+
+def run_before(source, profile, outputs, chunksize):
+    """
+    Fonction : ancien découpage : fichier lu d'un coup (comme le corps de l'objet S3), sans profil,
+    puis chaque table écrite d'un coup.
+    """
+    import pandas as pd
+
+    with open(source, "rb") as f:
+        df = before_clean_ids(pd.read_json(io.BytesIO(f.read()), lines=True))
+    for name, table in before_tables(df).items():
+        table.to_json(outputs[name], orient="records", lines=True)
+
+## Découpages actuels ########################################################################################
+def run_legacy(source, profile, outputs, chunksize):
+    """
+    Fonction : actualisation sans streaming actuelle (tables créées et écrites comme dans refresh_legacy).
+    """
+    from actualisation_donnees import convert_to_json
+    from table_creation import (read_json_file, create_measurements_table, create_device_table, create_apparatus_table,
+                                create_flight_table)
+
+    df = read_json_file(source, profile, chunksize)
+    tables = {"measurements": create_measurements_table(df), "devices": create_device_table(df),
+              "apparatus": create_apparatus_table(df), "flight": create_flight_table(df), "openradiation": df}
+    for name, table in tables.items():
+        convert_to_json(table, outputs[name])
+
+def run_streaming(source, profile, outputs, chunksize):
+    """
+    Fonction : découpage en streaming actuel (une lecture, morceau par morceau).
+    """
+    from table_creation import split_tables_streaming
+
+    split_tables_streaming(source, profile, chunksize, outputs=outputs)
+
+RUNNERS = {"before": run_before, "legacy": run_legacy, "streaming": run_streaming}
+
+def run_step(args):
+    """
+    Fonction : exécute une étape dans ce processus (lancé par run_path) et affiche son résultat en JSON sur la dernière ligne.
+    """
+    warnings.simplefilter("ignore") # SettingWithCopyWarning de l'ancien découpage
+    debut = time.perf_counter()
+    if args.step == "source":
+        resultat = make_source(args.archive, args.source, args.chunk_rows, args.seed)
+    else:
+        sortie = Path(args.step)
+        sortie.mkdir(exist_ok=True)
+        profile = json.loads(Path(PROFILE_NAME).read_text(encoding="utf-8")) # Profil publié par l'étape source (comme dans le S3)
+        RUNNERS[args.step](args.source, profile, {name: str(sortie / f"{name}.jsonl") for name in TABLES}, args.chunk_rows)
+        resultat = {}
+    resultat.update({"seconds": round(time.perf_counter() - debut, 3), "peak_rss_mb": round(peak_rss_mb(), 1)})
+    print(json.dumps(resultat))
+
+def run_path(step, args, workdir):
+    """
+    Fonction : lance une étape dans un nouveau processus (dossier de travail workdir, sans S3).
+
+    Renvoie :
+    - resultat : dictionnaire renvoyé par l'étape (durée, pic mémoire...)
+    """
+    commande = [sys.executable, str(Path(__file__).resolve()), "--step", step, "--archive", str(args.archive),
+                "--source", SOURCE_NAME, "--chunk-rows", str(args.chunk_rows), "--seed", str(args.seed)]
+    env = {**os.environ, "PYTHONPATH": str(REPO_DIR), "S3_BUCKET_NAME": os.environ.get("S3_BUCKET_NAME", "bench"),
+           "SERIALIZE_WORKERS": "1"}
+    sortie = subprocess.run(commande, cwd=workdir, env=env, stdout=subprocess.PIPE, text=True, check=True).stdout
+    return json.loads(sortie.strip().splitlines()[-1])
+
+def first_difference(path_a, path_b):
+    """
+    Fonction : numéro et contenu de la première ligne qui diffère entre deux fichiers (None s'ils sont identiques).
+    """
+    numero = 0
+    with open(path_a, "rb") as a, open(path_b, "rb") as b:
+        while True:
+            ligne_a, ligne_b = a.readline(), b.readline()
+            numero += 1
+            if ligne_a != ligne_b:
+                return numero, ligne_a[:300], ligne_b[:300]
+            if not ligne_a:
+                return None
+
+def files_equal(path_a, path_b, block=1 << 20):
+    """
+    Fonction : compare deux fichiers octet par octet, par blocs.
+    """
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, "rb") as a, open(path_b, "rb") as b:
+        while True:
+            bloc_a, bloc_b = a.read(block), b.read(block)
+            if bloc_a != bloc_b:
+                return False
+            if not bloc_a:
+                return True
+
+def run(args):
+    """
+    Fonction : génère le jeu, exécute les trois découpages et compare leurs tables.
+
+    Renvoie :
+    - ok : True si toutes les tables sont identiques à celles de l'ancien découpage
+    """
+    workdir = Path(args.workdir).resolve()
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir(parents=True)
+    args.archive = workdir / "openradiation_dataset.tar.gz"
+    print(f"[schema] archive : {generate(args.rows, args.archive, args.seed, args.end)}", flush=True)
+    print(f"[schema] fichier JSON des mesures : {run_path('source', args, workdir)}", flush=True)
+
+    mesures = {}
+    for path in PATHS:
+        mesures[path] = run_path(path, args, workdir)
+        print(f"[schema] {path} : {mesures[path]['seconds']:.2f} s, pic {mesures[path]['peak_rss_mb']} MB", flush=True)
+
+    ok = True
+    print(f"\n  {'table':<14}{'octets':>14}" + "".join(f"{path:>12}" for path in PATHS[1:]))
+    for name in TABLES:
+        reference = workdir / "before" / f"{name}.jsonl"
+        etats = []
+        for path in PATHS[1:]:
+            identique = files_equal(reference, workdir / path / f"{name}.jsonl")
+            etats.append("identique" if identique else "DIFFÉRENT")
+            if not identique:
+                ok = False
+                numero, attendu, obtenu = first_difference(reference, workdir / path / f"{name}.jsonl")
+                print(f"  {path}/{name}.jsonl, ligne {numero} :\n    attendu {attendu!r}\n    obtenu  {obtenu!r}")
+        print(f"  {name:<14}{reference.stat().st_size:>14}" + "".join(f"{etat:>12}" for etat in etats))
+
+    print(f"\n  {'pic mémoire (RSS)':<28}" + "".join(f"{path:>12}" for path in PATHS))
+    print(f"  {'MB':<28}" + "".join(f"{mesures[path]['peak_rss_mb']:>12.1f}" for path in PATHS))
+    print(f"  {'durée (s)':<28}" + "".join(f"{mesures[path]['seconds']:>12.2f}" for path in PATHS))
+
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare les tables du schéma compact à celles de l'ancien découpage.")
+    parser.add_argument("--rows", type=parse_rows, default=100_000, help="nombre de mesures du jeu synthétique")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--end", default="2026-01-01", help="date de la mesure la plus récente (fixe : même jeu à chaque passage)")
+    parser.add_argument("--chunk-rows", type=int, default=20_000, help="lignes par morceau (CHUNK_ROWS)")
+    parser.add_argument("--workdir", default=str(BENCH_DIR / "work" / "schema"), help="dossier de travail")
+    parser.add_argument("--keep", action="store_true", help="garder le dossier de travail (tables écrites)")
+    parser.add_argument("--step", choices=("source",) + PATHS, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--archive", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--source", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step is not None:
+        run_step(args)
+    else:
+        sys.exit(0 if run(args) else 1)
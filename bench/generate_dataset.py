@@ -0,0 +1,274 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Génération d'archives OpenRadiation synthétiques (measurements.csv) pour les mesures de performance
+###################-
+
+# Exemple : python bench/generate_dataset.py --rows 1000000 --output bench/work/openradiation_1000000.tar.gz
+#
+# L'archive a la même forme que celle d'OpenRadiation : openradiation_dataset/measurements.csv, séparateur ";",
+# toutes les colonnes du fichier réel, mesures triées par date de création décroissante. Les proportions de valeurs
+# manquantes et les distributions sont des ordres de grandeur du fichier réel, pas une copie.
+# Le CSV est écrit par morceaux (tables Arrow, mémoire constante) dans un fichier temporaire, puis ajouté à l'archive.
+# Même nombre de lignes, même graine et même date de fin : même archive, à l'octet près.
+
+# Chargement des librairies
+import os
+import sys
+import gzip
+import time
+import tarfile
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+from pathlib import Path
+
+# Colonnes du fichier measurements.csv, dans l'ordre
+COLUMNS = ["reportUuid", "apparatusId", "apparatusVersion", "apparatusSensorType", "apparatusTubeType", "temperature",
+           "value", "hitsNumber", "calibrationFunction", "startTime", "endTime", "latitude", "longitude", "accuracy",
+           "altitude", "altitudeAccuracy", "deviceUuid", "devicePlatform", "deviceVersion", "deviceModel", "reportContext",
+           "description", "measurementHeight", "userId", "measurementEnvironment", "rain", "flightNumber", "seatNumber",
+           "windowSeat", "storm", "flightId", "departureTime", "arrivalTime", "airportOrigin", "airportDestination",
+           "aircraftType", "dateAndTimeOfCreation", "qualification", "qualificationVotesNumber", "reliability",
+           "atypical", "tags", "enclosedObject"]
+
+# Part des valeurs manquantes par colonne (les colonnes de vol ne sont remplies que pour les mesures en avion)
+NULL_RATES = {"apparatusId": 0.02, "apparatusVersion": 0.3, "apparatusSensorType": 0.05, "apparatusTubeType": 0.3,
+              "temperature": 0.6, "hitsNumber": 0.2, "calibrationFunction": 0.7, "endTime": 0.05, "accuracy": 0.3,
+              "altitude": 0.4, "altitudeAccuracy": 0.5, "deviceUuid": 0.05, "devicePlatform": 0.05, "deviceVersion": 0.05,
+              "deviceModel": 0.05, "description": 0.9, "measurementHeight": 0.5, "userId": 0.3,
+              "measurementEnvironment": 0.2, "rain": 0.7, "storm": 0.9, "qualification": 0.4,
+              "qualificationVotesNumber": 0.4, "reliability": 0.1, "atypical": 0.1, "tags": 0.8, "enclosedObject": 0.95}
+FLIGHT_COLUMNS = ("flightNumber", "seatNumber", "windowSeat", "flightId", "departureTime", "arrivalTime",
+                  "airportOrigin", "airportDestination", "aircraftType")
+FLIGHT_RATE = 0.01 # Part des mesures prises en avion
+
+CHUNK_ROWS = 500_000 # Lignes générées et écrites par morceau
+N_DEVICES = 5_000 # Appareils (téléphones) distincts
+N_APPARATUS = 2_000 # Capteurs distincts
+N_USERS = 3_000 # Utilisateurs distincts
+N_FLIGHTS = 500 # Vols distincts
+
+def parse_rows(value):
+    """
+    Fonction : lit un nombre de lignes, en notation entière ou scientifique (1e6).
+    """
+    rows = int(float(value))
+    if rows < 1:
+        raise argparse.ArgumentTypeError("le nombre de lignes doit être positif")
+    return rows
+
+def choice(rng, valeurs, n, p=None):
+    """
+    Fonction : tire n valeurs parmi une liste (avec probabilités éventuelles).
+
+    Arguments :
+    - rng : générateur aléatoire numpy
+    - valeurs : liste ou tableau Arrow des valeurs possibles
+    - n : nombre de tirages
+    - p (par défaut : None) : probabilité de chaque valeur
+
+    Renvoie :
+    - tableau Arrow de n valeurs
+    """
+    valeurs = valeurs if isinstance(valeurs, pa.Array) else pa.array(valeurs)
+    return valeurs.take(pa.array(rng.choice(len(valeurs), n, p=p)))
+
+def pick(rng, valeurs, n):
+    """
+    Fonction : tire n valeurs parmi une liste (loi de Zipf approchée : quelques valeurs très fréquentes, comme dans le fichier réel).
+
+    Arguments :
+    - rng : générateur aléatoire numpy
+    - valeurs : tableau Arrow des valeurs possibles
+    - n : nombre de tirages
+
+    Renvoie :
+    - tableau Arrow de n valeurs
+    """
+    return valeurs.take(pa.array(np.minimum(rng.zipf(1.3, n) - 1, len(valeurs) - 1)))
+
+def iso(dates_ms):
+    """
+    Fonction : dates en millisecondes depuis 1970 -> texte ISO du fichier réel (2025-08-01T12:00:00.000Z).
+    """
+    texte = pc.cast(pa.array(dates_ms, type=pa.timestamp("ms")), pa.string())
+    return pc.binary_join_element_wise(pc.replace_substring(texte, " ", "T", max_replacements=1), "Z", "")
+
+def uuids(rng, n, upper=False):
+    """
+    Fonction : n identifiants au format UUID (aléatoires, reproductibles avec la graine).
+    """
+    hexa = rng.integers(0, 256, size=n * 16, dtype=np.uint8).tobytes().hex()
+    if upper:
+        hexa = hexa.upper()
+    return pa.array([f"{hexa[i:i + 8]}-{hexa[i + 8:i + 12]}-{hexa[i + 12:i + 16]}-{hexa[i + 16:i + 20]}-{hexa[i + 20:i + 32]}"
+                     for i in range(0, n * 32, 32)])
+
+def make_pools(rng):
+    """
+    Fonction : valeurs partagées par tout le fichier (appareils, capteurs, utilisateurs, vols).
+
+    Renvoie :
+    - pools : dictionnaire nom -> tableau Arrow de valeurs
+    """
+    # Les identifiants d'appareils du fichier réel sont en majuscules et parfois entre guillemets (nettoyés par schema.clean_id)
+    devices = uuids(rng, N_DEVICES, upper=True).to_pylist()
+    devices[::7] = [f'"{d}"' for d in devices[::7]]
+    return {
+        "devices": pa.array(devices),
+        "apparatus": pa.array([f"SAFECAST_{i:05d}" if i % 3 else f"RIUM_{i:05d}" for i in range(N_APPARATUS)]),
+        "users": pa.array([f"user{i}" for i in range(N_USERS)]),
+        "flight_numbers": pa.array([f"AF{i:04d}" for i in range(N_FLIGHTS)]),
+    }
+
+def make_chunk(rng, pools, n, start_ms, mean_gap_ms):
+    """
+    Fonction : génère un morceau de mesures, dates décroissantes à partir de start_ms.
+
+    Arguments :
+    - rng : générateur aléatoire numpy
+    - pools : valeurs partagées (voir make_pools)
+    - n : nombre de lignes
+    - start_ms : date de création (ms) juste avant la première ligne du morceau
+    - mean_gap_ms : écart moyen entre deux mesures (ms)
+
+    Renvoie :
+    - table : table Arrow du morceau (colonnes dans l'ordre de COLUMNS)
+    - last_ms : date de création de la dernière ligne
+    """
+    creation = start_ms - np.cumsum(rng.exponential(mean_gap_ms, n)).astype(np.int64)
+    fin = creation - rng.integers(1_000, 3_600_000, n)
+    debut = fin - rng.integers(10_000, 600_000, n)
+    vol = rng.random(n) < FLIGHT_RATE
+    flight = rng.integers(0, N_FLIGHTS, n)
+
+    data = {
+        "reportUuid": uuids(rng, n),
+        "apparatusId": pick(rng, pools["apparatus"], n),
+        "apparatusVersion": choice(rng, ["1.0.0", "1.2.3", "2.0.1", "2.1"], n),
+        "apparatusSensorType": choice(rng, ["geiger", "photodiode", "scintillator"], n, p=[0.7, 0.25, 0.05]),
+        "apparatusTubeType": choice(rng, ["SBM-20", "LND 7317", "J305", "M4011"], n),
+        "temperature": np.round(rng.normal(18, 8, n), 1),
+        "value": np.round(rng.lognormal(-2.5, 0.5, n) * np.where(vol, 20, 1), 6),
+        "hitsNumber": rng.poisson(120, n).astype(float),
+        "calibrationFunction": choice(rng, ["0.000001*(TcNet-0.14)"], n),
+        "startTime": iso(debut),
+        "endTime": iso(fin),
+        "latitude": np.round(rng.uniform(-60, 70, n), 6),
+        "longitude": np.round(rng.uniform(-170, 170, n), 6),
+        "accuracy": np.round(rng.exponential(30, n), 1),
+        "altitude": np.round(rng.normal(200, 300, n)),
+        "altitudeAccuracy": np.round(rng.exponential(10, n), 1),
+        "deviceUuid": pick(rng, pools["devices"], n),
+        "devicePlatform": choice(rng, ["Android", "iOS", "ESP32"], n, p=[0.6, 0.3, 0.1]),
+        "deviceVersion": choice(rng, ["10", "11", "12", "13", "14", "16.4"], n),
+        "deviceModel": choice(rng, ["Pixel 7", "SM-G991B", "iPhone14,2", "ESP32-DevKit"], n),
+        "reportContext": choice(rng, ["routine", "emergency", "exercise"], n, p=[0.97, 0.01, 0.02]),
+        "description": choice(rng, ["mesure au sol", "forêt", "centre-ville", "near the beach"], n),
+        "measurementHeight": rng.choice(np.array([0.0, 1.0, 1.5]), n),
+        "userId": pick(rng, pools["users"], n),
+        "measurementEnvironment": pc.if_else(pa.array(vol), "plane", choice(rng, ["countryside", "city", "inside", "ontheroad"], n)),
+        "rain": rng.integers(0, 2, n).astype(float),
+        "flightNumber": pools["flight_numbers"].take(pa.array(flight)),
+        "seatNumber": pc.binary_join_element_wise(pc.cast(pa.array(rng.integers(1, 40, n)), pa.string()),
+                                                  choice(rng, list("ABCDEF"), n), ""),
+        "windowSeat": rng.integers(0, 2, n).astype(float),
+        "storm": rng.integers(0, 2, n).astype(float),
+        "flightId": (flight + 1).astype(float),
+        "departureTime": iso(debut - 3_600_000),
+        "arrivalTime": iso(fin + 3_600_000),
+        "airportOrigin": choice(rng, ["CDG", "ORY", "NCE", "LYS"], n),
+        "airportDestination": choice(rng, ["JFK", "NRT", "YUL", "DXB"], n),
+        "aircraftType": choice(rng, ["A320", "A350", "B777", "B787"], n),
+        "dateAndTimeOfCreation": iso(creation),
+        "qualification": choice(rng, ["groundlevel", "seemscorrect", "mustbeverified", "noenvironmentalcontext"], n),
+        "qualificationVotesNumber": rng.integers(0, 5, n).astype(float),
+        "reliability": rng.integers(0, 250, n).astype(float),
+        "atypical": choice(rng, ["false", "true"], n, p=[0.95, 0.05]),
+        "tags": choice(rng, ["#safecast", "#tchernobyl", "#ecole #test", "#fukushima"], n),
+        "enclosedObject": choice(rng, ["data:image/png;base64,iVBORw0KGgo="], n),
+    }
+
+    # Valeurs manquantes ; les colonnes de vol ne sont remplies que pour les mesures en avion
+    colonnes = []
+    for col in COLUMNS:
+        valeurs = data[col] if isinstance(data[col], pa.Array) else pa.array(data[col])
+        manquant = ~vol if col in FLIGHT_COLUMNS else rng.random(n) < NULL_RATES.get(col, 0.0)
+        if manquant.any():
+            valeurs = pc.if_else(pa.array(manquant), pa.scalar(None, valeurs.type), valeurs)
+        colonnes.append(valeurs)
+    return pa.Table.from_arrays(colonnes, names=COLUMNS), int(creation[-1])
+
+def generate(rows, output, seed=0, end=None, years=10.0, compresslevel=6):
+    """
+    Fonction : écrit une archive openradiation_dataset.tar.gz synthétique.
+
+    Arguments :
+    - rows : nombre de mesures
+    - output : chemin de l'archive à créer
+    - seed (par défaut : 0) : graine du générateur aléatoire
+    - end (par défaut : None) : date de la mesure la plus récente (texte ISO), aujourd'hui à minuit (UTC) si absente
+    - years (par défaut : 10.0) : nombre d'années couvertes par les mesures
+    - compresslevel (par défaut : 6) : niveau de compression gzip (1 : plus rapide pour les très grandes archives)
+
+    Renvoie :
+    - info : dictionnaire (lignes, taille du CSV et de l'archive, date de fin, durée)
+    """
+    debut_generation = time.monotonic()
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    end = pd.Timestamp(end or pd.Timestamp.now(tz="UTC").normalize())
+    if end.tzinfo is None:
+        end = end.tz_localize("UTC")
+    rng = np.random.default_rng(seed)
+    pools = make_pools(rng)
+    mean_gap_ms = years * 365.25 * 86_400_000 / rows
+
+    # CSV écrit par morceaux dans un fichier temporaire (sa taille doit être connue avant de l'ajouter à l'archive)
+    with tempfile.NamedTemporaryFile("w+b", dir=output.parent, suffix=".csv", delete=False) as csv_file:
+        csv_path = Path(csv_file.name)
+    try:
+        writer = None
+        dernier = int(end.value // 1_000_000)
+        try:
+            for debut in range(0, rows, CHUNK_ROWS):
+                table, dernier = make_chunk(rng, pools, min(CHUNK_ROWS, rows - debut), dernier, mean_gap_ms)
+                if writer is None:
+                    writer = pa_csv.CSVWriter(str(csv_path), table.schema, write_options=pa_csv.WriteOptions(delimiter=";"))
+                writer.write_table(table)
+                print(f"{min(debut + CHUNK_ROWS, rows)} / {rows} lignes générées", file=sys.stderr)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        # Archive reproductible : dates fixes dans les en-têtes gzip et tar
+        taille_csv = csv_path.stat().st_size
+        with open(output, "wb") as brut, gzip.GzipFile(filename="", fileobj=brut, mode="wb", compresslevel=compresslevel, mtime=0) as gz, \
+                tarfile.open(fileobj=gz, mode="w") as tar, open(csv_path, "rb") as source:
+            info = tarfile.TarInfo("openradiation_dataset/measurements.csv")
+            info.size = taille_csv
+            info.mtime = int(end.timestamp())
+            tar.addfile(info, source)
+    finally:
+        csv_path.unlink(missing_ok=True)
+
+    return {"rows": rows, "seed": seed, "end": end.isoformat(), "years": years, "csv_bytes": taille_csv,
+            "tar_bytes": output.stat().st_size, "seconds": round(time.monotonic() - debut_generation, 3)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère une archive OpenRadiation synthétique (measurements.csv).")
+    parser.add_argument("--rows", type=parse_rows, default=100_000, help="nombre de mesures (1e5 à 1e8)")
+    parser.add_argument("--output", default=None, help="archive à créer (bench/work/openradiation_<rows>.tar.gz par défaut)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--end", default=None, help="date de la mesure la plus récente (ISO), aujourd'hui par défaut")
+    parser.add_argument("--years", type=float, default=10.0, help="années couvertes par les mesures")
+    parser.add_argument("--compresslevel", type=int, default=6, help="niveau gzip (1 à 9)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "work", f"openradiation_{args.rows}.tar.gz")
+    print(generate(args.rows, output, args.seed, args.end, args.years, args.compresslevel))
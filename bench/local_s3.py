@@ -0,0 +1,653 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : S3 local de remplacement (fichiers sur le disque) pour les mesures de performance, sans compte AWS
+###################-
+
+# Lancement : python bench/local_s3.py --root bench/work/s3 --port 9000 [--latency-ms 20]
+# puis S3_ENDPOINT_URL=http://127.0.0.1:9000 pour l'application et les scripts (voir s3_client.py).
+#
+# Seules les opérations utilisées par le projet sont prises en charge, en adressage par chemin (/bucket/clé) :
+# création de bucket, PutObject, GetObject et HeadObject (Range, If-Match, If-None-Match, If-Modified-Since, If-Range),
+# DeleteObject, ListObjectsV2, téléversements multipart (dont UploadPartCopy avec intervalle et condition).
+# Un objet est un fichier : les lectures sont envoyées depuis le disque par blocs, sans passer par la mémoire.
+# Les signatures ne sont pas vérifiées. --latency-ms ajoute un délai avant chaque réponse (premier octet du S3 réel).
+# Le même serveur peut servir l'archive en amont (OPENRADIATION_URL=http://127.0.0.1:9000/upstream/openradiation_dataset.tar.gz).
+
+# Chargement des librairies
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlsplit, parse_qs, quote, unquote
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BLOCK_SIZE = 1024 * 1024 # Taille des blocs lus et écrits
+XMLNS = "http://s3.amazonaws.com/doc/2006-03-01/"
+
+class S3Error(Exception):
+    """
+    Classe : erreur S3 renvoyée au client (code HTTP, code S3, message).
+    """
+
+    def __init__(self, status, code, message, headers=None):
+        super().__init__(message)
+        self.status, self.code, self.message, self.headers = status, code, message, headers or {}
+
+class Store:
+    """
+    Classe : objets rangés sur le disque : <root>/<bucket>/objects/<clé encodée> et leurs métadonnées
+    (ETag, date, en-têtes) dans <root>/<bucket>/meta/<clé encodée>.json. Un objet est remplacé d'un coup (os.replace) :
+    une lecture en cours garde l'ancienne version.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+
+    def bucket_dir(self, bucket, must_exist=True):
+        """
+        Fonction : dossier d'un bucket.
+
+        Lève :
+        - S3Error (NoSuchBucket) si le bucket n'existe pas (et que must_exist est vrai)
+        """
+        dossier = self.root / quote(bucket, safe="")
+        if must_exist and not dossier.is_dir():
+            raise S3Error(404, "NoSuchBucket", f"Bucket {bucket} introuvable")
+        return dossier
+
+    def create_bucket(self, bucket):
+        """
+        Fonction : crée un bucket (sans erreur s'il existe déjà).
+
+        Arguments :
+        - bucket : nom du bucket
+        """
+        dossier = self.bucket_dir(bucket, must_exist=False)
+        for sous_dossier in ("objects", "meta", "uploads", "tmp"):
+            (dossier / sous_dossier).mkdir(parents=True, exist_ok=True)
+
+    def paths(self, bucket, key):
+        """
+        Fonction : chemins du fichier d'un objet et de ses métadonnées.
+        """
+        dossier = self.bucket_dir(bucket)
+        nom = quote(key, safe="")
+        return dossier / "objects" / nom, dossier / "meta" / f"{nom}.json"
+
+    def head(self, bucket, key):
+        """
+        Fonction : métadonnées d'un objet.
+
+        Lève :
+        - S3Error (NoSuchKey) si l'objet n'existe pas
+        """
+        _, path_meta = self.paths(bucket, key)
+        try:
+            return json.loads(path_meta.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise S3Error(404, "NoSuchKey", f"Clé {key} introuvable") from None
+
+    def open(self, bucket, key):
+        """
+        Fonction : ouvre un objet en lecture, avec ses métadonnées (lues ensemble pour qu'elles correspondent).
+        """
+        path_objet, _ = self.paths(bucket, key)
+        with self.lock:
+            meta = self.head(bucket, key)
+            try:
+                return open(path_objet, "rb"), meta
+            except FileNotFoundError:
+                raise S3Error(404, "NoSuchKey", f"Clé {key} introuvable") from None
+
+    def temp_path(self, bucket):
+        """
+        Fonction : chemin d'un fichier temporaire du bucket (écrit puis renommé en objet).
+        """
+        return self.bucket_dir(bucket) / "tmp" / uuid.uuid4().hex
+
+    def commit(self, bucket, key, path_tmp, etag, headers):
+        """
+        Fonction : remplace l'objet par un fichier temporaire déjà écrit.
+        """
+        path_objet, path_meta = self.paths(bucket, key)
+        meta = {"etag": etag, "size": path_tmp.stat().st_size, "mtime": time.time(), "headers": headers}
+        with self.lock:
+            os.replace(path_tmp, path_objet)
+            path_meta.write_text(json.dumps(meta), encoding="utf-8")
+        return meta
+
+    def delete(self, bucket, key):
+        """
+        Fonction : supprime un objet et ses métadonnées (sans erreur s'il n'existe pas).
+
+        Arguments :
+        - bucket : nom du bucket
+        - key : clé de l'objet
+        """
+        path_objet, path_meta = self.paths(bucket, key)
+        with self.lock:
+            path_meta.unlink(missing_ok=True)
+            path_objet.unlink(missing_ok=True)
+
+    def list(self, bucket, prefix=""):
+        """
+        Fonction : clés du bucket qui commencent par prefix, triées.
+        """
+        noms = os.listdir(self.bucket_dir(bucket) / "meta")
+        cles = sorted(unquote(nom[:-5]) for nom in noms if nom.endswith(".json"))
+        return [cle for cle in cles if cle.startswith(prefix)]
+
+    def upload_dir(self, bucket, upload_id):
+        """
+        Fonction : dossier des parties d'un téléversement multipart.
+
+        Lève :
+        - S3Error (NoSuchUpload) si le téléversement n'existe pas
+        """
+        dossier = self.bucket_dir(bucket) / "uploads" / re.sub(r"[^0-9a-f]", "", upload_id)
+        if not upload_id or not dossier.is_dir():
+            raise S3Error(404, "NoSuchUpload", f"Téléversement {upload_id} introuvable")
+        return dossier
+
+def parse_range(valeur, taille):
+    """
+    Fonction : lit un en-tête Range (un seul intervalle).
+
+    Arguments :
+    - valeur : en-tête (bytes=debut-fin, bytes=debut-, bytes=-n)
+    - taille : taille de l'objet
+
+    Renvoie :
+    - (debut, fin) : intervalle [debut, fin] inclus, ou None si l'en-tête est ignoré
+
+    Lève :
+    - S3Error (InvalidRange) si l'intervalle est en dehors de l'objet
+    """
+    trouve = re.fullmatch(r"bytes=(\d*)-(\d*)", valeur.strip())
+    if not trouve or trouve.group(1) == trouve.group(2) == "":
+        return None
+    if trouve.group(1) == "":
+        debut, fin = max(0, taille - int(trouve.group(2))), taille - 1
+    else:
+        debut = int(trouve.group(1))
+        fin = min(int(trouve.group(2)), taille - 1) if trouve.group(2) else taille - 1
+    if debut >= taille or debut > fin:
+        raise S3Error(416, "InvalidRange", "L'intervalle demandé n'est pas satisfiable",
+                      {"Content-Range": f"bytes */{taille}"})
+    return debut, fin
+
+def xml(racine, contenu):
+    """
+    Fonction : document XML d'une réponse S3.
+    """
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<{racine} xmlns="{XMLNS}">{contenu}</{racine}>'.encode("utf-8")
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Classe : traitement d'une requête HTTP de l'API S3.
+    """
+
+    protocol_version = "HTTP/1.1" # Connexions gardées ouvertes (et réponse 100-continue aux téléversements)
+    server_version = "LocalS3/1.0"
+
+    def log_message(self, format, *args):
+        """
+        Fonction : journal des requêtes, affiché seulement avec --verbose.
+        """
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # ---------------- Lecture de la requête
+
+    def route(self):
+        """
+        Fonction : bucket, clé et paramètres de la requête (adressage par chemin : /<bucket>/<clé>).
+
+        Renvoie :
+        - (bucket, key, query) : key vide pour une opération sur le bucket
+        """
+        url = urlsplit(self.path)
+        parties = unquote(url.path).lstrip("/").split("/", 1)
+        bucket = parties[0]
+        key = parties[1] if len(parties) > 1 else ""
+        return bucket, key, parse_qs(url.query, keep_blank_values=True)
+
+    def read_body(self, sink):
+        """
+        Fonction : lit le corps de la requête dans sink (fonction appelée par bloc), en décodant l'encodage
+        aws-chunked (blocs avec somme de contrôle en fin de corps) si le client l'utilise.
+        """
+        longueur = int(self.headers.get("Content-Length") or 0)
+        encodage = self.headers.get("Content-Encoding", "")
+        if "aws-chunked" in encodage or self.headers.get("x-amz-content-sha256", "").startswith("STREAMING-"):
+            while True:
+                taille = int(self.rfile.readline().split(b";", 1)[0].strip() or b"0", 16)
+                if taille == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass # En-têtes de fin (sommes de contrôle)
+                    return
+                while taille > 0:
+                    bloc = self.rfile.read(min(BLOCK_SIZE, taille))
+                    if not bloc:
+                        return
+                    sink(bloc)
+                    taille -= len(bloc)
+                self.rfile.readline()
+        while longueur > 0:
+            bloc = self.rfile.read(min(BLOCK_SIZE, longueur))
+            if not bloc:
+                return
+            sink(bloc)
+            longueur -= len(bloc)
+
+    def read_to_file(self, path):
+        """
+        Fonction : écrit le corps de la requête dans un fichier et renvoie son empreinte MD5.
+        """
+        empreinte = hashlib.md5()
+        with open(path, "wb") as f:
+            def sink(bloc):
+                f.write(bloc)
+                empreinte.update(bloc)
+            self.read_body(sink)
+        return empreinte
+
+    def stored_headers(self):
+        """
+        Fonction : en-têtes de l'objet à renvoyer ensuite avec lui (type, encodage, métadonnées utilisateur).
+        """
+        headers = {}
+        for nom in ("Content-Type", "Content-Encoding", "Content-Disposition", "Cache-Control"):
+            valeur = self.headers.get(nom)
+            if nom == "Content-Encoding" and valeur:
+                valeur = ",".join(v.strip() for v in valeur.split(",") if v.strip() != "aws-chunked")
+            if valeur:
+                headers[nom] = valeur
+        for nom, valeur in self.headers.items():
+            if nom.lower().startswith("x-amz-meta-"):
+                headers[nom.lower()] = valeur
+        return headers
+
+    # ---------------- Réponses
+
+    def send(self, status, body=b"", headers=None):
+        """
+        Fonction : envoie une réponse complète, après le délai simulé du serveur (--latency-ms).
+
+        Arguments :
+        - status : code HTTP
+        - body (par défaut : b"") : corps de la réponse (non envoyé pour HEAD)
+        - headers (par défaut : None) : en-têtes de la réponse
+        """
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(status)
+        for nom, valeur in (headers or {}).items():
+            self.send_header(nom, valeur)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_error_xml(self, erreur):
+        """
+        Fonction : envoie une erreur S3 au format XML de l'API (code et message de l'erreur).
+
+        Arguments :
+        - erreur : S3Error à renvoyer
+        """
+        corps = f'<?xml version="1.0" encoding="UTF-8"?>\n<Error><Code>{erreur.code}</Code><Message>{escape(erreur.message)}</Message></Error>'
+        self.send(erreur.status, b"" if self.command == "HEAD" else corps.encode("utf-8"),
+                  {"Content-Type": "application/xml", **erreur.headers})
+
+    def dispatch(self, methode):
+        """
+        Fonction : exécute une opération et renvoie l'erreur S3 éventuelle. Le corps d'une requête refusée
+        n'ayant peut-être pas été lu, la connexion est alors fermée.
+        """
+        try:
+            methode()
+        except S3Error as erreur:
+            if self.command in ("PUT", "POST"):
+                erreur.headers["Connection"] = "close"
+                self.close_connection = True
+            self.send_error_xml(erreur)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def do_GET(self):
+        """
+        Fonction : GetObject, ListObjectsV2 (voir get).
+        """
+        self.dispatch(self.get)
+
+    def do_HEAD(self):
+        """
+        Fonction : HeadObject, HeadBucket (voir get).
+        """
+        self.dispatch(self.get)
+
+    def do_PUT(self):
+        """
+        Fonction : CreateBucket, PutObject, UploadPart, UploadPartCopy (voir put).
+        """
+        self.dispatch(self.put)
+
+    def do_POST(self):
+        """
+        Fonction : CreateMultipartUpload, CompleteMultipartUpload (voir post).
+        """
+        self.dispatch(self.post)
+
+    def do_DELETE(self):
+        """
+        Fonction : DeleteObject, AbortMultipartUpload (voir delete).
+        """
+        self.dispatch(self.delete)
+
+    # ---------------- Opérations
+
+    def object_headers(self, meta):
+        """
+        Fonction : en-têtes de réponse d'un objet (ETag, date de modification, en-têtes enregistrés au téléversement).
+
+        Arguments :
+        - meta : métadonnées de l'objet (voir Store.head)
+        """
+        return {"ETag": meta["etag"], "Last-Modified": formatdate(meta["mtime"], usegmt=True),
+                "Accept-Ranges": "bytes", "Content-Type": "binary/octet-stream", **meta["headers"]}
+
+    def check_conditions(self, meta):
+        """
+        Fonction : conditions de la requête (If-Match, If-None-Match, If-Modified-Since).
+
+        Renvoie :
+        - True si l'objet n'a pas changé (réponse 304 à envoyer)
+
+        Lève :
+        - S3Error (PreconditionFailed) si l'ETag ne correspond pas à If-Match
+        """
+        if_match = self.headers.get("If-Match")
+        if if_match and if_match.strip() not in (meta["etag"], "*"):
+            raise S3Error(412, "PreconditionFailed", "If-Match ne correspond pas à l'ETag de l'objet")
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            return if_none_match.strip() in (meta["etag"], "*")
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return int(meta["mtime"]) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def get(self):
+        """
+        Fonction : GetObject/HeadObject (intervalle Range et conditions If-*), ou ListObjectsV2/HeadBucket sans clé.
+
+        Lève :
+        - S3Error si le bucket ou l'objet n'existe pas, ou si l'intervalle est invalide
+        """
+        bucket, key, query = self.route()
+        if not key:
+            if self.command == "HEAD":
+                self.store().bucket_dir(bucket)
+                return self.send(200)
+            return self.list_objects(bucket, query)
+
+        f, meta = self.store().open(bucket, key)
+        with f:
+            headers = self.object_headers(meta)
+            if self.check_conditions(meta):
+                return self.send(304, headers={"ETag": meta["etag"], "Last-Modified": headers["Last-Modified"]})
+
+            debut, fin = 0, meta["size"] - 1
+            status = 200
+            intervalle = self.headers.get("Range")
+            if_range = self.headers.get("If-Range")
+            if intervalle and (not if_range or if_range.strip() in (meta["etag"], headers["Last-Modified"])):
+                lu = parse_range(intervalle, meta["size"])
+                if lu is not None:
+                    (debut, fin), status = lu, 206
+                    headers["Content-Range"] = f"bytes {debut}-{fin}/{meta['size']}"
+
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            self.send_response(status)
+            for nom, valeur in headers.items():
+                self.send_header(nom, valeur)
+            self.send_header("Content-Length", str(fin - debut + 1))
+            self.end_headers()
+            if self.command == "HEAD":
+                return
+            f.seek(debut)
+            reste = fin - debut + 1
+            while reste > 0:
+                bloc = f.read(min(BLOCK_SIZE, reste))
+                if not bloc:
+                    break
+                self.wfile.write(bloc)
+                reste -= len(bloc)
+
+    def list_objects(self, bucket, query):
+        """
+        Fonction : ListObjectsV2 : clés d'un bucket par ordre alphabétique, filtrées par préfixe, par pages de max-keys.
+
+        Arguments :
+        - bucket : nom du bucket
+        - query : paramètres de la requête (prefix, continuation-token, start-after, max-keys)
+        """
+        store = self.store()
+        prefix = query.get("prefix", [""])[0]
+        depart = query.get("continuation-token", query.get("start-after", [""]))[0]
+        max_keys = int(query.get("max-keys", ["1000"])[0])
+        cles = [cle for cle in store.list(bucket, prefix) if cle > depart]
+        page, suite = cles[:max_keys], len(cles) > max_keys
+
+        contenu = [f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>",
+                   f"<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{'true' if suite else 'false'}</IsTruncated>"]
+        if suite:
+            contenu.append(f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>")
+        for cle in page:
+            try:
+                meta = store.head(bucket, cle)
+            except S3Error:
+                continue
+            date = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(meta["mtime"]))
+            contenu.append(f"<Contents><Key>{escape(cle)}</Key><LastModified>{date}</LastModified>"
+                           f"<ETag>{escape(meta['etag'])}</ETag><Size>{meta['size']}</Size><StorageClass>STANDARD</StorageClass></Contents>")
+        self.send(200, xml("ListBucketResult", "".join(contenu)), {"Content-Type": "application/xml"})
+
+    def put(self):
+        """
+        Fonction : CreateBucket (sans clé), UploadPart et UploadPartCopy (avec uploadId) ou PutObject.
+
+        Lève :
+        - S3Error pour CopyObject (non pris en charge) ou un bucket inconnu
+        """
+        bucket, key, query = self.route()
+        store = self.store()
+        if not key:
+            store.create_bucket(bucket)
+            return self.send(200, headers={"Location": f"/{bucket}"})
+
+        if "uploadId" in query:
+            dossier = store.upload_dir(bucket, query["uploadId"][0])
+            numero = int(query["partNumber"][0])
+            path_part = dossier / f"{numero:05d}"
+            if self.headers.get("x-amz-copy-source"):
+                etag = self.copy_part(path_part)
+                date = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+                return self.send(200, xml("CopyPartResult", f"<LastModified>{date}</LastModified><ETag>{escape(etag)}</ETag>"),
+                                 {"Content-Type": "application/xml"})
+            empreinte = self.read_to_file(path_part)
+            return self.send(200, headers={"ETag": f'"{empreinte.hexdigest()}"'})
+
+        if self.headers.get("x-amz-copy-source"):
+            raise S3Error(501, "NotImplemented", "CopyObject n'est pas pris en charge")
+
+        path_tmp = store.temp_path(bucket)
+        try:
+            empreinte = self.read_to_file(path_tmp)
+            meta = store.commit(bucket, key, path_tmp, f'"{empreinte.hexdigest()}"', self.stored_headers())
+        finally:
+            path_tmp.unlink(missing_ok=True)
+        self.send(200, headers={"ETag": meta["etag"]})
+
+    def copy_part(self, path_part):
+        """
+        Fonction : UploadPartCopy : copie d'un intervalle d'un objet existant comme partie d'un téléversement.
+
+        Renvoie :
+        - etag : ETag de la partie
+        """
+        source = unquote(self.headers["x-amz-copy-source"].split("?", 1)[0]).lstrip("/")
+        bucket_source, _, key_source = source.partition("/")
+        f, meta = self.store().open(bucket_source, key_source)
+        with f:
+            condition = self.headers.get("x-amz-copy-source-if-match")
+            if condition and condition.strip() != meta["etag"]:
+                raise S3Error(412, "PreconditionFailed", "x-amz-copy-source-if-match ne correspond pas à l'ETag de la source")
+            debut, fin = 0, meta["size"] - 1
+            if self.headers.get("x-amz-copy-source-range"):
+                debut, fin = parse_range(self.headers["x-amz-copy-source-range"], meta["size"])
+            empreinte = hashlib.md5()
+            f.seek(debut)
+            reste = fin - debut + 1
+            with open(path_part, "wb") as sortie:
+                while reste > 0:
+                    bloc = f.read(min(BLOCK_SIZE, reste))
+                    if not bloc:
+                        break
+                    sortie.write(bloc)
+                    empreinte.update(bloc)
+                    reste -= len(bloc)
+        return f'"{empreinte.hexdigest()}"'
+
+    def post(self):
+        """
+        Fonction : CreateMultipartUpload (uploads) ou CompleteMultipartUpload (uploadId) : les parties sont assemblées
+        dans l'ordre de la liste reçue et l'ETag est calculé comme celui du S3 (MD5 des MD5 des parties, suivi de leur nombre).
+
+        Lève :
+        - S3Error pour une partie absente ou une opération non prise en charge
+        """
+        bucket, key, query = self.route()
+        store = self.store()
+        if "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            dossier = store.bucket_dir(bucket) / "uploads" / upload_id
+            dossier.mkdir()
+            (dossier / "headers.json").write_text(json.dumps(self.stored_headers()), encoding="utf-8")
+            self.read_body(lambda bloc: None)
+            return self.send(200, xml("InitiateMultipartUploadResult",
+                                      f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>"),
+                             {"Content-Type": "application/xml"})
+
+        if "uploadId" in query:
+            dossier = store.upload_dir(bucket, query["uploadId"][0])
+            morceaux = []
+            self.read_body(morceaux.append)
+            racine = ElementTree.fromstring(b"".join(morceaux))
+            numeros = [int(element.text) for element in racine.iter() if element.tag.rsplit("}", 1)[-1] == "PartNumber"]
+
+            # Assemblage des parties dans l'ordre donné ; ETag multipart : MD5 des MD5 des parties, suivi du nombre de parties
+            path_tmp = store.temp_path(bucket)
+            empreintes = hashlib.md5()
+            try:
+                with open(path_tmp, "wb") as sortie:
+                    for numero in numeros:
+                        empreinte = hashlib.md5()
+                        try:
+                            with open(dossier / f"{numero:05d}", "rb") as partie:
+                                while bloc := partie.read(BLOCK_SIZE):
+                                    sortie.write(bloc)
+                                    empreinte.update(bloc)
+                        except FileNotFoundError:
+                            raise S3Error(400, "InvalidPart", f"Partie {numero} introuvable") from None
+                        empreintes.update(empreinte.digest())
+                headers = json.loads((dossier / "headers.json").read_text(encoding="utf-8"))
+                meta = store.commit(bucket, key, path_tmp, f'"{empreintes.hexdigest()}-{len(numeros)}"', headers)
+            finally:
+                path_tmp.unlink(missing_ok=True)
+            shutil.rmtree(dossier, ignore_errors=True)
+            return self.send(200, xml("CompleteMultipartUploadResult",
+                                      f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><ETag>{escape(meta['etag'])}</ETag>"),
+                             {"Content-Type": "application/xml"})
+
+        raise S3Error(501, "NotImplemented", "Opération POST non prise en charge")
+
+    def delete(self):
+        """
+        Fonction : DeleteObject, ou AbortMultipartUpload (uploadId) qui supprime les parties déjà reçues.
+
+        Lève :
+        - S3Error pour une suppression de bucket (non prise en charge)
+        """
+        bucket, key, query = self.route()
+        store = self.store()
+        if "uploadId" in query:
+            shutil.rmtree(store.upload_dir(bucket, query["uploadId"][0]), ignore_errors=True)
+        elif key:
+            store.delete(bucket, key)
+        else:
+            raise S3Error(501, "NotImplemented", "Suppression de bucket non prise en charge")
+        self.send(204)
+
+    def store(self):
+        """
+        Fonction : objets du serveur (voir Store).
+        """
+        return self.server.store
+
+def make_server(root, host="127.0.0.1", port=0, latency_ms=0.0, verbose=False):
+    """
+    Fonction : crée le serveur S3 local (à lancer avec serve_forever, dans un fil ou un processus).
+
+    Arguments :
+    - root : dossier où sont rangés les buckets
+    - host (par défaut : "127.0.0.1") : adresse d'écoute
+    - port (par défaut : 0) : port d'écoute (0 : port libre choisi par le système)
+    - latency_ms (par défaut : 0.0) : délai ajouté avant chaque réponse
+    - verbose (par défaut : False) : affiche chaque requête
+
+    Renvoie :
+    - server : le serveur (son URL : f"http://{host}:{server.server_port}")
+    """
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.store = Store(root)
+    server.latency = latency_ms / 1000
+    server.verbose = verbose
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="S3 local de remplacement (fichiers sur le disque).")
+    parser.add_argument("--root", default=os.path.join(os.path.dirname(__file__), "work", "s3"), help="dossier des buckets")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="délai ajouté avant chaque réponse")
+    parser.add_argument("--bucket", action="append", default=[], help="bucket à créer au lancement (option répétable)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(args.root, args.host, args.port, args.latency_ms, args.verbose)
+    for bucket in args.bucket:
+        server.store.create_bucket(bucket)
+    print(f"S3 local : http://{args.host}:{server.server_port} (dossier {args.root})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
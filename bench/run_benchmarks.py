@@ -0,0 +1,356 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Mesures de performance reproductibles de l'actualisation et de l'API (jeu synthétique, S3 local)
+###################-
+
+# Exemple : python bench/run_benchmarks.py --rows 1e6
+#
+# 1. l'archive synthétique de --rows mesures est générée si elle n'existe pas encore (voir generate_dataset.py) ;
+# 2. un S3 local (voir local_s3.py) est lancé dans un autre processus : il sert l'archive en amont (OPENRADIATION_URL)
+#    et remplace le bucket (S3_ENDPOINT_URL) ;
+# 3. les étapes de l'actualisation sont mesurées une à une dans ce processus : download_tar, extract_csv_from_tar,
+#    convert_to_json, convert_to_json_streaming, le découpage de table_creation et l'actualisation complète ;
+# 4. l'API est lancée (uvicorn ou gunicorn) et /api/data/<type> est mesurée avec et sans filter_last_two_years
+#    (temps jusqu'au premier octet, débit) ;
+# 5. les résultats sont ajoutés au fichier --results (bench/results.json) et comparés au dernier passage de même taille.
+#
+# Les variables d'environnement habituelles (CHUNK_ROWS, SERIALIZE_WORKERS, PUBLISH_WORKERS, PARQUET_MODE...) s'appliquent.
+# Le pic mémoire de chaque étape est celui du processus principal (remis à zéro entre les étapes sous Linux),
+# sans les processus de conversion.
+
+# Chargement des librairies
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import socket
+import platform
+import argparse
+import statistics
+import subprocess
+import http.client
+from pathlib import Path
+from datetime import datetime, timezone
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+BUCKET = "bench"
+UPSTREAM_BUCKET = "upstream"
+UPSTREAM_KEY = "openradiation_dataset.tar.gz"
+API_TYPES = ("measurements", "openradiation")
+SETTINGS = ("STREAMING_MODE", "CHUNK_ROWS", "SERIALIZE_WORKERS", "PUBLISH_WORKERS", "PARQUET_MODE", "COMPRESSED_VARIANTS",
+            "STATS_MODE", "S3_MULTIPART_CHUNK_MB", "S3_TRANSFER_CONCURRENCY", "ASGI_THREADS")
+
+sys.path.insert(0, str(BENCH_DIR))
+from generate_dataset import generate, parse_rows
+
+def free_port():
+    """
+    Fonction : renvoie un port TCP libre de la machine.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def reset_peak():
+    """
+    Fonction : remet le pic de mémoire résidente (VmHWM) du processus à sa valeur actuelle (Linux uniquement).
+
+    Renvoie :
+    - True si le pic a été remis à zéro
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb(pid="self"):
+    """
+    Fonction : pic de mémoire résidente d'un processus en MB (VmHWM sous Linux, pic depuis le lancement sinon).
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return next(int(ligne.split()[1]) for ligne in f if ligne.startswith("VmHWM:")) / 1024
+    except (OSError, StopIteration):
+        if pid != "self":
+            return None
+        from logger_write import get_peak_memory_mb
+        return get_peak_memory_mb()
+
+def measure(results, name, fonction, *args, **kwargs):
+    """
+    Fonction : exécute une étape et enregistre sa durée et le pic mémoire atteint pendant l'étape.
+
+    Arguments :
+    - results : dictionnaire des résultats (complété sur place)
+    - name : nom de la mesure
+    - fonction : fonction mesurée
+    - args, kwargs : ses arguments
+
+    Renvoie :
+    - resultat : ce que renvoie la fonction
+    """
+    gc.collect()
+    reset_peak()
+    debut = time.perf_counter()
+    resultat = fonction(*args, **kwargs)
+    duree = time.perf_counter() - debut
+    results[name] = {"seconds": round(duree, 3), "peak_rss_mb": round(peak_rss_mb(), 1)}
+    print(f"[bench] {name} : {duree:.2f} s, pic {results[name]['peak_rss_mb']} MB", flush=True)
+    return resultat
+
+def throughput(mesure, rows=None, nb_bytes=None):
+    """
+    Fonction : ajoute les débits (lignes/s, MB/s) à une mesure.
+    """
+    secondes = max(mesure["seconds"], 1e-9)
+    if rows is not None:
+        mesure["rows"] = int(rows)
+        mesure["rows_per_s"] = round(rows / secondes)
+    if nb_bytes is not None:
+        mesure["bytes"] = int(nb_bytes)
+        mesure["mb_per_s"] = round(nb_bytes / 1024 ** 2 / secondes, 2)
+
+def start_local_s3(root, latency_ms):
+    """
+    Fonction : lance le S3 local dans un autre processus, avec le bucket de l'application et celui de l'archive en amont.
+
+    Renvoie :
+    - (processus, url)
+    """
+    port = free_port()
+    processus = subprocess.Popen([sys.executable, str(BENCH_DIR / "local_s3.py"), "--root", str(root), "--port", str(port),
+                                  "--latency-ms", str(latency_ms), "--bucket", BUCKET, "--bucket", UPSTREAM_BUCKET],
+                                 stdout=subprocess.PIPE, text=True)
+    processus.stdout.readline() # Ligne affichée une fois le serveur à l'écoute
+    return processus, f"http://127.0.0.1:{port}"
+
+def api_command(server, port):
+    """
+    Fonction : commande qui lance l'API sur un port : "uvicorn" (asgi_app) ou "gunicorn" (app, fils).
+    """
+    commandes = {
+        "uvicorn": [sys.executable, "-m", "uvicorn", "asgi_app:application", "--host", "127.0.0.1", "--port", str(port),
+                    "--log-level", "warning"],
+        "gunicorn": [sys.executable, "-m", "gunicorn", "app:app", "-b", f"127.0.0.1:{port}", "-w", "1", "--threads", "8",
+                     "--log-level", "warning"],
+    }
+    return commandes[server]
+
+def start_api(server, workdir, env):
+    """
+    Fonction : lance l'API dans un autre processus et attend qu'elle réponde.
+
+    Arguments :
+    - server : "uvicorn" (asgi_app) ou "gunicorn" (app, fils)
+    - workdir : dossier de travail (cache disque de l'API)
+    - env : variables d'environnement
+
+    Renvoie :
+    - (processus, port)
+    """
+    port = free_port()
+    processus = subprocess.Popen(api_command(server, port), cwd=workdir, env={**env, "PYTHONPATH": str(REPO_DIR)})
+    for _ in range(300):
+        try:
+            if fetch(port, "/")["status"] == 200:
+                return processus, port
+        except OSError:
+            time.sleep(0.1)
+    processus.terminate()
+    raise RuntimeError(f"L'API ({server}) ne répond pas sur le port {port}")
+
+def fetch(port, path):
+    """
+    Fonction : télécharge une réponse en entier (sans compression) en mesurant le temps jusqu'au premier octet.
+
+    Renvoie :
+    - dictionnaire (status, ttfb_s, seconds, bytes, rows)
+    """
+    connexion = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    debut = time.perf_counter()
+    try:
+        connexion.request("GET", path, headers={"Accept-Encoding": "identity"})
+        reponse = connexion.getresponse()
+        ttfb = None
+        nb_bytes = rows = 0
+        while bloc := reponse.read1(1024 * 1024):
+            if ttfb is None:
+                ttfb = time.perf_counter() - debut
+            nb_bytes += len(bloc)
+            rows += bloc.count(b"\n")
+        duree = time.perf_counter() - debut
+    finally:
+        connexion.close()
+    return {"status": reponse.status, "ttfb_s": round(ttfb if ttfb is not None else duree, 4), "seconds": round(duree, 4),
+            "bytes": nb_bytes, "rows": rows}
+
+def bench_api(results, port, repeats):
+    """
+    Fonction : mesure /api/data/<type> avec et sans filter_last_two_years. La première requête de chaque cas
+    est à froid (lue dans le S3), les suivantes peuvent profiter du cache disque de l'API.
+
+    Arguments :
+    - results : dictionnaire des résultats (complété sur place)
+    - port : port de l'API
+    - repeats : nombre de requêtes par cas
+    """
+    for type in API_TYPES:
+        for filtre in (False, True):
+            path = f"/api/data/{type}" + ("?filter_last_two_years=true" if filtre else "")
+            essais = [fetch(port, path) for _ in range(repeats)]
+            if any(e["status"] != 200 for e in essais):
+                raise RuntimeError(f"{path} : statuts {[e['status'] for e in essais]}")
+            chauds = essais[1:] or essais
+            mesure = {
+                "rows": essais[0]["rows"], "bytes": essais[0]["bytes"],
+                "cold_ttfb_s": essais[0]["ttfb_s"], "cold_seconds": essais[0]["seconds"],
+                "ttfb_s": statistics.median(e["ttfb_s"] for e in chauds),
+                "seconds": statistics.median(e["seconds"] for e in chauds),
+            }
+            mesure["mb_per_s"] = round(mesure["bytes"] / 1024 ** 2 / max(mesure["seconds"], 1e-9), 2)
+            nom = f"api.{type}" + (".last_two_years" if filtre else "")
+            results[nom] = mesure
+            print(f"[bench] {nom} : premier octet {mesure['ttfb_s'] * 1000:.1f} ms (à froid {mesure['cold_ttfb_s'] * 1000:.1f} ms), "
+                  f"{mesure['mb_per_s']} MB/s, {mesure['rows']} lignes", flush=True)
+
+def git_commit():
+    """
+    Fonction : commit courant du dépôt (None hors d'un dépôt git).
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def save_results(path, run):
+    """
+    Fonction : ajoute un passage au fichier de résultats et affiche l'écart avec le dernier passage de même taille.
+
+    Arguments :
+    - path : fichier JSON des résultats ({"runs": [...]})
+    - run : résultats du passage
+    """
+    path = Path(path)
+    historique = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"runs": []}
+    precedent = next((r for r in reversed(historique["runs"]) if r["dataset"]["rows"] == run["dataset"]["rows"]), None)
+    historique["runs"].append(run)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(historique, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print(f"\nRésultats ajoutés à {path}" + (f" (comparaison avec le passage du {precedent['date']}, commit {precedent['commit']})" if precedent else ""))
+    for nom, mesure in run["benchmarks"].items():
+        ligne = f"  {nom:<45} {mesure['seconds']:>9.3f} s"
+        if "ttfb_s" in mesure:
+            ligne += f"  premier octet {mesure['ttfb_s'] * 1000:8.1f} ms"
+        ancien = precedent["benchmarks"].get(nom) if precedent else None
+        if ancien and ancien["seconds"]:
+            ligne += f"  ({(mesure['seconds'] / ancien['seconds'] - 1) * 100:+.1f} %)"
+        print(ligne)
+
+def run(args):
+    """
+    Fonction : exécute toutes les mesures.
+
+    Renvoie :
+    - run : résultats du passage (voir save_results)
+    """
+    dataset = Path(args.dataset or BENCH_DIR / "work" / f"openradiation_{args.rows}.tar.gz")
+    if not dataset.exists():
+        print(f"[bench] Génération de {dataset} ({args.rows} lignes)...", flush=True)
+        generate(args.rows, dataset, seed=args.seed, compresslevel=args.compresslevel)
+
+    # Dossier de travail neuf : cache local des scripts, cache disque de l'API et buckets du S3 local
+    workdir = Path(args.workdir).resolve()
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir(parents=True)
+    s3_process, s3_url = start_local_s3(workdir / "s3", args.latency_ms)
+    api_process = None
+    benchmarks = {}
+    try:
+        env = {**os.environ, "S3_ENDPOINT_URL": s3_url, "S3_BUCKET_NAME": BUCKET,
+               "AWS_ACCESS_KEY_ID": "bench", "AWS_SECRET_ACCESS_KEY": "bench", "AWS_REGION": "us-east-1",
+               "OPENRADIATION_URL": f"{s3_url}/{UPSTREAM_BUCKET}/{UPSTREAM_KEY}"}
+        os.environ.update(env)
+        os.chdir(workdir)
+        sys.path.insert(0, str(REPO_DIR))
+
+        # Les modules lisent leur configuration à l'import : importés une fois l'environnement prêt
+        from s3_client import get_s3_client, get_transfer_config
+        import actualisation_donnees as ad
+        import table_creation as tc
+        get_s3_client().upload_file(str(dataset), UPSTREAM_BUCKET, UPSTREAM_KEY, Config=get_transfer_config())
+
+        # Actualisation, étape par étape
+        measure(benchmarks, "download_tar", ad.download_tar)
+        throughput(benchmarks["download_tar"], nb_bytes=ad.LOCAL_TAR.stat().st_size)
+
+        df = measure(benchmarks, "extract_csv_from_tar", ad.extract_csv_from_tar)
+        throughput(benchmarks["extract_csv_from_tar"], rows=len(df))
+        nb_lignes = len(df)
+
+        with ad.serialize_pool() as processes:
+            measure(benchmarks, "convert_to_json", ad.convert_to_json, df, ad.JSON_FILE, processes)
+        throughput(benchmarks["convert_to_json"], rows=nb_lignes, nb_bytes=ad.JSON_FILE.stat().st_size)
+        del df
+
+        profile = measure(benchmarks, "convert_to_json_streaming", ad.convert_to_json_streaming, "disk", ad.CHUNK_ROWS, None,
+                          path=tc.SOURCE_FILE, delta_path=tc.DELTA_SOURCE_FILE)
+        throughput(benchmarks["convert_to_json_streaming"], rows=nb_lignes, nb_bytes=tc.SOURCE_FILE.stat().st_size)
+
+        with ad.serialize_pool() as processes:
+            measure(benchmarks, "table_creation.split_tables_streaming", tc.split_tables_streaming, tc.SOURCE_FILE, profile,
+                    executor=processes)
+        throughput(benchmarks["table_creation.split_tables_streaming"], rows=nb_lignes)
+
+        measure(benchmarks, "table_creation.refresh_full", tc.refresh_full, tc.SOURCE_FILE, profile)
+        throughput(benchmarks["table_creation.refresh_full"], rows=nb_lignes)
+
+        # API
+        api_process, port = start_api(args.server, workdir, env)
+        bench_api(benchmarks, port, args.api_repeats)
+        server_peak = peak_rss_mb(api_process.pid)
+    finally:
+        if api_process is not None:
+            api_process.terminate()
+            api_process.wait()
+        s3_process.terminate()
+        s3_process.wait()
+        os.chdir(REPO_DIR)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "dataset": {"path": str(dataset), "rows": nb_lignes, "bytes": dataset.stat().st_size},
+        "settings": {"server": args.server, "latency_ms": args.latency_ms, "api_repeats": args.api_repeats,
+                     **{nom: os.environ[nom] for nom in SETTINGS if nom in os.environ}},
+        "api_server_peak_rss_mb": round(server_peak, 1) if server_peak is not None else None,
+        "benchmarks": benchmarks,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesures de performance de l'actualisation et de l'API.")
+    parser.add_argument("--rows", type=parse_rows, default=100_000, help="taille du jeu synthétique (1e5 à 1e8)")
+    parser.add_argument("--dataset", default=None, help="archive à utiliser (générée si absente)")
+    parser.add_argument("--seed", type=int, default=0, help="graine du jeu synthétique")
+    parser.add_argument("--compresslevel", type=int, default=6, help="niveau gzip de l'archive générée")
+    parser.add_argument("--workdir", default=str(BENCH_DIR / "work" / "run"), help="dossier de travail (vidé au lancement)")
+    parser.add_argument("--results", default=str(BENCH_DIR / "results.json"), help="fichier JSON des résultats")
+    parser.add_argument("--server", choices=("uvicorn", "gunicorn"), default="uvicorn", help="serveur de l'API")
+    parser.add_argument("--api-repeats", type=int, default=3, help="requêtes par cas de l'API (la première à froid)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="délai ajouté à chaque réponse du S3 local")
+    parser.add_argument("--keep", action="store_true", help="garder le dossier de travail")
+    args = parser.parse_args()
+
+    save_results(args.results, run(args))
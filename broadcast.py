@@ -0,0 +1,259 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Lecture partagée d'un objet du S3 entre les requêtes simultanées (une seule lecture, plusieurs clients)
+###################-
+
+# Chargement des librairies
+import os
+import time
+import threading
+from collections import deque
+from logger_write import log_memory_usage
+
+# Configuration de la diffusion
+BROADCAST_WINDOW_BYTES = int(os.environ.get("BROADCAST_WINDOW_MB", "8")) * 1024 * 1024 # Blocs gardés en mémoire par lecture partagée
+BROADCAST_SLOW_SECONDS = float(os.environ.get("BROADCAST_SLOW_SECONDS", "10")) # Durée sans lecture après laquelle un client est détaché de la lecture partagée
+
+class SharedRead:
+    """
+    Classe : une lecture d'un objet dont les blocs sont diffusés à tous les clients abonnés.
+    Les derniers blocs lus (au plus BROADCAST_WINDOW_BYTES octets) sont gardés dans une fenêtre commune :
+    - un client arrivé en retard s'abonne tant que le début de l'objet est encore dans la fenêtre ;
+    - la lecture attend le client le plus lent avant de sortir un bloc de la fenêtre (contre-pression) ; un client qui ne lit
+      plus rien pendant BROADCAST_SLOW_SECONDS secondes est détaché et continue seul à partir de sa position.
+    """
+
+    def __init__(self, key, open_source, etag=None, window_bytes=BROADCAST_WINDOW_BYTES, slow_seconds=BROADCAST_SLOW_SECONDS):
+        self.key = key
+        self.etag = etag # Version lue de l'objet (pour qu'un client détaché lise la suite de la même version)
+        self.open_source = open_source
+        self.window_bytes = window_bytes
+        self.slow_seconds = slow_seconds
+
+        self.chunks = deque() # Fenêtre des derniers blocs lus
+        self.first = 0 # Numéro du premier bloc de la fenêtre
+        self.window = 0 # Octets dans la fenêtre
+        self.done = False
+        self.error = None
+        self.subscribers = {} # identifiant -> numéro du prochain bloc à lire (None si détaché)
+        self.last_read = {} # identifiant -> date de la dernière lecture
+        self.next_id = 0
+        self.condition = threading.Condition()
+        self.thread = None
+        self.on_close = None
+
+    def attach(self):
+        """
+        Fonction : abonne un client à la lecture si le début de l'objet est encore disponible.
+
+        Renvoie :
+        - identifiant du client, ou None si la lecture est trop avancée (ou terminée)
+        """
+        with self.condition:
+            if self.first > 0 or self.done:
+                return None
+            identifiant = self.next_id
+            self.next_id += 1
+            self.subscribers[identifiant] = 0
+            self.last_read[identifiant] = time.monotonic()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            return identifiant
+
+    def run(self):
+        """
+        Fonction : lit l'objet bloc par bloc et remplit la fenêtre, tant qu'au moins un client est abonné.
+        """
+        source = None
+        try:
+            source = self.open_source()
+            for bloc in source:
+                with self.condition:
+                    if all(n is None for n in self.subscribers.values()):
+                        break # Plus personne ne lit : inutile de continuer
+                    self.chunks.append(bloc)
+                    self.window += len(bloc)
+                    self.condition.notify_all()
+                    self.shrink_window()
+        except Exception as e:
+            self.error = e
+        finally:
+            if source is not None and hasattr(source, "close"):
+                source.close()
+            with self.condition:
+                self.done = True
+                self.condition.notify_all()
+            if self.on_close is not None:
+                self.on_close(self)
+
+    def shrink_window(self):
+        """
+        Fonction : sort les plus vieux blocs de la fenêtre quand elle dépasse sa taille, une fois lus par tous les clients abonnés
+        (appelée avec le verrou). Les clients bloqués sont détachés.
+        """
+        while self.window > self.window_bytes and len(self.chunks) > 1:
+            en_retard = [i for i, n in self.subscribers.items() if n is not None and n <= self.first]
+            if en_retard:
+                # Les clients qui n'ont rien lu depuis BROADCAST_SLOW_SECONDS secondes sont détachés, les autres attendus
+                maintenant = time.monotonic()
+                immobiles = [i for i in en_retard if maintenant - self.last_read[i] >= self.slow_seconds]
+                for i in immobiles:
+                    self.subscribers[i] = None
+                if immobiles:
+                    msg = f"Lecture partagée de {self.key} : {len(immobiles)} client(s) trop lent(s) détaché(s)"
+                    log_memory_usage(msg)
+                    print(msg)
+                if len(immobiles) < len(en_retard):
+                    self.condition.wait(self.slow_seconds)
+                    continue
+            self.window -= len(self.chunks.popleft())
+            self.first += 1
+            self.condition.notify_all()
+
+    def stream(self, identifiant, fallback):
+        """
+        Fonction : fonction génératrice des blocs de l'objet pour un client abonné.
+
+        Arguments :
+        - identifiant : identifiant renvoyé par attach()
+        - fallback : fonction (position en octets) -> blocs de l'objet à partir de cette position, utilisée si le client est détaché
+
+        Renvoit en yield :
+        - bloc de l'objet (en octets)
+        """
+        position = 0
+        try:
+            while True:
+                with self.condition:
+                    while True:
+                        numero = self.subscribers[identifiant]
+                        if numero is None or numero - self.first < len(self.chunks) or self.done:
+                            break
+                        self.condition.wait()
+
+                    if numero is None:
+                        break # Détaché : la suite est lue à part
+                    if numero - self.first < len(self.chunks):
+                        bloc = self.chunks[numero - self.first]
+                        self.subscribers[identifiant] = numero + 1
+                        self.last_read[identifiant] = time.monotonic()
+                        self.condition.notify_all()
+                    elif self.error is not None:
+                        raise self.error
+                    else:
+                        return
+                position += len(bloc)
+                yield bloc
+
+            yield from fallback(position)
+        finally:
+            with self.condition:
+                self.subscribers.pop(identifiant, None)
+                self.last_read.pop(identifiant, None)
+                self.condition.notify_all()
+
+class Broadcaster:
+    """
+    Classe : registre des lectures partagées en cours, par objet.
+    """
+
+    def __init__(self):
+        self.reads = {}
+        self.key_locks = {}
+        self.lock = threading.Lock()
+        self.stats = {"reads": 0, "joined": 0}
+
+    def opening(self, key):
+        """
+        Fonction : verrou propre à un objet, à tenir entre join() et start() pour que des requêtes simultanées
+        ne lancent qu'une seule lecture.
+        """
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def join(self, key):
+        """
+        Fonction : abonne un client à la lecture en cours d'un objet, si elle en est encore au début.
+
+        Renvoie :
+        - (lecture, identifiant) ou None
+        """
+        with self.lock:
+            lecture = self.reads.get(key)
+            identifiant = lecture.attach() if lecture is not None else None
+            if identifiant is None:
+                return None
+            self.stats["joined"] += 1
+            return lecture, identifiant
+
+    def start(self, key, open_source, etag=None):
+        """
+        Fonction : démarre une lecture partagée d'un objet (qui remplace la précédente pour les nouveaux clients).
+
+        Arguments :
+        - key : chemin de l'objet
+        - open_source : fonction sans argument renvoyant l'itérateur des blocs de l'objet (appelée dans le fil de lecture)
+        - etag (par défaut : None) : ETag de l'objet lu
+
+        Renvoie :
+        - (lecture, identifiant) du premier client
+        """
+        lecture = SharedRead(key, open_source, etag)
+        lecture.on_close = self.forget
+        with self.lock:
+            self.reads[key] = lecture
+            self.stats["reads"] += 1
+            return lecture, lecture.attach()
+
+    def forget(self, lecture):
+        """
+        Fonction : retire une lecture terminée du registre (appelée par la lecture à sa fin), sauf si une autre l'a déjà remplacée.
+
+        Arguments :
+        - lecture : lecture partagée terminée
+        """
+        with self.lock:
+            if self.reads.get(lecture.key) is lecture:
+                del self.reads[lecture.key]
+
+class ChunkBody:
+    """
+    Classe : corps d'objet construit sur un itérateur de blocs, avec les mêmes méthodes de parcours que le corps
+    d'un objet du S3 (iter_chunks, iter_lines), pour être passé à generate().
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def iter_chunks(self, chunk_size=None):
+        """
+        Fonction : fonction génératrice qui renvoie les blocs tels quels (chunk_size est ignoré : les blocs sont ceux de la lecture).
+
+        Renvoit en yield :
+        - bloc (en octets)
+        """
+        yield from self.chunks
+
+    def iter_lines(self):
+        """
+        Fonction : fonction génératrice qui découpe les blocs en lignes (sans le retour à la ligne).
+
+        Renvoit en yield :
+        - ligne (en octets)
+        """
+        reste = b""
+        for bloc in self.chunks:
+            lignes = (reste + bloc).split(b"\n")
+            reste = lignes.pop()
+            yield from lignes
+        if reste:
+            yield reste
+
+    def close(self):
+        """
+        Fonction : ferme l'itérateur des blocs (le client est alors désabonné de la lecture partagée).
+        """
+        if hasattr(self.chunks, "close"):
+            self.chunks.close()
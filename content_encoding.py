@@ -0,0 +1,159 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Compression des fichiers JSON (variantes gzip/zstd précompressées, compression à la volée, négociation Accept-Encoding)
+###################-
+
+# Chargement des librairies
+import os
+import zlib
+
+# zstd est optionnel : sans le module zstandard, seule la variante gzip est produite et proposée
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Suffixe des variantes compressées dans le S3 (data/<type>.jsonl.gz, data/<type>.jsonl.zst), par ordre de préférence
+VARIANT_SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+
+# Niveaux de compression : élevés pour les variantes précompressées (une fois par actualisation), bas à la volée
+PRECOMPRESS_LEVELS = {"gzip": int(os.environ.get("GZIP_PRECOMPRESS_LEVEL", "9")),
+                      "zstd": int(os.environ.get("ZSTD_PRECOMPRESS_LEVEL", "15"))}
+STREAM_LEVELS = {"gzip": int(os.environ.get("GZIP_STREAM_LEVEL", "5")),
+                 "zstd": int(os.environ.get("ZSTD_STREAM_LEVEL", "3"))}
+STREAM_FLUSH_BYTES = 64 * 1024 # Données envoyées au client au moins tous les 64 KB lus (streaming progressif)
+
+def available_encodings():
+    """
+    Fonction : encodages disponibles, par ordre de préférence.
+    """
+    return tuple(encoding for encoding in VARIANT_SUFFIXES if encoding != "zstd" or zstandard is not None)
+
+def negotiate(accept_encoding, encodings=None):
+    """
+    Fonction : choisit l'encodage de la réponse selon l'en-tête Accept-Encoding du client (valeurs q comprises).
+
+    Arguments :
+    - accept_encoding : valeur de l'en-tête (ex : "gzip, deflate, br, zstd" ou "gzip;q=0.5, zstd;q=1")
+    - encodings (par défaut : None) : encodages proposés par ordre de préférence (par défaut available_encodings())
+
+    Renvoie :
+    - encoding : "zstd", "gzip" ou None (pas de compression)
+    """
+    if encodings is None:
+        encodings = available_encodings()
+
+    poids = {}
+    for element in (accept_encoding or "").split(","):
+        nom, _, parametres = element.strip().partition(";")
+        nom = nom.strip().lower()
+        if not nom:
+            continue
+        q = 1.0
+        parametres = parametres.strip()
+        if parametres.startswith("q="):
+            try:
+                q = float(parametres[2:])
+            except ValueError:
+                q = 0.0
+        poids[nom] = q
+
+    meilleur, meilleur_q = None, 0.0
+    for encoding in encodings:
+        q = poids.get(encoding, poids.get("*", 0.0))
+        if q > meilleur_q:
+            meilleur, meilleur_q = encoding, q
+    return meilleur
+
+class StreamCompressor:
+    """
+    Classe : compresseur incrémental gzip ou zstd, avec vidage intermédiaire (le client peut décompresser au fur et à mesure).
+    """
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # 31 : en-tête et fin gzip
+        else:
+            self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        """
+        Fonction : compresse un bloc (le compresseur peut en garder une partie jusqu'au prochain vidage).
+
+        Arguments :
+        - data : bloc à compresser (en octets)
+
+        Renvoie :
+        - octets compressés disponibles (éventuellement vide)
+        """
+        return self.compressor.compress(data)
+
+    def sync(self):
+        """
+        Fonction : vide le compresseur sans terminer le flux : tout ce qui a été compressé peut être décompressé par le client.
+
+        Renvoie :
+        - octets compressés
+        """
+        if self.encoding == "gzip":
+            return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        """
+        Fonction : termine le flux compressé (fin gzip ou dernier bloc zstd).
+
+        Renvoie :
+        - derniers octets compressés
+        """
+        return self.compressor.flush()
+
+def compress_stream(chunks, encoding, level=None):
+    """
+    Fonction : fonction génératrice qui compresse à la volée les blocs d'une réponse.
+
+    Arguments :
+    - chunks : blocs (en octets) à compresser
+    - encoding : "gzip" ou "zstd"
+    - level (par défaut : None) : niveau de compression (par défaut STREAM_LEVELS)
+
+    Renvoit en yield :
+    - bloc compressé (en octets)
+    """
+    compresseur = StreamCompressor(encoding, STREAM_LEVELS[encoding] if level is None else level)
+    en_attente = 0
+    for bloc in chunks:
+        if isinstance(bloc, str):
+            bloc = bloc.encode("utf-8")
+        sortie = compresseur.compress(bloc)
+        en_attente += len(bloc)
+        if en_attente >= STREAM_FLUSH_BYTES:
+            sortie += compresseur.sync()
+            en_attente = 0
+        if sortie:
+            yield sortie
+    yield compresseur.finish()
+
+def compress_file(path, path_out, encoding, level=None, chunk_size=1024 * 1024):
+    """
+    Fonction : compresse un fichier en gzip ou zstd, par morceaux.
+
+    Arguments :
+    - path : chemin du fichier à compresser
+    - path_out : chemin du fichier compressé
+    - encoding : "gzip" ou "zstd"
+    - level (par défaut : None) : niveau de compression (par défaut PRECOMPRESS_LEVELS)
+    - chunk_size (par défaut : 1 MB) : taille des morceaux lus
+
+    Renvoie :
+    - size : taille du fichier compressé
+    """
+    compresseur = StreamCompressor(encoding, PRECOMPRESS_LEVELS[encoding] if level is None else level)
+    taille = 0
+    with open(path, "rb") as f, open(path_out, "wb") as out:
+        while bloc := f.read(chunk_size):
+            taille += out.write(compresseur.compress(bloc))
+        taille += out.write(compresseur.finish())
+    return taille
@@ -0,0 +1,197 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Cache disque des fichiers JSON du S3 (revalidation par ETag, éviction des moins récemment utilisés)
+###################-
+
+# Chargement des librairies
+import os
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from botocore.exceptions import ClientError
+from logger_write import log_memory_usage
+
+# Configuration du cache
+CACHE_DIR = Path(os.environ.get("API_CACHE_DIR", "cache/api"))
+CACHE_MAX_BYTES = int(os.environ.get("API_CACHE_MAX_MB", "512")) * 1024 * 1024 # Budget disque du cache
+CACHE_REVALIDATE_SECONDS = int(os.environ.get("API_CACHE_REVALIDATE_SECONDS", "30")) # Durée pendant laquelle une copie vérifiée est servie sans interroger le S3
+CACHE_CHUNK_SIZE = 64 * 1024
+
+class DiskCache:
+    """
+    Classe : cache disque en lecture des objets du S3. Une copie locale est servie tant que son ETag est celui
+    de l'objet dans le S3 (vérifié par une requête conditionnelle If-None-Match, au plus toutes les
+    CACHE_REVALIDATE_SECONDS secondes). Au-delà du budget disque, les copies utilisées le moins récemment sont supprimées.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, revalidate_seconds=CACHE_REVALIDATE_SECONDS):
+        self.directory = Path(directory).resolve() # Chemin absolu (send_file résout les chemins relatifs depuis l'application)
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.stats = {"hits": 0, "misses": 0, "revalidations": 0, "evictions": 0, "bypass": 0}
+        self.lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def paths(self, key):
+        """
+        Fonction : chemins de la copie locale d'un objet et de ses métadonnées (ETag, taille, dernière vérification).
+        """
+        nom = key.replace("/", "__")
+        return self.directory / nom, self.directory / f"{nom}.meta.json"
+
+    def read_meta(self, key):
+        """
+        Fonction : métadonnées de la copie locale d'un objet, si la copie existe et a la taille attendue.
+
+        Arguments :
+        - key : chemin de l'objet dans le S3
+
+        Renvoie :
+        - meta : dictionnaire (ETag, taille, dernière vérification) ou None sans copie utilisable
+        """
+        path, path_meta = self.paths(key)
+        try:
+            meta = json.loads(path_meta.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not path.exists() or path.stat().st_size != meta["size"]:
+            return None
+        return meta
+
+    def write_meta(self, key, meta):
+        """
+        Fonction : enregistre les métadonnées de la copie locale d'un objet.
+
+        Arguments :
+        - key : chemin de l'objet dans le S3
+        - meta : dictionnaire (ETag, taille, dernière vérification)
+        """
+        _, path_meta = self.paths(key)
+        path_meta.write_text(json.dumps(meta), encoding="utf-8")
+
+    def count(self, stat):
+        """
+        Fonction : incrémente un compteur du cache (hits, misses, revalidations, evictions ou bypass), entre plusieurs fils.
+        """
+        with self.lock:
+            self.stats[stat] += 1
+
+    def get(self, s3, bucket, key):
+        """
+        Fonction : cherche une copie locale à jour d'un objet du S3 ; sinon lance sa récupération.
+
+        Arguments :
+        - s3 : client S3
+        - bucket : nom du bucket
+        - key : chemin de l'objet dans le S3
+
+        Renvoie :
+        - (path, etag, None) si la copie locale est à jour
+        - (None, etag, s3_object) sinon : s3_object est la réponse du S3, à streamer avec fill()
+        """
+
+        path, _ = self.paths(key)
+        meta = self.read_meta(key)
+
+        # Copie vérifiée récemment : servie sans interroger le S3
+        if meta is not None and time.time() - meta["validated"] < self.revalidate_seconds:
+            self.count("hits")
+            os.utime(path) # Date d'accès pour l'éviction
+            return path, meta["etag"], None
+
+        # Sinon une seule requête : 304 si la copie est à jour, l'objet complet sinon
+        params = {"Bucket": bucket, "Key": key}
+        if meta is not None:
+            params["IfNoneMatch"] = meta["etag"]
+        try:
+            s3_object = s3.get_object(**params)
+        except ClientError as e:
+            if meta is not None and e.response.get("Error", {}).get("Code") in ("304", "NotModified"):
+                self.count("hits")
+                self.count("revalidations")
+                meta["validated"] = time.time()
+                self.write_meta(key, meta)
+                os.utime(path)
+                return path, meta["etag"], None
+            raise
+
+        self.count("misses")
+        return None, s3_object["ETag"], s3_object
+
+    def fill(self, key, s3_object):
+        """
+        Fonction : fonction génératrice qui renvoie le corps de l'objet par blocs tout en l'écrivant dans le cache.
+        La copie n'est gardée que si l'objet a été lu jusqu'au bout (client resté connecté).
+
+        Arguments :
+        - key : chemin de l'objet dans le S3
+        - s3_object : réponse du S3 (corps, ETag et taille de l'objet)
+
+        Renvoit en yield :
+        - bloc du fichier (en octets)
+        """
+
+        s3_body, size = s3_object["Body"], s3_object["ContentLength"]
+
+        # Objet trop gros pour le budget : streamé sans être gardé
+        if size > self.max_bytes:
+            self.count("bypass")
+            yield from s3_body.iter_chunks(CACHE_CHUNK_SIZE)
+            return
+
+        path, _ = self.paths(key)
+        fd, path_tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        taille = 0
+        complet = False
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for bloc in s3_body.iter_chunks(CACHE_CHUNK_SIZE):
+                    f.write(bloc)
+                    taille += len(bloc)
+                    yield bloc
+            complet = taille == size
+        finally:
+            if complet:
+                os.replace(path_tmp, path)
+                self.write_meta(key, {"key": key, "etag": s3_object["ETag"], "size": taille, "validated": time.time()})
+                self.evict()
+            else:
+                os.unlink(path_tmp)
+
+    def evict(self):
+        """
+        Fonction : supprime les copies utilisées le moins récemment tant que le cache dépasse son budget disque.
+        """
+
+        copies = []
+        for path_meta in self.directory.glob("*.meta.json"):
+            path = path_meta.with_name(path_meta.name[:-len(".meta.json")])
+            if path.exists():
+                copies.append((path.stat().st_mtime, path.stat().st_size, path, path_meta))
+
+        total = sum(taille for _, taille, _, _ in copies)
+        for _, taille, path, path_meta in sorted(copies, key=lambda copie: copie[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            path_meta.unlink(missing_ok=True)
+            total -= taille
+            self.count("evictions")
+            msg = f"Cache disque : suppression de {path.name} ({taille} octets)"
+            log_memory_usage(msg)
+            print(msg)
+
+    def summary(self):
+        """
+        Fonction : compteurs du cache (succès, échecs, revalidations, évictions) et occupation du disque.
+        """
+        copies = [p for p in self.directory.iterdir() if not p.name.endswith((".meta.json", ".part"))]
+        with self.lock:
+            resume = dict(self.stats)
+        resume["entries"] = len(copies)
+        resume["bytes"] = sum(p.stat().st_size for p in copies)
+        resume["max_bytes"] = self.max_bytes
+        return resume
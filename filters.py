@@ -0,0 +1,169 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Filtrage des lignes JSON directement sur les octets (sans décoder ni réécrire les lignes)
+###################-
+
+# Chargement des librairies
+import re
+import json
+import datetime
+from time_index import extract_date, in_bounds, parse_date_bounds
+from tile_index import extract_position, in_bbox, parse_bbox
+
+# Champs filtrables par égalité, et tables qui les contiennent
+EQUALITY_FIELDS = {
+    "apparatusId": ("openradiation", "measurements", "apparatus"),
+    "deviceUuid": ("openradiation", "measurements", "devices"),
+    "userId": ("openradiation", "measurements"),
+    "flightId": ("openradiation", "measurements", "flight"),
+    "measurementEnvironment": ("openradiation", "measurements"),
+}
+NUMERIC_FIELDS = ("flightId",) # Champs écrits sans guillemets dans le JSON
+LOWERCASE_FIELDS = ("apparatusId", "deviceUuid") # Identifiants mis en minuscules par table_creation.py
+DATED_TYPES = ("openradiation", "measurements") # Tables avec une date de création et une valeur mesurée
+
+# Valeur mesurée, lue directement dans la ligne JSON
+VALUE_PATTERN = re.compile(rb'"value":(-?[0-9][0-9.eE+-]*)')
+
+class LineFilter:
+    """
+    Classe : ensemble de prédicats (dates, emprise, égalités, seuils sur la valeur) évalués sur les octets
+    d'une ligne JSON, avec les compteurs des lignes lues, envoyées, filtrées et mal formées.
+    """
+
+    def __init__(self, lower=None, upper=None, bbox=None, equals=None, min_value=None, max_value=None):
+        self.lower = lower
+        self.upper = upper
+        self.bbox = bbox
+        self.min_value = min_value
+        self.max_value = max_value
+        self.values = equals or {} # champ -> valeurs acceptées
+
+        # Pour chaque champ, motifs exacts "champ":valeur tels qu'écrits par pandas (un seul doit correspondre)
+        self.equals = []
+        for field, values in (equals or {}).items():
+            if field in NUMERIC_FIELDS:
+                motifs = [re.compile(rb'"' + field.encode() + rb'":' + re.escape(str(v).encode()) + rb'[,}]') for v in values]
+            else:
+                motifs = [re.compile(re.escape(b'"' + field.encode() + b'":' + json_string(v))) for v in values]
+            self.equals.append(motifs)
+
+        self.stats = {"read": 0, "sent": 0, "filtered": 0, "malformed": 0}
+
+    def is_empty(self):
+        """
+        Fonction : indique si aucun prédicat n'est demandé (les lignes peuvent alors être envoyées sans être examinées).
+        """
+        return (self.lower is None and self.upper is None and self.bbox is None and not self.equals
+                and self.min_value is None and self.max_value is None)
+
+    def has_date_window(self):
+        """
+        Fonction : indique si une fenêtre de dates (from, to ou filter_last_two_years) est demandée.
+        """
+        return self.lower is not None or self.upper is not None
+
+    def matches(self, line: bytes):
+        """
+        Fonction : indique si une ligne JSON vérifie tous les prédicats, et met à jour les compteurs.
+
+        Arguments :
+        - line : la ligne JSON (en octets, sans le retour à la ligne)
+
+        Renvoie :
+        - bool : True si la ligne doit être envoyée
+        """
+        self.stats["read"] += 1
+
+        # Une ligne d'objet JSON commence par { et finit par } : sinon elle est comptée et ignorée
+        line = line.strip()
+        if not line.startswith(b"{") or not line.endswith(b"}"):
+            self.stats["malformed"] += 1
+            return False
+
+        if self.has_date_window() and not in_bounds(extract_date(line), self.lower, self.upper):
+            self.stats["filtered"] += 1
+            return False
+
+        for motifs in self.equals:
+            if not any(motif.search(line) for motif in motifs):
+                self.stats["filtered"] += 1
+                return False
+
+        if self.min_value is not None or self.max_value is not None:
+            match = VALUE_PATTERN.search(line)
+            value = float(match.group(1)) if match else None
+            if value is None or (self.min_value is not None and value < self.min_value) \
+                    or (self.max_value is not None and value > self.max_value):
+                self.stats["filtered"] += 1
+                return False
+
+        if self.bbox is not None and not in_bbox(extract_position(line), self.bbox):
+            self.stats["filtered"] += 1
+            return False
+
+        self.stats["sent"] += 1
+        return True
+
+    def older_than_window(self, line: bytes):
+        """
+        Fonction : indique si la ligne est plus ancienne que la borne inférieure (fin de parcours d'un fichier trié par date décroissante).
+        """
+        if self.lower is None:
+            return False
+        date = extract_date(line)
+        return date is not None and date[:19] < self.lower
+
+def json_string(value):
+    """
+    Fonction : écrit une chaîne comme pandas.to_json (non ASCII échappé, "/" échappé en "\\/").
+    """
+    return json.dumps(value).replace("/", "\\/").encode("ascii")
+
+def build_line_filter(args, type):
+    """
+    Fonction : construit le filtre d'une requête à partir de ses paramètres :
+    from/to (ou filter_last_two_years), bbox, apparatusId, deviceUuid, userId, flightId, measurementEnvironment
+    (plusieurs valeurs séparées par des virgules), min_value et max_value.
+
+    Arguments :
+    - args : paramètres de la requête
+    - type : type de la table demandée
+
+    Renvoie :
+    - line_filter : le filtre (LineFilter)
+
+    Lève :
+    - ValueError si un paramètre est invalide
+    """
+
+    lower = upper = bbox = min_value = max_value = None
+    if type in DATED_TYPES:
+        lower, upper = parse_date_bounds(args.get("from"), args.get("to"))
+
+        # Le filtrage des deux dernières années revient à une fenêtre démarrant au 1er janvier de l'année précédente
+        if args.get("filter_last_two_years", "false").lower() == "true":
+            now = datetime.datetime.now(datetime.timezone.utc)
+            lower = max(lower or "", f"{now.year - 1}-01-01T00:00:00")
+
+        if args.get("min_value"):
+            min_value = float(args["min_value"])
+        if args.get("max_value"):
+            max_value = float(args["max_value"])
+
+    # Emprise géographique, seulement pour les mesures
+    if type == "measurements" and args.get("bbox"):
+        bbox = parse_bbox(args["bbox"])
+
+    equals = {}
+    for field, types in EQUALITY_FIELDS.items():
+        if type in types and args.get(field):
+            values = [v.strip() for v in args[field].split(",") if v.strip()]
+            if field in NUMERIC_FIELDS:
+                values = [int(v) for v in values]
+            elif field in LOWERCASE_FIELDS:
+                values = [v.lower() for v in values]
+            equals[field] = values
+
+    return LineFilter(lower, upper, bbox, equals, min_value, max_value)
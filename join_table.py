@@ -0,0 +1,289 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Table détaillée (openradiation) reconstruite à la volée à partir des mesures et des colonnes des appareils et des vols
+###################-
+
+# Principe :
+# - pour chaque appareil (apparatusId, deviceUuid) et chaque vol (flightId), les colonnes de la première ligne rencontrée
+#   servent de référence (texte JSON tel qu'écrit par pandas) ; une référence publiée n'est jamais modifiée ensuite,
+#   les actualisations suivantes ne font qu'ajouter les nouveaux identifiants ;
+# - une ligne dont les colonnes d'un appareil ou du vol sont celles de la référence (ou toutes vides sans identifiant)
+#   est publiée sans elles ; sinon elle les garde à leur place ;
+# - l'API remet les colonnes absentes à leur place : la ligne reconstruite est identique, octet par octet,
+#   à celle de la table détaillée (les filtres portent sur des colonnes toujours présentes).
+
+# Chargement des librairies
+import re
+import json
+from botocore.exceptions import ClientError
+
+# numpy et pandas ne sont importés que par l'actualisation (JoinEncoder, core_jsonl) : l'API n'en a pas besoin
+
+# Table des mesures sans les colonnes des appareils et des vols (data/openradiation_core.jsonl) et références publiées
+CORE_TABLE = "openradiation_core"
+JOIN_KEY = "data/openradiation.join.json"
+
+# Colonnes des appareils et des vols de la table détaillée, par identifiant
+JOIN_GROUPS = {
+    "apparatusId": ("apparatusVersion", "apparatusSensorType", "apparatusTubeType"),
+    "deviceUuid": ("devicePlatform", "deviceVersion", "deviceModel"),
+    "flightId": ("flightNumber", "seatNumber", "windowSeat", "departureTime", "arrivalTime",
+                 "airportOrigin", "airportDestination", "aircraftType"),
+}
+
+def column_runs(columns):
+    """
+    Fonction : suites de colonnes consécutives d'un même appareil ou vol, dans l'ordre des colonnes de la table détaillée
+    (les colonnes d'un vol sont par exemple coupées en deux par storm et flightId).
+
+    Arguments :
+    - columns : colonnes de la table détaillée, dans l'ordre
+
+    Renvoie :
+    - runs : liste de dictionnaires {"key", "columns", "after"} (after : colonne qui précède la suite, None en tête de ligne)
+    """
+    groupe_de = {col: key for key, attrs in JOIN_GROUPS.items() if key in columns for col in attrs}
+    runs = []
+    for i, col in enumerate(columns):
+        key = groupe_de.get(col)
+        if key is None:
+            continue
+        if runs and runs[-1]["key"] == key and runs[-1]["columns"][-1] == columns[i - 1]:
+            runs[-1]["columns"].append(col)
+        else:
+            runs.append({"key": key, "columns": [col], "after": columns[i - 1] if i else None})
+    return runs
+
+def rendered(df, columns):
+    """
+    Fonction : texte JSON de quelques colonnes pour chaque ligne, sans les accolades ('"col":valeur,"col":valeur').
+    """
+    from schema import to_jsonl
+
+    return [line[1:-1] for line in to_jsonl(df[columns]).split("\n")[:-1]]
+
+class JoinEncoder:
+    """
+    Classe : références des appareils et des vols, complétées morceau par morceau, et choix des lignes publiées
+    sans les colonnes d'un appareil ou du vol. L'état repris d'une actualisation précédente garde ses références.
+    """
+
+    def __init__(self, state=None):
+        self.previous = state
+        self.columns = None # Colonnes de la table détaillée, connues au premier morceau
+        self.runs = []
+        self.values = {}
+        self.restarted = False # Références précédentes abandonnées (colonnes différentes)
+        self.stats = {"rows": 0}
+
+    def start(self, columns):
+        """
+        Fonction : fixe les colonnes de la table détaillée et reprend les références précédentes si elles ont les mêmes
+        colonnes (sinon leurs suites ne correspondraient plus, et l'on repart de zéro).
+        """
+        self.columns = list(columns)
+        self.runs = column_runs(self.columns)
+        self.values = {key: {} for key in JOIN_GROUPS if any(run["key"] == key for run in self.runs)}
+        if self.previous is not None and self.previous.get("columns") == self.columns:
+            self.values.update(self.previous["values"])
+        elif self.previous is not None:
+            self.restarted = True
+        self.stats.update({key: 0 for key in self.values})
+
+    def add(self, chunk):
+        """
+        Fonction : ajoute les identifiants jamais rencontrés d'un morceau de la table détaillée aux références
+        et indique, pour chaque appareil ou vol, les lignes qui peuvent être publiées sans ses colonnes.
+
+        Arguments :
+        - chunk : morceau de la table détaillée (tous les morceaux ont les mêmes colonnes, dans le même ordre)
+
+        Renvoie :
+        - absent : dictionnaire identifiant -> tableau de booléens (True : colonnes retirées de la ligne)
+        """
+        import numpy as np
+        import pandas as pd
+
+        if self.columns is None:
+            self.start(chunk.columns)
+        absent = {}
+        for key, references in self.values.items():
+            runs = [run for run in self.runs if run["key"] == key]
+            colonnes = [key] + [col for run in runs for col in run["columns"]]
+            sub = chunk[colonnes]
+
+            # Combinaisons distinctes (identifiant et colonnes), numérotées dans l'ordre de leur première ligne
+            codes, _ = pd.factorize(pd.util.hash_pandas_object(sub, index=False).to_numpy())
+            premieres = np.unique(codes, return_index=True)[1]
+            representants = sub.iloc[premieres]
+            cles = [cle[len(key) + 3:] for cle in rendered(representants, [key])]
+            fragments = [rendered(representants, run["columns"]) for run in runs]
+            vides = representants[colonnes[1:]].isna().all(axis=1).to_numpy()
+
+            memes = np.empty(len(premieres), dtype=bool)
+            for i, cle in enumerate(cles):
+                if cle == "null":
+                    memes[i] = vides[i]
+                    continue
+                valeurs = [fragment[i] for fragment in fragments]
+                memes[i] = references.setdefault(cle, valeurs) == valeurs
+            absent[key] = memes[codes]
+            self.stats[key] += int(absent[key].sum())
+        self.stats["rows"] += len(chunk)
+        return absent
+
+    def state(self):
+        """
+        Fonction : références publiées (lues par l'API et reprises par les actualisations suivantes).
+        """
+        if self.columns is None:
+            return self.previous or {"columns": [], "runs": [], "values": {}}
+        return {"columns": self.columns, "runs": self.runs, "values": self.values}
+
+def core_jsonl(df, absent):
+    """
+    Fonction : texte JSON des lignes de la table détaillée sans les colonnes des appareils et des vols qui peuvent
+    être retirées (voir JoinEncoder.add). Fonction de module pour pouvoir être exécutée dans un processus du groupe de conversion.
+
+    Arguments :
+    - df : morceau de la table détaillée
+    - absent : dictionnaire identifiant -> tableau de booléens renvoyé par JoinEncoder.add
+
+    Renvoie :
+    - text : le texte JSON (vide si le DataFrame est vide)
+    """
+    import numpy as np
+    from schema import to_jsonl
+
+    if df.empty:
+        return ""
+
+    # Lignes regroupées selon les colonnes retirées : chaque groupe est écrit d'un coup, puis remis à sa place
+    groupes = list(absent)
+    motifs = np.zeros(len(df), dtype=np.int64)
+    for i, key in enumerate(groupes):
+        motifs |= absent[key].astype(np.int64) << i
+    lignes = [None] * len(df)
+    for motif in np.unique(motifs):
+        positions = np.flatnonzero(motifs == motif)
+        retirees = {col for i, key in enumerate(groupes) if motif >> i & 1 for col in JOIN_GROUPS[key]}
+        colonnes = [col for col in df.columns if col not in retirees]
+        for position, line in zip(positions, to_jsonl(df.iloc[positions][colonnes]).split("\n")):
+            lignes[position] = line
+    return "\n".join(lignes) + "\n"
+
+def value_pattern(column):
+    """
+    Fonction : motif d'une colonne et de sa valeur dans une ligne JSON (chaîne avec échappements, nombre ou null).
+    """
+    return re.compile(rb'"' + re.escape(column.encode()) + rb'":("(?:[^"\\]|\\.)*"|[^,}]*)')
+
+class JoinDecoder:
+    """
+    Classe : reconstruit les lignes de la table détaillée à partir des lignes publiées et des références
+    (chargées une fois, gardées en mémoire sous forme de tables de hachage identifiant -> texte des colonnes).
+    """
+
+    def __init__(self, reference):
+        # Pour chaque suite : identifiant, numéro de la suite pour cet identifiant, colonne qui la précède
+        # (motif cherché dans la ligne) ou suite qui la précède (si c'est une colonne d'un autre appareil ou vol)
+        self.runs = []
+        numeros, suite_de = {}, {}
+        for i, run in enumerate(reference["runs"]):
+            numero = numeros[run["key"]] = numeros.get(run["key"], -1) + 1
+            apres = run["after"]
+            self.runs.append((run["key"], numero, suite_de.get(apres),
+                              None if apres is None or apres in suite_de else (b'"' + apres.encode() + b'":', value_pattern(apres))))
+            suite_de.update({col: i for col in run["columns"]})
+        premieres = {}
+        for run in reference["runs"]:
+            premieres.setdefault(run["key"], run["columns"][0])
+        self.presence = {key: b'"' + col.encode() + b'":' for key, col in premieres.items()}
+        self.keys = {key: (b'"' + key.encode() + b'":', value_pattern(key)) for key in premieres}
+        self.values = {key: {cle.encode(): [fragment.encode() for fragment in fragments] for cle, fragments in valeurs.items()}
+                       for key, valeurs in reference["values"].items()}
+        self.nulls = {key: [] for key in premieres}
+        for run in reference["runs"]:
+            self.nulls[run["key"]].append(",".join(f'"{col}":null' for col in run["columns"]).encode())
+
+    def join(self, line: bytes):
+        """
+        Fonction : remet dans une ligne publiée les colonnes des appareils et des vols qui en ont été retirées.
+
+        Arguments :
+        - line : la ligne JSON publiée (en octets, sans le retour à la ligne)
+
+        Renvoie :
+        - line : la ligne de la table détaillée
+        """
+        morceaux, positions, presents, fragments = [], {}, set(), {}
+        debut = 0
+        for i, (key, numero, suite, colonne) in enumerate(self.runs):
+            if key in presents:
+                continue
+
+            # Position de la suite : après la valeur de la colonne qui la précède (ou de la suite insérée qui la précède)
+            match = None
+            if suite in positions:
+                position = positions[suite]
+            elif colonne is None:
+                position = 1 # Suite en tête de ligne, après l'accolade
+            else:
+                prefixe, motif = colonne
+                match = motif.match(line, max(line.find(prefixe), 0))
+                if match is None:
+                    return line # Ligne mal formée : renvoyée telle quelle
+                position = match.end()
+
+            # Les colonnes sont toutes présentes ou toutes retirées : la première suite suffit pour le savoir
+            if numero == 0 and line.startswith(self.presence[key], position if position == 1 else position + 1):
+                presents.add(key)
+                continue
+
+            valeurs = fragments.get(key)
+            if valeurs is None:
+                if match is None or colonne[0] != self.keys[key][0]:
+                    prefixe, motif = self.keys[key]
+                    match = motif.match(line, max(line.find(prefixe), 0))
+                valeurs = fragments[key] = self.values[key].get(match.group(1) if match else b"null") or self.nulls[key]
+
+            morceaux.append(line[debut:position])
+            morceaux.append(valeurs[numero] + b"," if position == 1 else b"," + valeurs[numero])
+            positions[i] = debut = position
+        if not morceaux:
+            return line
+        morceaux.append(line[debut:])
+        return b"".join(morceaux)
+
+    def join_chunks(self, chunks):
+        """
+        Fonction : fonction génératrice qui reconstruit les lignes de blocs ou de lignes JSON publiés.
+
+        Arguments :
+        - chunks : blocs ou lignes (en octets, avec retours à la ligne)
+
+        Renvoit en yield :
+        - bloc de lignes de la table détaillée (en octets)
+        """
+        reste = b""
+        for bloc in chunks:
+            lignes = (reste + bloc).split(b"\n")
+            reste = lignes.pop()
+            sortie = [self.join(line) for line in lignes if line]
+            if sortie:
+                yield b"\n".join(sortie) + b"\n"
+        if reste.strip():
+            yield self.join(reste.strip()) + b"\n"
+
+def read_join_s3(s3, bucket):
+    """
+    Fonction : récupère les références publiées par la dernière actualisation.
+
+    Renvoie :
+    - state : les références, ou None si la table détaillée est publiée en entier
+    """
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=JOIN_KEY)['Body'].read())
+    except ClientError:
+        return None
@@ -0,0 +1,190 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Test de charge : beaucoup de téléchargements longs simultanés (clients lents) et mémoire du serveur
+###################-
+
+# Exemple (serveur asynchrone, puis même test sur gunicorn) :
+#   uvicorn asgi_app:application --port 8000 & python load_test.py --url http://127.0.0.1:8000 --clients 300 --rate 64 --pid $!
+#   gunicorn app:app -w 4 --threads 8 -b 127.0.0.1:8001 & python load_test.py --url http://127.0.0.1:8001 --clients 300 --rate 64 --pid $!
+
+# Chargement des librairies
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+
+def rss_mb(pid):
+    """
+    Fonction : mémoire résidente (RSS) d'un processus et de ses descendants (workers gunicorn), en MB.
+
+    Arguments :
+    - pid : identifiant du processus principal du serveur
+
+    Renvoie :
+    - rss : mémoire en MB (None si elle ne peut pas être lue)
+    """
+    try:
+        import psutil
+        processus = psutil.Process(pid)
+        return sum(p.memory_info().rss for p in [processus, *processus.children(recursive=True)]) / (1024 ** 2)
+    except ImportError:
+        pass
+    except Exception:
+        return None
+
+    # Sans psutil : lecture de /proc (Linux)
+    parents = {}
+    for nom in os.listdir("/proc"):
+        if nom.isdigit():
+            try:
+                with open(f"/proc/{nom}/stat") as f:
+                    parents[int(nom)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except OSError:
+                continue
+    famille, a_voir = set(), [pid]
+    while a_voir:
+        courant = a_voir.pop()
+        famille.add(courant)
+        a_voir.extend(p for p, parent in parents.items() if parent == courant and p not in famille)
+
+    total = 0
+    for p in famille:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                total += next(int(ligne.split()[1]) for ligne in f if ligne.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            continue
+    return total / 1024 if total else None
+
+async def client(numero, args, etat):
+    """
+    Fonction : un client qui télécharge la réponse en entier, au plus à args.rate KB/s.
+
+    Arguments :
+    - numero : numéro du client
+    - args : paramètres du test
+    - etat : compteurs partagés du test
+
+    Renvoie :
+    - resultat : dictionnaire (status, ttfb, duree, octets, erreur)
+    """
+    await asyncio.sleep(args.ramp * numero / max(args.clients, 1))
+    url = urlsplit(args.url)
+    chemin = args.path
+    debut = time.monotonic()
+    resultat = {"status": None, "ttfb": None, "duree": None, "octets": 0, "erreur": None}
+    writer = None
+    try:
+        reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+        en_tetes = [f"GET {chemin} HTTP/1.1", f"Host: {url.netloc}", "Connection: close",
+                    f"Accept-Encoding: {args.accept_encoding}", "", ""]
+        writer.write("\r\n".join(en_tetes).encode("latin-1"))
+        await writer.drain()
+
+        ligne = await reader.readline()
+        resultat["ttfb"] = time.monotonic() - debut
+        resultat["status"] = int(ligne.split()[1])
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        etat["ouverts"] += 1
+        etat["pic"] = max(etat["pic"], etat["ouverts"])
+        try:
+            debut_corps = time.monotonic()
+            while bloc := await reader.read(16 * 1024):
+                resultat["octets"] += len(bloc)
+                if args.rate > 0:
+                    # Client lent : attend pour ne pas dépasser args.rate KB/s
+                    avance = resultat["octets"] / (args.rate * 1024) - (time.monotonic() - debut_corps)
+                    if avance > 0:
+                        await asyncio.sleep(avance)
+        finally:
+            etat["ouverts"] -= 1
+    except Exception as e:
+        resultat["erreur"] = f"{type(e).__name__}: {e}"
+    finally:
+        if writer is not None:
+            writer.close()
+    resultat["duree"] = time.monotonic() - debut
+    return resultat
+
+async def sample_memory(args, etat, fin):
+    """
+    Fonction : relève la mémoire du serveur et le nombre de téléchargements ouverts chaque seconde.
+    """
+    while not fin.is_set():
+        if args.pid:
+            rss = rss_mb(args.pid)
+            if rss is not None:
+                etat["rss"].append(rss)
+        etat["ouverts_releves"].append(etat["ouverts"])
+        try:
+            await asyncio.wait_for(fin.wait(), 1)
+        except asyncio.TimeoutError:
+            pass
+
+def percentile(valeurs, p):
+    """
+    Fonction : centile p (entre 0 et 100) d'une liste de valeurs.
+    """
+    if not valeurs:
+        return None
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p / 100))]
+
+async def main(args):
+    """
+    Fonction : lance les clients, attend leur fin et affiche le bilan.
+    """
+    etat = {"ouverts": 0, "pic": 0, "rss": [], "ouverts_releves": []}
+    fin = asyncio.Event()
+    releves = asyncio.create_task(sample_memory(args, etat, fin))
+    rss_depart = rss_mb(args.pid) if args.pid else None
+
+    debut = time.monotonic()
+    resultats = await asyncio.gather(*(client(i, args, etat) for i in range(args.clients)))
+    duree = time.monotonic() - debut
+    fin.set()
+    await releves
+
+    reussis = [r for r in resultats if r["status"] == 200 and r["erreur"] is None]
+    statuts = {}
+    for r in resultats:
+        statuts[str(r["status"])] = statuts.get(str(r["status"]), 0) + 1
+    bilan = {
+        "url": args.url + args.path,
+        "clients": args.clients,
+        "rate_kb_s": args.rate,
+        "duree_s": round(duree, 2),
+        "reussis": len(reussis),
+        "statuts": statuts,
+        "erreurs": sorted({r["erreur"] for r in resultats if r["erreur"]}),
+        "pic_telechargements_ouverts": etat["pic"],
+        "ttfb_p50_s": percentile([r["ttfb"] for r in reussis], 50),
+        "ttfb_p95_s": percentile([r["ttfb"] for r in reussis], 95),
+        "octets_par_client": percentile([r["octets"] for r in reussis], 50),
+        "debit_total_mb_s": round(sum(r["octets"] for r in resultats) / duree / (1024 ** 2), 2),
+        "rss_depart_mb": rss_depart and round(rss_depart, 1),
+        "rss_pic_mb": etat["rss"] and round(max(etat["rss"]), 1),
+    }
+    print(json.dumps(bilan, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(bilan, f, indent=2, ensure_ascii=False)
+    return 0 if len(reussis) == args.clients else 1
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Test de charge des téléchargements en streaming")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="adresse du serveur")
+    parser.add_argument("--path", default="/api/data/openradiation", help="route téléchargée par chaque client")
+    parser.add_argument("--clients", type=int, default=300, help="nombre de téléchargements simultanés")
+    parser.add_argument("--rate", type=float, default=64, help="débit maximal de chaque client en KB/s (0 : sans limite)")
+    parser.add_argument("--ramp", type=float, default=5, help="durée (secondes) sur laquelle les clients arrivent")
+    parser.add_argument("--accept-encoding", default="identity", help="en-tête Accept-Encoding envoyé")
+    parser.add_argument("--pid", type=int, help="processus du serveur dont la mémoire est relevée (avec ses workers)")
+    parser.add_argument("--output", help="fichier JSON où écrire le bilan")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -5,12 +5,19 @@
 ###################-
 
 # Chargement de la librairie
+import os
 import time
+import sys
+import threading
 from pathlib import Path
 
 # Pour les logs
 LOG_FILE = Path("memoire.log")
 
+# Le fichier de log reste ouvert (en ajout, écrit ligne par ligne) au lieu d'être rouvert à chaque message
+_log = None
+_log_lock = threading.Lock()
+
 # Permet d'enregistrer les différents étapes de mémoires utilisées
 def log_memory_usage(message: str):
     """
@@ -20,11 +27,84 @@ def log_memory_usage(message: str):
     - message : le message à mettre dans le fichier
 
     """
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        f.write(f"[{timestamp}] {message}\n")
+    global _log
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    with _log_lock:
+        if _log is None or _log.closed:
+            _log = open(LOG_FILE, "a", encoding="utf-8", buffering=1)
+        _log.write(f"[{timestamp}] {message}\n")
+
+def read_log_tail(max_lines):
+    """
+    Fonction : renvoie les dernières lignes du log, lues depuis la fin du fichier (le fichier n'est jamais chargé en entier).
+
+    Arguments :
+    - max_lines : nombre de lignes à renvoyer au maximum
+
+    Renvoie :
+    - text : les dernières lignes (chaîne vide si le fichier n'existe pas)
+    """
+    try:
+        with open(LOG_FILE, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            blocs = []
+            nb_lignes = 0
+            while position > 0 and nb_lignes <= max_lines:
+                taille = min(64 * 1024, position)
+                position -= taille
+                f.seek(position)
+                bloc = f.read(taille)
+                blocs.append(bloc)
+                nb_lignes += bloc.count(b"\n")
+    except FileNotFoundError:
+        return ""
+    lignes = b"".join(reversed(blocs)).splitlines()[-max_lines:]
+    return b"\n".join(lignes).decode("utf-8", errors="replace")
+
+def reset_log():
+    """
+    Fonction : vide le fichier de log. Il est tronqué plutôt que supprimé : les autres processus (workers)
+    qui l'ont ouvert en ajout continuent d'écrire dans le même fichier.
+    """
+    with _log_lock:
+        if LOG_FILE.exists():
+            with open(LOG_FILE, "r+b") as f:
+                f.truncate(0)
+
+# Permet de connaître la mémoire résidente (RSS) actuelle du processus
+def get_memory_usage_mb():
+    """
+    Fonction : renvoie la mémoire résidente (RSS) actuelle du processus, en MB (et non le pic, voir get_peak_memory_mb).
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm", "rb") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 ** 2)
+        except OSError:
+            pass
+
+    import psutil
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 ** 2)
+
+# Permet de connaître le pic de mémoire (RSS) atteint par le processus
+def get_peak_memory_mb():
+    """
+    Fonction : renvoie le pic de mémoire résidente (RSS) atteint par le processus depuis son lancement, en MB.
+    """
+    if sys.platform == "win32":
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 ** 2)
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss est en octets sous macOS et en kilo-octets sous Linux
+    if sys.platform == "darwin":
+        return peak / (1024 ** 2)
+    return peak / 1024
 
 
 if __name__=="__main__":
     log_memory_usage("test message")
-    #LOG_FILE.read_text()
\ No newline at end of file
+    #LOG_FILE.read_text()
@@ -0,0 +1,337 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Base SQLite des tables (index sur les identifiants et la date de création) pour les recherches par identifiant
+###################-
+
+# Chargement des librairies
+import os
+import json
+import base64
+import binascii
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from botocore.exceptions import ClientError
+from s3_client import get_transfer_config
+from logger_write import log_memory_usage
+
+# Base publiée dans le S3 et copie locale de l'application
+LOOKUP_DB_KEY = "data/openradiation.sqlite"
+LOOKUP_CACHE_DIR = Path(os.environ.get("LOOKUP_CACHE_DIR", "cache/lookup"))
+LOOKUP_BATCH_ROWS = 50000 # Lignes insérées par transaction lors de la construction
+LOOKUP_FETCH_ROWS = 1000 # Lignes lues à la fois dans la base lors du streaming d'une réponse
+DATE_COLUMN = "dateAndTimeOfCreation"
+
+# Tables de la base : colonne clé de chaque table des appareils et des vols
+DIMENSION_KEYS = {"devices": "deviceUuid", "apparatus": "apparatusId", "flight": "flightId"}
+
+# Recherches des mesures : nom dans l'URL -> colonne indexée de la table des mesures
+MEASUREMENT_KEYS = {"devices": "deviceUuid", "apparatus": "apparatusId", "flight": "flightId", "users": "userId"}
+LOWERCASE_KEYS = ("deviceUuid", "apparatusId") # Identifiants mis en minuscules par table_creation.py
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS measurements (
+    id INTEGER PRIMARY KEY,
+    deviceUuid TEXT, apparatusId TEXT, flightId INTEGER, userId TEXT,
+    {DATE_COLUMN} TEXT NOT NULL,
+    line TEXT NOT NULL
+);
+""" + "".join(f"CREATE TABLE IF NOT EXISTS {table} ({key} {'INTEGER' if key == 'flightId' else 'TEXT'} PRIMARY KEY, line TEXT NOT NULL);\n"
+              for table, key in DIMENSION_KEYS.items())
+
+# Index créés après le chargement complet (plus rapide que de les tenir à jour ligne par ligne).
+# La date suit chaque identifiant : les mesures d'un identifiant sont lues dans l'ordre, fenêtre de dates comprise
+INDEXES = [f"CREATE INDEX IF NOT EXISTS measurements_{key} ON measurements ({key}, {DATE_COLUMN})"
+           for key in ("deviceUuid", "apparatusId", "flightId", "userId")]
+INDEXES.append(f"CREATE INDEX IF NOT EXISTS measurements_{DATE_COLUMN} ON measurements ({DATE_COLUMN})")
+
+def open_for_write(path_db):
+    """
+    Fonction : ouvre (ou crée) la base en écriture, sans journal : elle est construite dans un fichier à part
+    puis publiée d'un bloc, une écriture interrompue est simplement recommencée.
+    """
+    con = sqlite3.connect(path_db)
+    con.execute("PRAGMA journal_mode = OFF")
+    con.execute("PRAGMA synchronous = OFF")
+    con.execute("PRAGMA cache_size = -65536") # 64 MB
+    con.executescript(SCHEMA)
+    return con
+
+def insert_lines(con, table, path):
+    """
+    Fonction : insère les lignes d'un fichier JSON d'une table dans la base, par lots de LOOKUP_BATCH_ROWS lignes.
+    Les lignes sont gardées telles quelles (elles sont renvoyées sans être réécrites) à côté des colonnes indexées.
+    Un appareil ou un vol déjà présent n'est pas remplacé.
+
+    Arguments :
+    - con : connexion à la base (voir open_for_write)
+    - table : table de la base ("measurements", "devices", "apparatus" ou "flight")
+    - path : chemin du fichier JSON de la table
+
+    Renvoie :
+    - lignes : nombre de lignes lues
+    """
+
+    if table == "measurements":
+        requete = (f"INSERT INTO measurements (deviceUuid, apparatusId, flightId, userId, {DATE_COLUMN}, line) "
+                   "VALUES (?, ?, ?, ?, ?, ?)")
+        def valeurs(record, line):
+            return (record.get("deviceUuid"), record.get("apparatusId"), record.get("flightId"), record.get("userId"),
+                    record.get(DATE_COLUMN) or "", line)
+    else:
+        key = DIMENSION_KEYS[table]
+        requete = f"INSERT OR IGNORE INTO {table} ({key}, line) VALUES (?, ?)"
+        def valeurs(record, line):
+            return record[key], line
+
+    lignes = 0
+    lot = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            lot.append(valeurs(json.loads(line), line))
+            if len(lot) >= LOOKUP_BATCH_ROWS:
+                with con:
+                    con.executemany(requete, lot)
+                lignes += len(lot)
+                lot = []
+    if lot:
+        with con:
+            con.executemany(requete, lot)
+        lignes += len(lot)
+    return lignes
+
+def build_lookup_db(paths: dict, path_db):
+    """
+    Fonction : construit la base des recherches par identifiant à partir des fichiers JSON des tables,
+    puis crée les index (identifiants et date de création des mesures).
+
+    Arguments :
+    - paths : dictionnaire table -> chemin du fichier JSON ("measurements", "devices", "apparatus", "flight")
+    - path_db : chemin de la base à écrire (remplacée si elle existe)
+
+    Renvoie :
+    - compteurs : nombre de lignes de chaque table
+    """
+
+    path_db = Path(path_db)
+    path_db.parent.mkdir(parents=True, exist_ok=True)
+    path_tmp = path_db.with_name(path_db.name + ".part")
+    path_tmp.unlink(missing_ok=True)
+
+    con = open_for_write(path_tmp)
+    try:
+        compteurs = {table: insert_lines(con, table, path) for table, path in paths.items()}
+        for index in INDEXES:
+            con.execute(index)
+        con.execute("ANALYZE")
+        con.commit()
+    finally:
+        con.close()
+    os.replace(path_tmp, path_db)
+    return compteurs
+
+def update_lookup_db(paths: dict, path_db):
+    """
+    Fonction : ajoute à une base existante les nouvelles lignes des tables (mode incrémental).
+    Les index sont tenus à jour par SQLite au fil des insertions.
+
+    Arguments :
+    - paths : dictionnaire table -> chemin du fichier JSON des nouvelles lignes
+    - path_db : chemin de la base à compléter
+
+    Renvoie :
+    - compteurs : nombre de lignes lues pour chaque table
+    """
+    con = open_for_write(path_db)
+    try:
+        compteurs = {table: insert_lines(con, table, path) for table, path in paths.items()}
+        for index in INDEXES:
+            con.execute(index)
+        con.commit()
+    finally:
+        con.close()
+    return compteurs
+
+def parse_key(key, value):
+    """
+    Fonction : convertit l'identifiant d'une URL au format de la colonne (entier pour un vol, minuscules pour les appareils).
+
+    Lève :
+    - ValueError si l'identifiant d'un vol n'est pas un entier
+    """
+    if key == "flightId":
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"flightId doit être un entier ({value!r})") from None
+    if key in LOWERCASE_KEYS:
+        return value.strip().lower()
+    return value
+
+def encode_lookup_cursor(date, rowid):
+    """
+    Fonction : curseur opaque de la page suivante d'une recherche de mesures (date et numéro de la dernière ligne envoyée).
+    """
+    contenu = json.dumps({"d": date, "r": rowid}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(contenu.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_lookup_cursor(cursor):
+    """
+    Fonction : lit un curseur renvoyé par encode_lookup_cursor.
+
+    Renvoie :
+    - (date, rowid)
+
+    Lève :
+    - ValueError si le curseur est invalide
+    """
+    try:
+        contenu = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(contenu["d"]), int(contenu["r"])
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"curseur invalide ({cursor!r})") from e
+
+def find_record(con, table, value):
+    """
+    Fonction : ligne JSON d'un appareil ou d'un vol (recherche par clé primaire).
+
+    Arguments :
+    - con : connexion à la base
+    - table : "devices", "apparatus" ou "flight"
+    - value : identifiant (voir parse_key)
+
+    Renvoie :
+    - line : la ligne JSON, ou None si l'identifiant est inconnu
+    """
+    row = con.execute(f"SELECT line FROM {table} WHERE {DIMENSION_KEYS[table]} = ?", (value,)).fetchone()
+    return row[0] if row else None
+
+def select_measurements(con, key, value, lower=None, upper=None, limit=None, after=None):
+    """
+    Fonction : mesures d'un identifiant, par date de création décroissante (lecture de l'index de la colonne).
+
+    Arguments :
+    - con : connexion à la base
+    - key : colonne de l'identifiant (voir MEASUREMENT_KEYS)
+    - value : identifiant (voir parse_key)
+    - lower, upper (par défaut : None) : bornes de dates (voir time_index.parse_date_bounds)
+    - limit (par défaut : None) : nombre maximal de lignes
+    - after (par défaut : None) : (date, rowid) de la dernière ligne de la page précédente (voir decode_lookup_cursor)
+
+    Renvoie :
+    - cursor : curseur SQLite des lignes (id, date, ligne JSON)
+    """
+    conditions, params = [f"{key} = ?"], [value]
+    if lower is not None:
+        conditions.append(f"{DATE_COLUMN} >= ?")
+        params.append(lower)
+    if upper is not None:
+        conditions.append(f"{DATE_COLUMN} < ?")
+        params.append(upper)
+    if after is not None:
+        conditions.append(f"({DATE_COLUMN}, id) < (?, ?)")
+        params.extend(after)
+    requete = (f"SELECT id, {DATE_COLUMN}, line FROM measurements WHERE {' AND '.join(conditions)} "
+               f"ORDER BY {DATE_COLUMN} DESC, id DESC")
+    if limit is not None:
+        requete += " LIMIT ?"
+        params.append(limit)
+    return con.execute(requete, params)
+
+def generate_rows(con, cursor):
+    """
+    Fonction : fonction génératrice qui renvoie les lignes JSON d'une recherche par lots de LOOKUP_FETCH_ROWS,
+    puis ferme la connexion (à la fin du streaming, même interrompu).
+
+    Renvoit en yield :
+    - bloc de lignes JSON (en octets)
+    """
+    try:
+        while True:
+            rows = cursor.fetchmany(LOOKUP_FETCH_ROWS)
+            if not rows:
+                break
+            yield "".join(row[2] + "\n" for row in rows).encode("utf-8")
+    finally:
+        con.close()
+
+class LookupDatabase:
+    """
+    Classe : copie locale de la base publiée dans le S3, vérifiée (HEAD, ETag) au plus toutes les revalidate_seconds
+    secondes et téléchargée à nouveau quand elle a changé. Chaque version est un fichier à part : les requêtes en cours
+    finissent de lire l'ancienne pendant que les nouvelles ouvrent la suivante. Pendant un téléchargement,
+    les autres requêtes continuent avec la version précédente au lieu de l'attendre.
+    """
+
+    def __init__(self, directory=LOOKUP_CACHE_DIR, key=LOOKUP_DB_KEY, revalidate_seconds=30):
+        self.directory = Path(directory).resolve()
+        self.key = key
+        self.revalidate_seconds = revalidate_seconds
+        self.path = None # Version locale courante
+        self.etag = None
+        self.validated = 0.0
+        self.lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def refresh(self, s3, bucket):
+        """
+        Fonction : vérifie la copie locale et la remplace si la base du S3 a changé.
+
+        Lève :
+        - ClientError si la base n'existe pas dans le S3 et qu'aucune copie locale n'est disponible
+        """
+        head = s3.head_object(Bucket=bucket, Key=self.key)
+        etag = head["ETag"].strip('"')
+        if etag == self.etag and self.path is not None and self.path.exists():
+            self.validated = time.monotonic()
+            return
+
+        path = self.directory / f"openradiation-{etag}.sqlite"
+        if not path.exists():
+            path_tmp = path.with_name(path.name + ".part")
+            s3.download_file(bucket, self.key, str(path_tmp), Config=get_transfer_config())
+            os.replace(path_tmp, path)
+            msg = f"Base des recherches téléchargée : {path.name} ({path.stat().st_size} octets)"
+            log_memory_usage(msg)
+            print(msg)
+
+        self.path, self.etag, self.validated = path, etag, time.monotonic()
+
+        # Anciennes versions (un fichier encore ouvert ailleurs est supprimé à sa prochaine actualisation)
+        for ancienne in self.directory.glob("openradiation-*.sqlite"):
+            if ancienne != path:
+                try:
+                    ancienne.unlink()
+                except OSError:
+                    pass
+
+    def connect(self, s3, bucket):
+        """
+        Fonction : connexion en lecture seule à la version à jour de la base (une connexion par requête,
+        utilisable depuis le fil qui streame la réponse).
+
+        Renvoie :
+        - con : connexion SQLite, ou None si la base n'est pas encore publiée
+        """
+        if self.path is None or time.monotonic() - self.validated >= self.revalidate_seconds:
+            # Une seule vérification à la fois ; sans copie locale, on attend celle en cours
+            if self.lock.acquire(blocking=self.path is None):
+                try:
+                    if self.path is None or time.monotonic() - self.validated >= self.revalidate_seconds:
+                        self.refresh(s3, bucket)
+                except ClientError:
+                    if self.path is None:
+                        return None
+                    self.validated = time.monotonic() # Base absente du S3 : la copie locale reste servie
+                finally:
+                    self.lock.release()
+
+        path = self.path
+        if path is None:
+            return None
+        return sqlite3.connect(f"{path.as_uri()}?mode=ro&immutable=1", uri=True, check_same_thread=False)
@@ -0,0 +1,287 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Mesures du service et de l'actualisation (requêtes, S3, étapes) gardées dans un tampon circulaire borné
+###################-
+
+# Chaque requête servie et chaque étape de l'actualisation laisse un enregistrement dans un tampon circulaire
+# de METRICS_BUFFER_SIZE entrées (les plus anciennes sont oubliées : la mémoire reste bornée), et des totaux
+# cumulés depuis le lancement du processus. La route /metrics les expose au format texte de Prometheus ou en JSON.
+
+# Chargement des librairies
+import os
+import time
+import threading
+from collections import deque
+from logger_write import get_memory_usage_mb, get_peak_memory_mb
+
+# Configuration des mesures
+METRICS_BUFFER_SIZE = int(os.environ.get("METRICS_BUFFER_SIZE", "1000")) # Enregistrements gardés en mémoire
+METRICS_PREFIX = "openradiation"
+ETL_METRICS_KEY = "data/etl_metrics.json" # Étapes de la dernière actualisation, publiées dans le S3 par pipeline.py
+QUANTILES = (0.5, 0.9, 0.99)
+
+_records = deque(maxlen=METRICS_BUFFER_SIZE)
+_lock = threading.Lock()
+_current = threading.local() # Requête en cours dans ce fil (pour lui attribuer les appels au S3)
+_started = time.time()
+totals = {"requests": 0, "errors": 0, "bytes_sent": 0, "rows_sent": 0, "rows_filtered": 0,
+          "s3_requests": 0, "s3_seconds": 0.0, "ttfb_seconds": 0.0, "duration_seconds": 0.0, "request_s3_seconds": 0.0}
+
+class RequestMetrics:
+    """
+    Classe : mesures d'une requête HTTP, remplies pendant qu'elle est servie puis enregistrées à la fin du streaming.
+    """
+
+    def __init__(self, route, path):
+        self.debut = time.monotonic()
+        self.record = {"kind": "request", "time": time.time(), "route": route, "path": path, "status": None,
+                       "ttfb_s": None, "duration_s": None, "bytes": 0, "rows_sent": None, "rows_filtered": None,
+                       "s3_requests": 0, "s3_latency_s": 0.0, "rss_mb": None}
+
+    def first_byte(self):
+        """
+        Fonction : note le temps jusqu'au premier octet (au premier appel seulement).
+        """
+        if self.record["ttfb_s"] is None:
+            self.record["ttfb_s"] = time.monotonic() - self.debut
+
+    def add_rows(self, sent, filtered=None):
+        """
+        Fonction : ajoute des lignes envoyées (et écartées par le filtre) à la requête.
+        """
+        self.record["rows_sent"] = (self.record["rows_sent"] or 0) + sent
+        if filtered is not None:
+            self.record["rows_filtered"] = (self.record["rows_filtered"] or 0) + filtered
+
+    def add_s3(self, seconds):
+        """
+        Fonction : ajoute un appel au S3 (durée jusqu'à la réponse, sans la lecture du corps) à la requête.
+        """
+        self.record["s3_requests"] += 1
+        self.record["s3_latency_s"] += seconds
+
+    def finish(self, status):
+        """
+        Fonction : termine la requête (fin du streaming, même interrompu) et l'enregistre dans le tampon.
+
+        Arguments :
+        - status : code HTTP de la réponse
+        """
+        self.first_byte()
+        self.record["status"] = status
+        self.record["duration_s"] = time.monotonic() - self.debut
+        self.record["rss_mb"] = get_memory_usage_mb()
+        record = self.record
+        with _lock:
+            _records.append(record)
+            totals["requests"] += 1
+            totals["errors"] += status >= 500
+            totals["bytes_sent"] += record["bytes"]
+            totals["rows_sent"] += record["rows_sent"] or 0
+            totals["rows_filtered"] += record["rows_filtered"] or 0
+            totals["ttfb_seconds"] += record["ttfb_s"]
+            totals["duration_seconds"] += record["duration_s"]
+            totals["request_s3_seconds"] += record["s3_latency_s"]
+
+    def wrap(self, chunks, status):
+        """
+        Fonction : fonction génératrice qui transmet les blocs de la réponse en mesurant le premier octet
+        et les octets envoyés, puis enregistre la requête à la fin (même si le client se déconnecte).
+        Les blocs peuvent être lus par des fils différents (service ASGI) : la requête est rattachée
+        au fil qui lit, le temps de chaque lecture, pour lui attribuer les appels au S3.
+
+        Arguments :
+        - chunks : blocs de la réponse
+        - status : code HTTP de la réponse
+
+        Renvoit en yield :
+        - bloc : le bloc tel quel
+        """
+        iterateur = iter(chunks)
+        try:
+            while True:
+                precedent = attach(self)
+                try:
+                    bloc = next(iterateur, None)
+                finally:
+                    attach(precedent)
+                if bloc is None:
+                    return
+                if bloc:
+                    self.first_byte()
+                    self.record["bytes"] += len(bloc)
+                yield bloc
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            self.finish(status)
+
+def attach(request_metrics):
+    """
+    Fonction : rattache une requête au fil courant (None pour détacher).
+
+    Renvoie :
+    - precedent : la requête rattachée jusque-là (à remettre ensuite)
+    """
+    precedent = getattr(_current, "request", None)
+    _current.request = request_metrics
+    return precedent
+
+def current_request():
+    """
+    Fonction : renvoie la requête rattachée au fil courant, ou None.
+    """
+    return getattr(_current, "request", None)
+
+def instrument_s3(s3):
+    """
+    Fonction : ajoute au client S3 la mesure de la latence de chaque appel (jusqu'à la réponse du S3),
+    attribuée à la requête en cours dans le fil et ajoutée aux totaux.
+
+    Arguments :
+    - s3 : client S3 de boto3
+    """
+    def avant(context, **kwargs):
+        context["metrics_start"] = time.monotonic()
+
+    def apres(context, **kwargs):
+        debut = context.get("metrics_start")
+        if debut is None:
+            return
+        duree = time.monotonic() - debut
+        with _lock:
+            totals["s3_requests"] += 1
+            totals["s3_seconds"] += duree
+        requete = current_request()
+        if requete is not None:
+            requete.add_s3(duree)
+
+    s3.meta.events.register("before-call.s3", avant)
+    s3.meta.events.register("after-call.s3", apres)
+
+def record_stage(name, duration):
+    """
+    Fonction : enregistre une étape de l'actualisation (durée, mémoire résidente actuelle et pic).
+
+    Arguments :
+    - name : nom de l'étape
+    - duration : durée de l'étape (secondes)
+
+    Renvoie :
+    - record : l'enregistrement ajouté
+    """
+    rss = get_memory_usage_mb()
+    record = {"kind": "stage", "time": time.time(), "stage": name, "duration_s": duration,
+              "rss_mb": rss, "peak_rss_mb": max(rss, get_peak_memory_mb())}
+    with _lock:
+        _records.append(record)
+    return record
+
+def recent(kind=None, limit=None):
+    """
+    Fonction : renvoie les enregistrements du tampon (du plus ancien au plus récent).
+
+    Arguments :
+    - kind (par défaut : None) : "request" ou "stage" pour ne garder qu'un type
+    - limit (par défaut : None) : nombre d'enregistrements les plus récents à renvoyer
+
+    Renvoie :
+    - records : liste de dictionnaires
+    """
+    with _lock:
+        records = [dict(r) for r in _records if kind is None or r["kind"] == kind]
+    return records[-limit:] if limit else records
+
+def quantile(valeurs, q):
+    """
+    Fonction : quantile (plus proche rang) d'une liste de valeurs triée, ou None si elle est vide.
+    """
+    if not valeurs:
+        return None
+    return valeurs[min(len(valeurs) - 1, int(q * len(valeurs)))]
+
+def snapshot(limit=None, etl=None):
+    """
+    Fonction : état des mesures du processus (mémoire, totaux, quantiles sur le tampon, derniers enregistrements).
+
+    Arguments :
+    - limit (par défaut : None) : nombre d'enregistrements récents à joindre
+    - etl (par défaut : None) : étapes de la dernière actualisation (voir ETL_METRICS_KEY)
+
+    Renvoie :
+    - resume : dictionnaire sérialisable en JSON
+    """
+    requetes = recent("request")
+    with _lock:
+        cumul = dict(totals)
+    rss = get_memory_usage_mb()
+    fenetre = {}
+    for champ in ("ttfb_s", "duration_s", "s3_latency_s"):
+        valeurs = sorted(r[champ] for r in requetes if r[champ] is not None)
+        fenetre[champ] = {str(q): quantile(valeurs, q) for q in QUANTILES}
+    return {
+        "process": {"pid": os.getpid(), "uptime_s": time.time() - _started,
+                    "rss_mb": rss, "peak_rss_mb": max(rss, get_peak_memory_mb())},
+        "totals": cumul,
+        "window": {"size": len(requetes), "capacity": METRICS_BUFFER_SIZE, "quantiles": fenetre},
+        "recent": recent(limit=limit) if limit else [],
+        "etl": etl,
+    }
+
+def render_prometheus(resume):
+    """
+    Fonction : met un résumé de snapshot() au format texte de Prometheus.
+
+    Arguments :
+    - resume : résultat de snapshot()
+
+    Renvoie :
+    - text : le texte à servir (type text/plain; version=0.0.4)
+    """
+    lignes = []
+
+    def metrique(nom, type_metrique, aide, valeurs):
+        nom = f"{METRICS_PREFIX}_{nom}"
+        lignes.append(f"# HELP {nom} {aide}")
+        lignes.append(f"# TYPE {nom} {type_metrique}")
+        for suffixe, labels, valeur in valeurs:
+            if valeur is None:
+                continue
+            etiquettes = ",".join(f'{cle}="{v}"' for cle, v in labels.items())
+            lignes.append(f"{nom}{suffixe}{{{etiquettes}}} {valeur}" if etiquettes else f"{nom}{suffixe} {valeur}")
+
+    process, cumul, quantiles = resume["process"], resume["totals"], resume["window"]["quantiles"]
+    metrique("resident_memory_bytes", "gauge", "Mémoire résidente actuelle du processus.",
+             [("", {}, round(process["rss_mb"] * 1024 ** 2))])
+    metrique("peak_resident_memory_bytes", "gauge", "Pic de mémoire résidente du processus.",
+             [("", {}, round(process["peak_rss_mb"] * 1024 ** 2))])
+    metrique("uptime_seconds", "gauge", "Durée depuis le lancement du processus.", [("", {}, round(process["uptime_s"], 3))])
+
+    compteurs = (("requests_total", "requests", "Requêtes servies."),
+                 ("request_errors_total", "errors", "Requêtes terminées par une erreur 5xx."),
+                 ("response_bytes_total", "bytes_sent", "Octets envoyés dans les réponses."),
+                 ("rows_sent_total", "rows_sent", "Lignes envoyées (réponses non précompressées)."),
+                 ("rows_filtered_total", "rows_filtered", "Lignes lues puis écartées par les filtres."),
+                 ("s3_requests_total", "s3_requests", "Appels au S3 (requêtes et tâches du processus)."),
+                 ("s3_latency_seconds_total", "s3_seconds", "Temps passé à attendre les réponses du S3 (tous les appels)."))
+    for nom, cle, aide in compteurs:
+        metrique(nom, "counter", aide, [("", {}, cumul[cle])])
+
+    resumes = (("request_ttfb_seconds", "ttfb_s", "ttfb_seconds", "requests", "Temps jusqu'au premier octet de la réponse."),
+               ("request_duration_seconds", "duration_s", "duration_seconds", "requests", "Durée complète des requêtes (streaming compris)."),
+               ("request_s3_latency_seconds", "s3_latency_s", "request_s3_seconds", "requests", "Attente des réponses du S3 pendant chaque requête."))
+    for nom, champ, somme, nombre, aide in resumes:
+        valeurs = [("", {"quantile": q}, round(v, 6) if v is not None else None) for q, v in quantiles[champ].items()]
+        valeurs += [("_sum", {}, round(cumul[somme], 6)), ("_count", {}, cumul[nombre])]
+        metrique(nom, "summary", aide, valeurs)
+
+    if resume.get("etl"):
+        etapes = resume["etl"]["stages"]
+        metrique("etl_stage_duration_seconds", "gauge", "Durée des étapes de la dernière actualisation.",
+                 [("", {"stage": e["stage"]}, round(e["duration_s"], 3)) for e in etapes])
+        metrique("etl_stage_resident_memory_bytes", "gauge", "Mémoire résidente à la fin de chaque étape de la dernière actualisation.",
+                 [("", {"stage": e["stage"]}, round(e["rss_mb"] * 1024 ** 2)) for e in etapes])
+        metrique("etl_stage_peak_resident_memory_bytes", "gauge", "Pic de mémoire résidente atteint à la fin de chaque étape.",
+                 [("", {"stage": e["stage"]}, round(e["peak_rss_mb"] * 1024 ** 2)) for e in etapes])
+    return "\n".join(lignes) + "\n"
@@ -0,0 +1,207 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Formats de sortie de l'API (NDJSON, CSV, flux Arrow IPC) et négociation du format avec le client
+###################-
+
+# Les lignes JSON lues (fichier, intervalles, tuiles, Parquet, pages) sont converties par lots de FORMAT_BATCH_ROWS lignes :
+# chaque lot est analysé par le lecteur JSON de pyarrow avec les types des colonnes de l'actualisation
+# (ceux des jeux Parquet, voir parquet_store.arrow_schema), puis écrit en CSV ou en lot Arrow (record batch).
+
+# Chargement des librairies
+import io
+import os
+import json
+from parquet_store import arrow_schema
+
+FORMAT_BATCH_ROWS = int(os.environ.get("FORMAT_BATCH_ROWS", "10000")) # Lignes converties à la fois (mémoire bornée)
+
+# Formats disponibles et type MIME de la réponse (NDJSON : celui des réponses JSON existantes)
+MEDIA_TYPES = {"ndjson": "application/json", "csv": "text/csv", "arrow": "application/vnd.apache.arrow.stream"}
+
+# Types de l'en-tête Accept reconnus
+ACCEPT_FORMATS = {"application/vnd.apache.arrow.stream": "arrow", "text/csv": "csv",
+                  "application/x-ndjson": "ndjson", "application/json": "ndjson"}
+
+def negotiate_format(value=None, accept=None):
+    """
+    Fonction : format de la réponse : paramètre format s'il est donné, sinon type préféré de l'en-tête Accept
+    parmi ceux reconnus (NDJSON par défaut).
+
+    Arguments :
+    - value (par défaut : None) : valeur du paramètre format (arrow, csv ou ndjson)
+    - accept (par défaut : None) : en-tête Accept du client
+
+    Renvoie :
+    - format : "ndjson", "csv" ou "arrow"
+
+    Lève :
+    - ValueError si le paramètre format est inconnu
+    """
+    if value:
+        value = value.strip().lower()
+        if value not in MEDIA_TYPES:
+            raise ValueError(f"format inconnu : {value} (formats possibles : {', '.join(MEDIA_TYPES)})")
+        return value
+
+    meilleur, poids = "ndjson", 0.0
+    for element in (accept or "").split(","):
+        morceaux = [morceau.strip() for morceau in element.split(";")]
+        fmt = ACCEPT_FORMATS.get(morceaux[0].lower())
+        if fmt is None:
+            continue
+        q = 1.0
+        for parametre in morceaux[1:]:
+            if parametre.startswith("q="):
+                try:
+                    q = float(parametre[2:])
+                except ValueError:
+                    q = 0.0
+        if q > poids:
+            meilleur, poids = fmt, q
+    return meilleur
+
+def table_dtypes(manifest):
+    """
+    Fonction : types pandas des colonnes des données publiées, d'après le profil du manifeste de l'actualisation.
+
+    Arguments :
+    - manifest : manifeste de l'actualisation (ou None)
+
+    Renvoie :
+    - dtypes : dictionnaire colonne -> type pandas (None sans manifeste : types déduits du premier lot)
+    """
+    if manifest is None or not manifest.get("columns"):
+        return None
+    from actualisation_donnees import profile_dtypes
+    return profile_dtypes(manifest["columns"])
+
+def line_batches(chunks, rows=FORMAT_BATCH_ROWS):
+    """
+    Fonction : fonction génératrice qui regroupe des blocs ou des lignes JSON en lots de lignes complètes
+    (au moins rows lignes, sauf le dernier).
+
+    Arguments :
+    - chunks : blocs ou lignes JSON (en octets)
+    - rows (par défaut : FORMAT_BATCH_ROWS) : nombre de lignes par lot
+
+    Renvoit en yield :
+    - lot de lignes JSON complètes (en octets)
+    """
+    morceaux, lignes = [], 0
+    for bloc in chunks:
+        morceaux.append(bloc)
+        lignes += bloc.count(b"\n")
+        if lignes >= rows:
+            lot = b"".join(morceaux)
+            fin = lot.rfind(b"\n") + 1
+            yield lot[:fin]
+            morceaux, lignes = [lot[fin:]], 0
+    reste = b"".join(morceaux)
+    if reste.strip():
+        yield reste if reste.endswith(b"\n") else reste + b"\n"
+
+def batch_schema(lot, dtypes, output_format):
+    """
+    Fonction : schéma Arrow de la réponse : colonnes de la première ligne, types du manifeste (sinon déduits du lot :
+    nombres en décimaux, colonnes vides en texte). Les dates restent du texte en CSV.
+
+    Arguments :
+    - lot : premier lot de lignes JSON
+    - dtypes : types pandas des colonnes (voir table_dtypes) ou None
+    - output_format : "csv" ou "arrow"
+
+    Renvoie :
+    - schema : schéma pyarrow
+    """
+    import pyarrow as pa
+    import pyarrow.json as pj
+
+    columns = list(json.loads(lot[:lot.find(b"\n")]))
+    if dtypes is None:
+        dtypes = {}
+        for field in pj.read_json(io.BytesIO(lot)).schema:
+            if pa.types.is_boolean(field.type):
+                dtypes[field.name] = "bool"
+            elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+                dtypes[field.name] = "float64"
+            else:
+                dtypes[field.name] = "object"
+    schema = arrow_schema(dtypes, columns)
+    if output_format == "csv":
+        schema = pa.schema([pa.field(field.name, pa.string()) if pa.types.is_timestamp(field.type) else field
+                            for field in schema])
+    return schema
+
+def read_batch(lot, schema, dtypes=None):
+    """
+    Fonction : convertit un lot de lignes JSON en table Arrow du schéma donné (lecteur JSON de pyarrow,
+    ou pandas si une valeur n'a pas le type attendu, par exemple un nombre dans une colonne de texte).
+
+    Arguments :
+    - lot : lignes JSON (en octets)
+    - schema : schéma pyarrow (voir batch_schema)
+    - dtypes (par défaut : None) : types pandas des colonnes (pour la lecture par pandas)
+
+    Renvoie :
+    - table : table pyarrow
+    """
+    import pyarrow as pa
+    import pyarrow.json as pj
+
+    try:
+        return pj.read_json(io.BytesIO(lot), read_options=pj.ReadOptions(block_size=max(len(lot), 1 << 20)),
+                            parse_options=pj.ParseOptions(explicit_schema=schema, unexpected_field_behavior="ignore"))
+    except pa.ArrowInvalid:
+        import pandas as pd
+        from parquet_store import to_arrow
+        df = pd.read_json(io.BytesIO(lot), lines=True, dtype=dtypes if dtypes is not None else True, precise_float=True)
+        return to_arrow(df, schema)
+
+def convert_stream(chunks, output_format, dtypes=None, rows=FORMAT_BATCH_ROWS):
+    """
+    Fonction : fonction génératrice qui convertit des lignes JSON en CSV (avec en-tête) ou en flux Arrow IPC
+    (un lot Arrow par lot de lignes) : la mémoire reste bornée quelle que soit la taille de la réponse.
+
+    Arguments :
+    - chunks : blocs ou lignes JSON (en octets)
+    - output_format : "ndjson" (lignes renvoyées telles quelles), "csv" ou "arrow"
+    - dtypes (par défaut : None) : types pandas des colonnes (voir table_dtypes)
+    - rows (par défaut : FORMAT_BATCH_ROWS) : nombre de lignes par lot
+
+    Renvoit en yield :
+    - bloc de la réponse (en octets)
+    """
+    if output_format == "ndjson":
+        yield from chunks
+        return
+
+    import pyarrow as pa
+    import pyarrow.csv as pc
+
+    sink = io.BytesIO()
+    writer = None
+
+    def vider():
+        contenu = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return contenu
+
+    for lot in line_batches(chunks, rows):
+        if writer is None:
+            schema = batch_schema(lot, dtypes, output_format)
+            writer = pa.ipc.new_stream(sink, schema) if output_format == "arrow" else pc.CSVWriter(sink, schema)
+        writer.write_table(read_batch(lot, schema, dtypes))
+        contenu = vider()
+        if contenu:
+            yield contenu
+
+    # Aucune ligne : flux Arrow sans colonnes (un CSV vide n'a pas d'en-tête)
+    if writer is None and output_format == "arrow":
+        writer = pa.ipc.new_stream(sink, pa.schema([]))
+    if writer is not None:
+        writer.close()
+        contenu = vider()
+        if contenu:
+            yield contenu
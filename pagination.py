@@ -0,0 +1,156 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Pagination des fichiers JSON du S3 par curseur (position en octets : une requête Range par page)
+###################-
+
+# Chargement des librairies
+import os
+import json
+import base64
+import binascii
+
+# Configuration de la pagination
+PAGE_DEFAULT_LIMIT = int(os.environ.get("PAGE_DEFAULT_LIMIT", "1000")) # Lignes par page si seul le curseur est donné
+PAGE_MAX_LIMIT = int(os.environ.get("PAGE_MAX_LIMIT", "10000")) # Lignes par page au maximum (une page est gardée en mémoire)
+PAGE_CHUNK_SIZE = 64 * 1024 # Taille des blocs lus dans la réponse Range
+
+def encode_cursor(type, offset, end, etag):
+    """
+    Fonction : curseur opaque de la page suivante.
+
+    Arguments :
+    - type : table paginée
+    - offset : position (octets) de la première ligne de la page suivante
+    - end : position (octets) de fin de la lecture (exclue)
+    - etag : ETag de la version du fichier paginée
+
+    Renvoie :
+    - cursor : chaîne base64 (utilisable telle quelle dans une URL)
+    """
+    contenu = json.dumps({"t": type, "o": offset, "n": end, "e": etag}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(contenu.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor, type):
+    """
+    Fonction : lit un curseur renvoyé par encode_cursor.
+
+    Arguments :
+    - cursor : le curseur
+    - type : table demandée (le curseur doit venir d'une page de cette table)
+
+    Renvoie :
+    - (offset, end, etag)
+
+    Lève :
+    - ValueError si le curseur est invalide
+    """
+    try:
+        contenu = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset, end, etag = int(contenu["o"]), int(contenu["n"]), str(contenu["e"])
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"curseur invalide ({cursor!r})") from e
+    if contenu.get("t") != type:
+        raise ValueError(f"le curseur ne correspond pas à la table {type}")
+    if not 0 <= offset <= end:
+        raise ValueError(f"curseur invalide ({cursor!r})")
+    return offset, end, etag
+
+def parse_limit(value):
+    """
+    Fonction : lit le paramètre limit (nombre de lignes par page).
+
+    Arguments :
+    - value : valeur du paramètre (ou None)
+
+    Renvoie :
+    - limit : entier entre 1 et PAGE_MAX_LIMIT (PAGE_DEFAULT_LIMIT si absent)
+
+    Lève :
+    - ValueError si la valeur est invalide
+    """
+    if value is None or value == "":
+        return PAGE_DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f"limit doit être un entier ({value!r})") from None
+    if not 1 <= limit <= PAGE_MAX_LIMIT:
+        raise ValueError(f"limit doit être entre 1 et {PAGE_MAX_LIMIT}")
+    return limit
+
+def iter_lines_with_end(chunks, offset):
+    """
+    Fonction : fonction génératrice qui découpe des blocs en lignes en suivant leur position dans le fichier.
+
+    Arguments :
+    - chunks : blocs (en octets) lus à partir de la position offset
+    - offset : position (octets) du premier bloc dans le fichier
+
+    Renvoit en yield :
+    - (line, end) : la ligne sans retour à la ligne et la position qui la suit (début de la ligne suivante)
+    """
+    reste = b""
+    for bloc in chunks:
+        reste += bloc
+        debut = 0
+        while (fin := reste.find(b"\n", debut)) != -1:
+            offset += fin + 1 - debut
+            yield reste[debut:fin], offset
+            debut = fin + 1
+        reste = reste[debut:]
+    if reste:
+        yield reste, offset + len(reste)
+
+def read_page(s3, bucket, key, start, end, etag, limit, line_filter, sorted_desc=False):
+    """
+    Fonction : lit une page : une seule requête Range à partir de start, arrêtée dès que limit lignes vérifient le filtre.
+
+    Arguments :
+    - s3 : client S3
+    - bucket : nom du bucket
+    - key : chemin du fichier JSON dans le S3
+    - start : position (octets) de la première ligne à lire
+    - end : position (octets) de fin de la lecture (exclue), ou None pour lire jusqu'à la fin du fichier
+    - etag : ETag attendu (la requête échoue si le fichier a changé depuis la première page), ou None pour la première page
+    - limit : nombre de lignes de la page
+    - line_filter : filtre à appliquer
+    - sorted_desc (par défaut : False) : si les lignes sont triées par date décroissante, on s'arrête à la première trop ancienne
+
+    Renvoie :
+    - lines : lignes de la page (en octets, avec retour à la ligne)
+    - next_offset : position de la page suivante, ou None s'il n'y en a plus
+    - end : position de fin de la lecture
+    - etag : ETag du fichier lu
+
+    Lève :
+    - ClientError (PreconditionFailed) si le fichier a changé depuis la première page
+    """
+    if end is not None and start >= end:
+        return [], None, end, etag
+
+    parametres = {"Bucket": bucket, "Key": key, "Range": f"bytes={start}-{'' if end is None else end - 1}"}
+    if etag is not None:
+        parametres["IfMatch"] = etag
+    s3_object = s3.get_object(**parametres)
+    if end is None:
+        end = int(s3_object["ContentRange"].rsplit("/", 1)[1])
+    etag = s3_object["ETag"]
+
+    lines = []
+    filtrer = not line_filter.is_empty()
+    position = start
+    try:
+        for line, position in iter_lines_with_end(s3_object["Body"].iter_chunks(PAGE_CHUNK_SIZE), start):
+            if not line:
+                continue
+            if not filtrer or line_filter.matches(line):
+                lines.append(line + b"\n")
+                if len(lines) == limit:
+                    break
+            elif sorted_desc and line_filter.older_than_window(line):
+                return lines, None, end, etag # On a atteint les mesures trop vieilles (ordre décroissant)
+    finally:
+        s3_object["Body"].close()
+
+    return lines, (position if position < end else None), end, etag
@@ -0,0 +1,473 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Jeux Parquet des tables (partitions année/mois) et lecture sélective (partitions, groupes de lignes, colonnes)
+###################-
+
+# Chargement des librairies
+import io
+import os
+import json
+import datetime
+from pathlib import Path
+
+# Organisation des jeux Parquet dans le S3 : data/parquet/<table>/year=AAAA/month=MM/part-0.parquet
+PARQUET_PREFIX = "data/parquet"
+PARQUET_ROW_GROUP_ROWS = int(os.environ.get("PARQUET_ROW_GROUP_ROWS", "50000")) # Lignes par groupe (unité de lecture de l'API)
+PARQUET_COMPRESSION = os.environ.get("PARQUET_COMPRESSION", "zstd")
+PARTITIONED_TABLES = ("openradiation", "measurements") # Tables partitionnées par année et mois de création
+DATE_COLUMN = "dateAndTimeOfCreation"
+NO_PARTITION = "0000-00" # Lignes sans date de création
+
+# Colonnes de dates (stockées en horodatages UTC) et colonnes d'identifiants ou de catégories (encodées par dictionnaire)
+TIMESTAMP_COLUMNS = ("dateAndTimeOfCreation", "startTime", "endTime", "departureTime", "arrivalTime")
+DICTIONARY_COLUMNS = ("apparatusId", "deviceUuid", "userId", "measurementEnvironment", "devicePlatform", "deviceModel",
+                      "apparatusSensorType", "apparatusTubeType", "qualification", "airportOrigin",
+                      "airportDestination", "aircraftType")
+INTEGER_COLUMNS = ("flightId",) # Identifiants entiers (avec valeurs manquantes)
+
+def index_key(table):
+    """
+    Fonction : chemin dans le S3 de l'index d'un jeu Parquet (partitions, fichiers, colonnes).
+    """
+    return f"{PARQUET_PREFIX}/{table}/_index.json"
+
+def partition_path(table, partition):
+    """
+    Fonction : chemin relatif du fichier d'une partition ("AAAA-MM", ou None pour une table non partitionnée).
+    """
+    if partition is None:
+        return f"{table}/part-0.parquet"
+    annee, mois = partition.split("-")
+    return f"{table}/year={annee}/month={mois}/part-0.parquet"
+
+def arrow_schema(dtypes: dict, columns):
+    """
+    Fonction : schéma Arrow d'une table à partir des types pandas de la lecture du JSON (voir profile_dtypes).
+
+    Arguments :
+    - dtypes : dictionnaire colonne -> type pandas
+    - columns : colonnes de la table, dans l'ordre
+
+    Renvoie :
+    - schema : schéma pyarrow
+    """
+    import pyarrow as pa
+
+    champs = []
+    for col in columns:
+        dtype = dtypes.get(col, "object")
+        if col in TIMESTAMP_COLUMNS:
+            type_arrow = pa.timestamp("ms", tz="UTC")
+        elif col in INTEGER_COLUMNS:
+            type_arrow = pa.int64()
+        elif dtype == "bool":
+            type_arrow = pa.bool_()
+        elif dtype == "int64":
+            type_arrow = pa.int64()
+        elif dtype == "float64":
+            type_arrow = pa.float64()
+        else:
+            type_arrow = pa.string()
+        champs.append(pa.field(col, type_arrow))
+    return pa.schema(champs)
+
+def to_arrow(df, schema):
+    """
+    Fonction : convertit un morceau de table (DataFrame lu du JSON) en table Arrow du schéma donné.
+    Les dates sont converties en horodatages, les valeurs non textuelles des colonnes texte en JSON.
+
+    Arguments :
+    - df : DataFrame
+    - schema : schéma pyarrow (voir arrow_schema)
+
+    Renvoie :
+    - table : table pyarrow
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    df = df.copy()
+    for field in schema:
+        col = field.name
+        if col not in df.columns:
+            df[col] = None
+        elif pa.types.is_timestamp(field.type):
+            df[col] = pd.to_datetime(df[col], utc=True, errors="coerce", format="ISO8601")
+        elif pa.types.is_string(field.type):
+            df[col] = df[col].map(lambda v: v if v is None or isinstance(v, str)
+                                  else None if isinstance(v, float) and v != v else json.dumps(v))
+        elif col in INTEGER_COLUMNS:
+            df[col] = df[col].astype("Int64")
+    return pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+def partitions_of(table):
+    """
+    Fonction : partition ("AAAA-MM") de chaque ligne d'une table Arrow, d'après sa date de création.
+    """
+    import pyarrow.compute as pc
+
+    dates = table.column(DATE_COLUMN)
+    cles = pc.strftime(dates, format="%Y-%m")
+    return pc.fill_null(cles, NO_PARTITION)
+
+class PartitionWriter:
+    """
+    Classe : écrit les lignes d'une table dans les fichiers Parquet de ses partitions, en groupes de
+    PARQUET_ROW_GROUP_ROWS lignes (les lignes d'une partition sont gardées en mémoire jusqu'à former un groupe).
+    """
+
+    def __init__(self, table, schema, out_dir):
+        self.table = table
+        self.schema = schema
+        self.out_dir = Path(out_dir)
+        self.partitioned = table in PARTITIONED_TABLES
+        self.writers = {}
+        self.buffers = {}
+        self.rows = {}
+
+    def write(self, arrow_table):
+        """
+        Fonction : répartit les lignes d'un morceau entre les partitions de la table (mois de la date de création,
+        voir partitions_of), ou les garde toutes dans le fichier unique d'une table non partitionnée.
+
+        Arguments :
+        - arrow_table : morceau de la table (table Arrow au schéma du jeu)
+        """
+        import pyarrow.compute as pc
+
+        if not self.partitioned:
+            self.append(None, arrow_table)
+            return
+        cles = partitions_of(arrow_table)
+        for cle in pc.unique(cles).to_pylist():
+            self.append(cle, arrow_table.filter(pc.equal(cles, cle)))
+
+    def append(self, partition, arrow_table):
+        """
+        Fonction : ajoute des lignes à une partition ; elles sont écrites dès que la partition en a assez
+        pour un groupe de PARQUET_ROW_GROUP_ROWS lignes.
+
+        Arguments :
+        - partition : partition des lignes ("AAAA-MM", ou None pour une table non partitionnée)
+        - arrow_table : lignes de cette partition (table Arrow au schéma du jeu)
+        """
+        self.buffers.setdefault(partition, []).append(arrow_table)
+        self.rows[partition] = self.rows.get(partition, 0) + arrow_table.num_rows
+        if sum(t.num_rows for t in self.buffers[partition]) >= PARQUET_ROW_GROUP_ROWS:
+            self.flush(partition)
+
+    def flush(self, partition):
+        """
+        Fonction : écrit les lignes gardées en mémoire d'une partition dans son fichier Parquet (créé à la première écriture).
+
+        Arguments :
+        - partition : partition à écrire ("AAAA-MM", ou None pour une table non partitionnée)
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tables = self.buffers.pop(partition, [])
+        if not tables:
+            return
+        if partition not in self.writers:
+            path = self.out_dir / partition_path(self.table, partition)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.writers[partition] = pq.ParquetWriter(
+                path, self.schema, compression=PARQUET_COMPRESSION,
+                use_dictionary=[col for col in self.schema.names if col in DICTIONARY_COLUMNS])
+        self.writers[partition].write_table(pa.concat_tables(tables), row_group_size=PARQUET_ROW_GROUP_ROWS)
+
+    def close(self):
+        """
+        Fonction : écrit les dernières lignes et ferme les fichiers.
+
+        Renvoie :
+        - files : liste de dictionnaires {"partition", "path", "rows"} des fichiers écrits
+        """
+        for partition in list(self.buffers):
+            self.flush(partition)
+        files = []
+        for partition, writer in sorted(self.writers.items(), key=lambda item: item[0] or "", reverse=True):
+            writer.close()
+            files.append({"partition": partition, "path": str(self.out_dir / partition_path(self.table, partition)),
+                          "rows": self.rows[partition]})
+        return files
+
+def write_parquet_table(path, table, dtypes, out_dir, chunksize=100000):
+    """
+    Fonction : convertit une table JSON (une ligne par enregistrement) en jeu Parquet, morceau par morceau.
+
+    Arguments :
+    - path : chemin du fichier JSON de la table
+    - table : nom de la table
+    - dtypes : types pandas des colonnes (voir profile_dtypes)
+    - out_dir : dossier local du jeu Parquet
+    - chunksize (par défaut : 100000) : nombre de lignes par morceau
+
+    Renvoie :
+    - (schema, files) : schéma Arrow et fichiers écrits (voir PartitionWriter.close)
+    """
+    import pandas as pd
+
+    schema = None
+    writer = None
+    # Lecture exacte des décimaux (le parseur rapide par défaut de pandas arrondit le dernier chiffre)
+    with pd.read_json(path, lines=True, chunksize=chunksize, dtype=dtypes, precise_float=True) as reader:
+        for chunk in reader:
+            if schema is None:
+                schema = arrow_schema(dtypes, list(chunk.columns))
+                writer = PartitionWriter(table, schema, out_dir)
+            writer.write(to_arrow(chunk, schema))
+    return schema, (writer.close() if writer is not None else [])
+
+def prepend_rows(path_new, path_old, path_out):
+    """
+    Fonction : réécrit le fichier Parquet d'une partition avec les nouvelles lignes devant les anciennes
+    (les lignes restent triées par date décroissante).
+
+    Arguments :
+    - path_new : fichier Parquet des nouvelles lignes de la partition
+    - path_old : fichier Parquet actuel de la partition
+    - path_out : fichier Parquet à écrire
+
+    Renvoie :
+    - rows : nombre de lignes de la partition
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    nouvelles = pq.read_table(path_new)
+    anciennes = pq.read_table(path_old).select(nouvelles.schema.names).cast(nouvelles.schema)
+    fusion = pa.concat_tables([nouvelles, anciennes])
+    pq.write_table(fusion, path_out, row_group_size=PARQUET_ROW_GROUP_ROWS, compression=PARQUET_COMPRESSION,
+                   use_dictionary=[col for col in fusion.schema.names if col in DICTIONARY_COLUMNS])
+    return fusion.num_rows
+
+def build_index(table, schema, files):
+    """
+    Fonction : index d'un jeu Parquet : colonnes et, pour chaque partition, chemin dans le S3, nombre de lignes et taille.
+    """
+    return {"table": table, "partitioned": table in PARTITIONED_TABLES, "columns": schema.names,
+            "files": [{"partition": f["partition"], "key": f"{PARQUET_PREFIX}/{partition_path(table, f['partition'])}",
+                       "rows": f["rows"], "size": os.path.getsize(f["path"])} for f in files]}
+
+##########################################-
+# Lecture sélective (API)
+##########################################-
+
+class S3RangeFile(io.RawIOBase):
+    """
+    Classe : fichier en lecture seule sur un objet du S3, dont chaque lecture est une requête Range :
+    pyarrow n'en lit que le pied (métadonnées) puis les colonnes des groupes de lignes demandés.
+    """
+
+    def __init__(self, s3, bucket, key):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.size = s3.head_object(Bucket=bucket, Key=key)["ContentLength"]
+        self.position = 0
+
+    def readable(self):
+        """
+        Fonction : indique que l'objet peut être lu (protocole des fichiers, utilisé par pyarrow).
+        """
+        return True
+
+    def seekable(self):
+        """
+        Fonction : indique que la position peut être déplacée (pyarrow lit d'abord la fin du fichier Parquet).
+        """
+        return True
+
+    def tell(self):
+        """
+        Fonction : position courante dans l'objet, en octets.
+        """
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """
+        Fonction : déplace la position, sans requête vers le S3.
+
+        Arguments :
+        - offset : déplacement en octets
+        - whence (par défaut : io.SEEK_SET) : depuis le début, la position courante (io.SEEK_CUR) ou la fin (io.SEEK_END)
+
+        Renvoie :
+        - position : la nouvelle position
+        """
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def read(self, size=-1):
+        """
+        Fonction : lit des octets à partir de la position courante (une requête Range vers le S3).
+
+        Arguments :
+        - size (par défaut : -1) : nombre d'octets à lire (jusqu'à la fin de l'objet si négatif)
+
+        Renvoie :
+        - data : les octets lus (vide à la fin de l'objet)
+        """
+        fin = self.size if size is None or size < 0 else min(self.size, self.position + size)
+        if fin <= self.position:
+            return b""
+        data = self.s3.get_object(Bucket=self.bucket, Key=self.key,
+                                  Range=f"bytes={self.position}-{fin - 1}")["Body"].read()
+        self.position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        """
+        Fonction : lit des octets dans un tampon existant (voir read).
+
+        Arguments :
+        - buffer : tampon à remplir
+
+        Renvoie :
+        - nombre d'octets lus
+        """
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def to_timestamp(value):
+    """
+    Fonction : convertit une borne de parse_date_bounds ("AAAA-MM-JJTHH:MM:SS", UTC) en date avec fuseau.
+    """
+    return datetime.datetime.fromisoformat(value).replace(tzinfo=datetime.timezone.utc)
+
+def partitions_for_window(index, lower=None, upper=None):
+    """
+    Fonction : fichiers d'un jeu Parquet dont la partition (mois) touche la fenêtre de dates.
+
+    Arguments :
+    - index : index du jeu Parquet
+    - lower, upper (par défaut : None) : bornes de parse_date_bounds (inférieure incluse, supérieure exclue)
+
+    Renvoie :
+    - files : entrées de l'index à lire
+    """
+    if not index["partitioned"] or (lower is None and upper is None):
+        return index["files"]
+    files = []
+    for entry in index["files"]:
+        partition = entry["partition"]
+        if partition == NO_PARTITION:
+            continue # Lignes sans date : jamais dans une fenêtre de dates
+        debut = partition + "-01T00:00:00"
+        if (lower is None or lower[:7] <= partition) and (upper is None or debut < upper):
+            files.append(entry)
+    return files
+
+def row_group_in_window(metadata, i, lower, upper):
+    """
+    Fonction : indique, d'après les statistiques min/max de la date de création, si un groupe de lignes peut
+    contenir des lignes de la fenêtre de dates.
+    """
+    if lower is None and upper is None:
+        return True
+    colonnes = [metadata.schema.column(j).name for j in range(metadata.num_columns)]
+    if DATE_COLUMN not in colonnes:
+        return True
+    stats = metadata.row_group(i).column(colonnes.index(DATE_COLUMN)).statistics
+    if stats is None or not stats.has_min_max:
+        return True
+    minimum, maximum = stats.min, stats.max
+    if isinstance(minimum, datetime.datetime) and minimum.tzinfo is None:
+        minimum = minimum.replace(tzinfo=datetime.timezone.utc)
+        maximum = maximum.replace(tzinfo=datetime.timezone.utc)
+    return (lower is None or maximum >= to_timestamp(lower)) and (upper is None or minimum < to_timestamp(upper))
+
+def filter_columns(line_filter):
+    """
+    Fonction : colonnes nécessaires pour évaluer les prédicats d'un filtre.
+    """
+    colonnes = list(line_filter.values)
+    if line_filter.has_date_window():
+        colonnes.append(DATE_COLUMN)
+    if line_filter.min_value is not None or line_filter.max_value is not None:
+        colonnes.append("value")
+    if line_filter.bbox is not None:
+        colonnes += ["latitude", "longitude"]
+    return colonnes
+
+def filter_mask(table, line_filter):
+    """
+    Fonction : masque des lignes d'une table Arrow qui vérifient les prédicats d'un filtre (mêmes règles que LineFilter.matches).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    masque = pa.array([True] * table.num_rows)
+    if line_filter.lower is not None:
+        masque = pc.and_(masque, pc.greater_equal(table.column(DATE_COLUMN), pa.scalar(to_timestamp(line_filter.lower), pa.timestamp("ms", tz="UTC"))))
+    if line_filter.upper is not None:
+        masque = pc.and_(masque, pc.less(table.column(DATE_COLUMN), pa.scalar(to_timestamp(line_filter.upper), pa.timestamp("ms", tz="UTC"))))
+    for col, valeurs in line_filter.values.items():
+        colonne = table.column(col)
+        if pa.types.is_dictionary(colonne.type):
+            colonne = colonne.cast(colonne.type.value_type)
+        masque = pc.and_(masque, pc.is_in(colonne, value_set=pa.array(valeurs, type=colonne.type)))
+    if line_filter.min_value is not None:
+        masque = pc.and_(masque, pc.greater_equal(table.column("value"), line_filter.min_value))
+    if line_filter.max_value is not None:
+        masque = pc.and_(masque, pc.less_equal(table.column("value"), line_filter.max_value))
+    if line_filter.bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = line_filter.bbox
+        lat, lon = table.column("latitude"), table.column("longitude")
+        masque = pc.and_(masque, pc.and_(pc.greater_equal(lat, min_lat), pc.less_equal(lat, max_lat)))
+        if min_lon <= max_lon:
+            masque = pc.and_(masque, pc.and_(pc.greater_equal(lon, min_lon), pc.less_equal(lon, max_lon)))
+        else:
+            masque = pc.and_(masque, pc.or_(pc.greater_equal(lon, min_lon), pc.less_equal(lon, max_lon)))
+    return masque
+
+def json_value(value):
+    """
+    Fonction : écriture JSON des valeurs que json ne sait pas écrire (dates au format des fichiers JSON : "AAAA-MM-JJTHH:MM:SS.mmmZ").
+    """
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+    raise TypeError(f"Type non sérialisable : {type(value)}")
+
+def generate_parquet(s3, bucket, index, line_filter, columns):
+    """
+    Fonction : fonction génératrice des lignes JSON d'un jeu Parquet : seuls les partitions de la fenêtre de dates,
+    les groupes de lignes dont les dates la touchent et les colonnes demandées (et filtrées) sont lus du S3.
+
+    Arguments :
+    - s3 : client S3
+    - bucket : nom du bucket
+    - index : index du jeu Parquet
+    - line_filter : filtre à appliquer (voir filters.build_line_filter)
+    - columns : colonnes à renvoyer
+
+    Renvoit en yield :
+    - lignes JSON (en octets) d'un groupe de lignes
+    """
+    import pyarrow.parquet as pq
+
+    lues = list(dict.fromkeys(list(columns) + filter_columns(line_filter)))
+    for entry in partitions_for_window(index, line_filter.lower, line_filter.upper):
+        parquet = pq.ParquetFile(S3RangeFile(s3, bucket, entry["key"]))
+        for i in range(parquet.num_row_groups):
+            if not row_group_in_window(parquet.metadata, i, line_filter.lower, line_filter.upper):
+                continue
+            groupe = parquet.read_row_group(i, columns=lues)
+            line_filter.stats["read"] += groupe.num_rows
+            if not line_filter.is_empty():
+                groupe = groupe.filter(filter_mask(groupe, line_filter))
+            line_filter.stats["sent"] += groupe.num_rows
+            line_filter.stats["filtered"] = line_filter.stats["read"] - line_filter.stats["sent"]
+            if groupe.num_rows:
+                lignes = groupe.select(list(columns)).to_pylist()
+                yield "".join(json.dumps(ligne, separators=(",", ":"), default=json_value) + "\n"
+                              for ligne in lignes).encode("utf-8")
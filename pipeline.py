@@ -0,0 +1,116 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Chaîne complète en un seul processus : téléchargement -> extraction -> découpage -> écriture -> téléversement
+###################-
+
+# Lancement : python pipeline.py (remplace python actualisation_donnees.py puis python table_creation.py)
+#
+# Les deux scripts restent utilisables séparément. Enchaînés ici, le fichier JSON brut produit par l'extraction
+# est découpé directement depuis le cache local : il n'est plus téléversé dans le S3 puis retéléchargé
+# (la table détaillée publiée, data/openradiation.jsonl ou data/openradiation_core.jsonl avec OPENRADIATION_JOIN,
+# est la table nettoyée, écrite par le découpage).
+
+# Les durées et la mémoire de chaque étape sont publiées dans le S3 (metrics.ETL_METRICS_KEY) et exposées par la route /metrics.
+
+# Chargement des librairies
+import json
+import time
+from datetime import datetime, timezone
+import metrics
+from s3_client import get_s3_client
+from logger_write import log_memory_usage, get_peak_memory_mb
+from actualisation_donnees import (download_tar, extract_csv_from_tar, convert_to_json, convert_to_json_streaming, serialize_pool,
+                                   profile_chunk, load_manifest, needs_full_refresh, save_download_state_s3,
+                                   INCREMENTAL_MODE, CHUNK_ROWS)
+from table_creation import (refresh_full, refresh_incremental, refresh_legacy, read_json_file,
+                            STREAMING_MODE, SOURCE_FILE, DELTA_SOURCE_FILE, bucket_name)
+
+def run_stage(nom, fonction, *args, **kwargs):
+    """
+    Fonction : exécute une étape de la chaîne et enregistre sa durée, la mémoire résidente à sa fin et le pic mémoire atteint
+    (dans le log et dans les mesures du processus).
+
+    Arguments :
+    - nom : nom de l'étape (pour le log)
+    - fonction : fonction de l'étape
+    - args, kwargs : arguments de la fonction
+
+    Renvoie :
+    - resultat : ce que renvoie la fonction
+    """
+    debut = time.monotonic()
+    resultat = fonction(*args, **kwargs)
+    record = metrics.record_stage(nom, time.monotonic() - debut)
+    msg = (f"Étape {nom} terminée en {record['duration_s']:.1f} s, mémoire (RSS) : {record['rss_mb']:.2f} MB, "
+           f"pic mémoire (RSS) : {record['peak_rss_mb']:.2f} MB")
+    log_memory_usage(msg)
+    print(msg)
+    return resultat
+
+def publish_stage_metrics():
+    """
+    Fonction : publie dans le S3 les mesures des étapes de cette actualisation (lues par la route /metrics de l'application).
+    """
+    contenu = json.dumps({"generated": datetime.now(timezone.utc).isoformat(),
+                          "peak_rss_mb": get_peak_memory_mb(),
+                          "stages": metrics.recent("stage")})
+    get_s3_client().put_object(Bucket=bucket_name, Key=metrics.ETL_METRICS_KEY, Body=contenu.encode("utf-8"),
+                               ContentType="application/json")
+
+def extract_legacy():
+    """
+    Fonction : extraction sans streaming : le CSV de l'archive est chargé en entier puis écrit en JSON dans le cache local.
+
+    Renvoie :
+    - profile : profil des colonnes du fichier écrit
+    """
+    df = extract_csv_from_tar()
+    profile = {}
+    profile_chunk(df, profile)
+    with serialize_pool() as processes:
+        convert_to_json(df, SOURCE_FILE, processes)
+    return {"rows": len(df), "columns": profile}
+
+def run_pipeline():
+    """
+    Fonction : exécute toute l'actualisation dans ce processus.
+
+    Renvoie :
+    - True si des tables ont été publiées, False si rien n'a changé en amont
+    """
+    if not run_stage("téléchargement", download_tar):
+        msg = "Aucune nouvelle donnée, actualisation terminée sans traitement."
+        log_memory_usage(msg)
+        print(msg)
+        return False
+
+    if STREAMING_MODE:
+        # En mode incrémental, seules les lignes postérieures au dernier passage sont converties
+        manifest = load_manifest() if INCREMENTAL_MODE else None
+        if manifest is not None and needs_full_refresh(manifest):
+            manifest = None
+
+        # Extraction vers le cache local (mémoire constante), lu ensuite par le découpage
+        profile = run_stage("extraction", convert_to_json_streaming, "disk", CHUNK_ROWS, manifest,
+                            path=SOURCE_FILE, delta_path=DELTA_SOURCE_FILE)
+        if profile["mode"] == "incremental":
+            run_stage("découpage et publication", refresh_incremental, profile, manifest, DELTA_SOURCE_FILE)
+        else:
+            run_stage("découpage et publication", refresh_full, SOURCE_FILE, profile)
+    else:
+        profile = run_stage("extraction", extract_legacy)
+        df = run_stage("lecture", read_json_file, SOURCE_FILE, profile)
+        run_stage("découpage et publication", refresh_legacy, df, profile)
+
+    # Le fichier en amont est marqué comme traité seulement une fois tout publié
+    save_download_state_s3()
+    publish_stage_metrics()
+
+    msg = f"Pic mémoire (RSS) de la chaîne complète : {get_peak_memory_mb():.2f} MB"
+    log_memory_usage(msg)
+    print(msg)
+    return True
+
+if __name__ == "__main__":
+    run_pipeline()
@@ -0,0 +1,112 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Accès au S3 partagé par tout le processus (un seul client, pool de connexions, URL présignées réutilisées)
+###################-
+
+# Chargement des librairies
+import os
+import time
+import threading
+from metrics import instrument_s3
+
+# Configuration du client S3
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None # S3 local de remplacement (MinIO, moto server...) si renseigné
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", "32")) # Connexions gardées ouvertes (requêtes et fils simultanés)
+S3_CONNECT_TIMEOUT = float(os.environ.get("S3_CONNECT_TIMEOUT", "5"))
+S3_READ_TIMEOUT = float(os.environ.get("S3_READ_TIMEOUT", "60"))
+S3_MAX_ATTEMPTS = int(os.environ.get("S3_MAX_ATTEMPTS", "5"))
+
+# Téléversements et téléchargements de fichiers : au-delà du seuil, le fichier est découpé en parties de
+# S3_MULTIPART_CHUNK_MB MB transférées par S3_TRANSFER_CONCURRENCY fils (les parties sont lues sur le disque au fur et à mesure).
+# Plusieurs transferts pouvant avoir lieu en même temps, S3_TRANSFER_CONCURRENCY x transferts simultanés
+# doit rester sous S3_MAX_POOL_CONNECTIONS
+S3_MULTIPART_THRESHOLD_MB = int(os.environ.get("S3_MULTIPART_THRESHOLD_MB", "16"))
+S3_MULTIPART_CHUNK_MB = int(os.environ.get("S3_MULTIPART_CHUNK_MB", "16"))
+S3_TRANSFER_CONCURRENCY = int(os.environ.get("S3_TRANSFER_CONCURRENCY", "8"))
+
+# boto3 n'est importé qu'à la création du client (ou de la configuration des transferts) : un processus
+# qui démarre ne paie son import qu'au premier accès au S3 (voir le préchauffage de app.py, warm_up)
+
+# Une URL présignée est réutilisée pendant cette fraction de sa durée de validité
+PRESIGN_REUSE_FRACTION = float(os.environ.get("PRESIGN_REUSE_FRACTION", "0.8"))
+
+_client = None
+_client_pid = None # Processus qui a créé le client (un processus créé par fork en crée un nouveau)
+_lock = threading.Lock()
+_presigned = {} # (chemin S3, durée) -> (date de signature, URL)
+
+def get_s3_client():
+    """
+    Fonction : renvoie le client S3 du processus, créé au premier appel. Les identifiants ne sont résolus
+    et les connexions (TLS) ouvertes qu'une fois, puis réutilisées par toutes les requêtes (le client est utilisable par plusieurs fils).
+    Un processus créé par fork (workers d'un serveur qui a chargé l'application avant) ne reprend pas les connexions de son parent.
+
+    Renvoie :
+    - s3 : client S3 de boto3
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                import boto3
+                from botocore.config import Config
+                config = Config(
+                    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                    connect_timeout=S3_CONNECT_TIMEOUT,
+                    read_timeout=S3_READ_TIMEOUT,
+                    retries={"max_attempts": S3_MAX_ATTEMPTS, "mode": "standard"},
+                )
+                # Sans variables d'identifiants, boto3 utilise sa chaîne habituelle (profil, rôle...)
+                _client = boto3.client("s3",
+                                       aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
+                                       aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
+                                       region_name=os.environ.get('AWS_REGION'),
+                                       endpoint_url=S3_ENDPOINT_URL,
+                                       config=config)
+                # Latence de chaque appel, attribuée à la requête en cours (voir metrics.py)
+                instrument_s3(_client)
+                _client_pid = os.getpid()
+    return _client
+
+def get_transfer_config():
+    """
+    Fonction : renvoie la configuration des transferts de fichiers (upload_file, download_file) : taille des parties
+    et nombre de parties transférées en même temps pour les gros fichiers.
+
+    Renvoie :
+    - config : configuration de transfert de boto3
+    """
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=S3_MULTIPART_THRESHOLD_MB * 1024 ** 2,
+        multipart_chunksize=S3_MULTIPART_CHUNK_MB * 1024 ** 2,
+        max_concurrency=S3_TRANSFER_CONCURRENCY,
+    )
+
+def presigned_url(bucket, key, expires_in):
+    """
+    Fonction : URL présignée de téléchargement d'un objet, réutilisée tant qu'il lui reste au moins
+    (1 - PRESIGN_REUSE_FRACTION) de sa durée de validité.
+
+    Arguments :
+    - bucket : nom du bucket
+    - key : chemin de l'objet dans le S3
+    - expires_in : durée de validité de l'URL (secondes)
+
+    Renvoie :
+    - url : l'URL présignée
+    """
+    maintenant = time.monotonic()
+    cle = (bucket, key, expires_in)
+    signee = _presigned.get(cle)
+    if signee is not None and maintenant - signee[0] < expires_in * PRESIGN_REUSE_FRACTION:
+        return signee[1]
+
+    url = get_s3_client().generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket, 'Key': key},
+        ExpiresIn=expires_in
+    )
+    _presigned[cle] = (maintenant, url)
+    return url
@@ -0,0 +1,123 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Schéma des colonnes du jeu OpenRadiation (types compacts en mémoire) et nettoyage des identifiants en une passe
+###################-
+
+# Chargement des librairies
+import numpy as np
+import pandas as pd
+
+# pyarrow est optionnel : sans lui, le texte est gardé en chaînes pandas (objets Python)
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Identifiants nettoyés (minuscules, sans guillemets ni espaces autour) avant le découpage en tables
+ID_COLUMNS = ("deviceUuid", "apparatusId")
+
+# Colonnes de texte à peu de valeurs distinctes : gardées en catégories (chaque valeur n'est stockée qu'une fois)
+CATEGORY_COLUMNS = ("apparatusId", "deviceUuid", "userId", "apparatusSensorType", "apparatusTubeType",
+                    "devicePlatform", "deviceModel", "measurementEnvironment", "qualification",
+                    "flightNumber", "seatNumber", "airportOrigin", "airportDestination", "aircraftType")
+
+# Texte à valeurs presque toutes distinctes (identifiants des mesures, dates ISO) : chaînes compactes de pyarrow
+# (un seul tampon au lieu d'un objet Python par valeur). Les dates restent du texte : converties en datetime64,
+# elles s'écriraient à l'identique mais to_json serait trois fois plus lent à les remettre au format ISO.
+TEXT_COLUMNS = ("reportUuid", "startTime", "endTime", "dateAndTimeOfCreation", "departureTime", "arrivalTime")
+TEXT_DTYPE = "string[pyarrow]" if pyarrow is not None else "string"
+
+# Indicateurs 0/1 : float32 (la valeur manquante reste possible et "0.0"/"1.0" s'écrivent comme avant)
+FLAG_COLUMNS = ("rain", "storm", "windowSeat")
+
+# Identifiants numériques nullables
+INTEGER_COLUMNS = {"flightId": "Int64"}
+
+# Options d'écriture JSON communes aux scripts (une colonne de dates pandas serait écrite au format ISO, comme dans le fichier source)
+JSON_OPTIONS = {"orient": "records", "lines": True, "date_format": "iso", "date_unit": "ms"}
+
+# Les valeurs, coordonnées et températures restent en float64 : en float32, to_json écrirait 0.0303160004 au lieu de 0.030316
+
+def clean_id(value):
+    """
+    Fonction : nettoie un identifiant (minuscules, sans guillemets, chaîne vide -> valeur manquante, sans espaces autour).
+    Les étapes sont faites dans le même ordre que les anciens nettoyages successifs de la colonne.
+    """
+    if not isinstance(value, str):
+        return value
+    value = value.lower().replace('"', '')
+    if value == '':
+        return None
+    return value.strip()
+
+def clean_id_column(serie):
+    """
+    Fonction : nettoie une colonne d'identifiants en une seule passe : chaque valeur distincte n'est nettoyée qu'une fois,
+    puis la colonne est reconstruite en catégories à partir des codes.
+
+    Arguments :
+    - serie : colonne d'identifiants
+
+    Renvoie :
+    - serie : colonne nettoyée (catégories)
+    """
+    codes, uniques = pd.factorize(serie)
+    propres = pd.Index([clean_id(v) for v in uniques], dtype=object)
+
+    # Deux identifiants peuvent devenir identiques une fois nettoyés : les catégories sont recalculées
+    nouveaux_codes, categories = pd.factorize(propres)
+    codes = np.append(nouveaux_codes, -1)[codes] # Le code -1 (valeur manquante) reste -1
+    categories = pd.Index(categories.astype(str)) if len(categories) else pd.Index([], dtype=str)
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=serie.index, name=serie.name)
+
+def restore_categories(df):
+    """
+    Fonction : remet en catégories les colonnes du schéma après la réunion de morceaux
+    (pd.concat donne des objets quand les catégories des morceaux diffèrent).
+    """
+    colonnes = {col: "category" for col in CATEGORY_COLUMNS
+                if col in df.columns and (pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]))}
+    return df.astype(colonnes) if colonnes else df
+
+def apply_schema(df):
+    """
+    Fonction : applique le schéma aux colonnes présentes d'un DataFrame (ou morceau) des mesures :
+    identifiants nettoyés en une passe, catégories, texte compact, indicateurs et identifiants numériques.
+
+    Arguments :
+    - df : DataFrame lu depuis le fichier JSON
+
+    Renvoie :
+    - df : DataFrame aux types compacts (les colonnes sont remplacées, sans copie des autres)
+    """
+    colonnes = {}
+    for col in df.columns:
+        serie = df[col]
+        if col in ID_COLUMNS and not pd.api.types.is_numeric_dtype(serie):
+            colonnes[col] = clean_id_column(serie)
+        elif col in CATEGORY_COLUMNS and (pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie)):
+            colonnes[col] = serie.astype("category")
+        elif col in TEXT_COLUMNS and (pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie)):
+            colonnes[col] = serie.astype(TEXT_DTYPE)
+        elif col in FLAG_COLUMNS and pd.api.types.is_float_dtype(serie):
+            colonnes[col] = serie.astype("float32")
+        elif col in INTEGER_COLUMNS:
+            colonnes[col] = serie.astype(INTEGER_COLUMNS[col])
+    return df.assign(**colonnes)
+
+def to_jsonl(df):
+    """
+    Fonction : texte JSON d'un DataFrame (un enregistrement par ligne, terminé par un retour à la ligne).
+    Fonction de module pour pouvoir être exécutée dans un processus du groupe de conversion (voir actualisation_donnees.serialize_pool).
+
+    Arguments :
+    - df : DataFrame (ou tranche) à convertir
+
+    Renvoie :
+    - text : le texte JSON (vide si le DataFrame est vide)
+    """
+    if df.empty:
+        return ""
+    text = df.to_json(**JSON_OPTIONS)
+    return text if text.endswith("\n") else text + "\n"
@@ -0,0 +1,294 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Statistiques précalculées des mesures (par jour, par tuile de la grille, par appareil) publiées dans le S3
+###################-
+
+# Chargement des librairies
+import os
+import math
+import json
+from botocore.exceptions import ClientError
+from time_index import parse_date_bounds
+from tile_index import tile_bounds, parse_bbox
+
+# Chemins des statistiques dans le S3
+STATS_PREFIX = "data/stats"
+STATS_KINDS = ("daily", "cells", "apparatus", "devices")
+STATS_STATE_KEY = f"{STATS_PREFIX}/_state.json" # État cumulable (histogrammes) repris par les actualisations incrémentales
+
+# Les centiles sont lus dans un histogramme de la valeur à pas logarithmique (cumulable d'une actualisation à l'autre) :
+# STATS_BINS_PER_DECADE classes par puissance de 10, soit une précision relative d'environ 10 ** (1 / 50) - 1 = 4,7 %
+STATS_PERCENTILES = (50, 90, 95, 99)
+STATS_BINS_PER_DECADE = int(os.environ.get("STATS_BINS_PER_DECADE", "50"))
+ZERO_BIN = -10 ** 6 # Classe des valeurs nulles ou négatives
+
+# numpy et pandas ne sont importés que par les fonctions de calcul (actualisation) : l'API, qui ne fait que lire
+# les tables publiées, démarre sans eux
+
+# Colonne de regroupement des comptes par appareil
+COUNT_COLUMNS = {"apparatus": "apparatusId", "devices": "deviceUuid"}
+
+def stats_key(kind):
+    """
+    Fonction : chemin dans le S3 d'une table de statistiques.
+    """
+    return f"{STATS_PREFIX}/{kind}.json"
+
+def day_of(dates):
+    """
+    Fonction : jour ("AAAA-MM-JJ", en UTC) de chaque date d'une colonne (texte ISO ou dates pandas).
+    """
+    import pandas as pd
+
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_convert("UTC")
+        return dates.dt.strftime("%Y-%m-%d")
+    return dates.astype("string").str.slice(0, 10)
+
+def value_bins(values, bins_per_decade=STATS_BINS_PER_DECADE):
+    """
+    Fonction : classe de l'histogramme de chaque valeur (floor(log10(valeur) * classes par décade)).
+
+    Arguments :
+    - values : tableau numpy de valeurs finies
+    - bins_per_decade (par défaut : STATS_BINS_PER_DECADE) : nombre de classes par puissance de 10
+
+    Renvoie :
+    - bins : tableau numpy d'entiers (ZERO_BIN pour les valeurs nulles ou négatives)
+    """
+    import numpy as np
+
+    positives = values > 0
+    bins = np.full(len(values), ZERO_BIN, dtype=np.int64)
+    bins[positives] = np.floor(np.log10(values[positives]) * bins_per_decade).astype(np.int64)
+    return bins
+
+def bin_value(b, bins_per_decade=STATS_BINS_PER_DECADE):
+    """
+    Fonction : valeur représentative d'une classe (milieu géométrique de ses bornes).
+    """
+    if b == ZERO_BIN:
+        return 0.0
+    return 10 ** ((b + 0.5) / bins_per_decade)
+
+def tile_numbers(lat, lon, tile_size):
+    """
+    Fonction : numéro de tuile de chaque position (même numérotation que tile_index.tile_of, calcul vectorisé).
+    """
+    import numpy as np
+
+    nb_colonnes = math.ceil(360 / tile_size)
+    ligne = np.minimum(np.floor((lat + 90) / tile_size).astype(np.int64), math.ceil(180 / tile_size) - 1)
+    colonne = np.minimum(np.floor((lon + 180) / tile_size).astype(np.int64), nb_colonnes - 1)
+    return ligne * nb_colonnes + colonne
+
+def percentiles_of(groupe, bins_per_decade):
+    """
+    Fonction : centiles STATS_PERCENTILES d'un groupe à partir de son histogramme (rang le plus proche),
+    ramenés entre le minimum et le maximum exacts.
+
+    Arguments :
+    - groupe : dictionnaire {"n", "min", "max", "h": {classe: nombre}}
+    - bins_per_decade : nombre de classes par puissance de 10 de l'histogramme
+
+    Renvoie :
+    - percentiles : dictionnaire {"p50": valeur, ...}
+    """
+    classes = sorted((int(b), n) for b, n in groupe["h"].items())
+    resultat = {}
+    cumul, i = 0, 0
+    for p in STATS_PERCENTILES:
+        rang = max(1, math.ceil(p / 100 * groupe["n"]))
+        while cumul + classes[i][1] < rang:
+            cumul += classes[i][1]
+            i += 1
+        valeur = min(max(bin_value(classes[i][0], bins_per_decade), groupe["min"]), groupe["max"])
+        resultat[f"p{p}"] = round(valeur, 6)
+    return resultat
+
+class StatsAccumulator:
+    """
+    Classe : statistiques des mesures cumulées morceau par morceau (calculs vectorisés par morceau) :
+    - par jour et par tuile de la grille : nombre, somme, minimum, maximum et histogramme de la valeur ;
+    - par appareil de mesure et de renseignement : nombre de mesures, premier et dernier jour.
+    L'état est cumulable : une actualisation incrémentale reprend l'état publié et y ajoute les nouvelles mesures.
+    """
+
+    def __init__(self, tile_size=1.0, state=None):
+        state = state or {}
+        # Un état repris garde ses paramètres (sinon ses classes et ses tuiles ne correspondraient plus)
+        self.tile_size = state.get("tile_size", tile_size)
+        self.bins_per_decade = state.get("bins_per_decade", STATS_BINS_PER_DECADE)
+        self.groups = {"daily": state.get("daily", {}), "cells": state.get("cells", {})}
+        self.counts = {"apparatus": state.get("apparatus", {}), "devices": state.get("devices", {})}
+
+    def add(self, df):
+        """
+        Fonction : ajoute un morceau de la table des mesures.
+
+        Arguments :
+        - df : DataFrame des mesures (colonnes de la table measurements)
+        """
+        import numpy as np
+        import pandas as pd
+
+        if df.empty:
+            return
+        # Jours numérotés dans l'ordre (-1 : date absente) pour que les regroupements se fassent sur des entiers
+        codes, jours = pd.factorize(day_of(df["dateAndTimeOfCreation"]), sort=True)
+
+        # Comptes par appareil (toutes les mesures, avec ou sans valeur)
+        for kind, colonne in COUNT_COLUMNS.items():
+            frame = pd.DataFrame({"id": df[colonne], "jour": codes})
+            par_appareil = frame[frame["jour"] >= 0].dropna().groupby("id", observed=True)["jour"].agg(["size", "min", "max"])
+            comptes = self.counts[kind]
+            for ident, n, premier, dernier in par_appareil.itertuples():
+                premier, dernier = jours[premier], jours[dernier]
+                compte = comptes.get(ident)
+                if compte is None:
+                    comptes[ident] = [int(n), premier, dernier]
+                else:
+                    compte[0] += int(n)
+                    compte[1] = min(compte[1], premier)
+                    compte[2] = max(compte[2], dernier)
+
+        # Statistiques de la valeur par jour et par tuile (valeurs renseignées et finies)
+        valeurs = pd.to_numeric(df["value"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        renseignees = np.isfinite(valeurs)
+        valeurs, classes = valeurs[renseignees], value_bins(valeurs[renseignees], self.bins_per_decade)
+        self.add_values("daily", codes[renseignees], valeurs, classes, jours)
+
+        lat = pd.to_numeric(df["latitude"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)[renseignees]
+        lon = pd.to_numeric(df["longitude"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)[renseignees]
+        placees = (lat >= -90) & (lat <= 90) & (lon >= -180) & (lon <= 180)
+        self.add_values("cells", tile_numbers(lat[placees], lon[placees], self.tile_size), valeurs[placees], classes[placees])
+
+    def add_values(self, kind, keys, values, bins, labels=None):
+        """
+        Fonction : ajoute des valeurs aux groupes (jours ou tuiles) d'une statistique.
+
+        Arguments :
+        - kind : "daily" ou "cells"
+        - keys : numéro du groupe de chaque valeur (négatif : valeur ignorée)
+        - values : valeurs
+        - bins : classe de l'histogramme de chaque valeur
+        - labels (par défaut : None) : nom de chaque numéro de groupe (par défaut le numéro lui-même)
+        """
+        import pandas as pd
+
+        garder = keys >= 0
+        if not garder.any():
+            return
+        frame = pd.DataFrame({"k": keys[garder], "b": bins[garder], "v": values[garder]})
+        groupes = self.groups[kind]
+        noms = {}
+        for numero, n, somme, minimum, maximum in frame.groupby("k")["v"].agg(["size", "sum", "min", "max"]).itertuples():
+            cle = noms[numero] = str(numero if labels is None else labels[numero])
+            groupe = groupes.get(cle)
+            if groupe is None:
+                groupes[cle] = {"n": int(n), "s": float(somme), "min": float(minimum), "max": float(maximum), "h": {}}
+            else:
+                groupe["n"] += int(n)
+                groupe["s"] += float(somme)
+                groupe["min"] = min(groupe["min"], float(minimum))
+                groupe["max"] = max(groupe["max"], float(maximum))
+        for (numero, b), n in frame.groupby(["k", "b"]).size().items():
+            histogramme = groupes[noms[numero]]["h"]
+            histogramme[str(b)] = histogramme.get(str(b), 0) + int(n)
+
+    def state(self):
+        """
+        Fonction : état cumulable, à publier pour les actualisations incrémentales.
+        """
+        return {"tile_size": self.tile_size, "bins_per_decade": self.bins_per_decade,
+                **self.groups, **self.counts}
+
+    def tables(self, generated):
+        """
+        Fonction : tables de statistiques publiées (une par type de STATS_KINDS).
+
+        Arguments :
+        - generated : date de l'actualisation (texte ISO)
+
+        Renvoie :
+        - tables : dictionnaire type -> table {"generated", ..., "rows": [...]}
+        """
+        def resume(groupe):
+            # Minimum et maximum arrondis comme dans les fichiers JSON (to_json : 10 décimales)
+            return {"count": groupe["n"], "mean": round(groupe["s"] / groupe["n"], 6),
+                    "min": round(groupe["min"], 10), "max": round(groupe["max"], 10), **percentiles_of(groupe, self.bins_per_decade)}
+
+        precision = round(10 ** (1 / self.bins_per_decade) - 1, 4)
+        tables = {
+            "daily": {"generated": generated, "percentile_precision": precision,
+                      "rows": [{"day": jour, **resume(g)} for jour, g in sorted(self.groups["daily"].items())]},
+            "cells": {"generated": generated, "percentile_precision": precision, "tile_size": self.tile_size,
+                      "rows": [{"tile": int(tuile), "bbox": list(tile_bounds(int(tuile), self.tile_size)), **resume(g)}
+                               for tuile, g in sorted(self.groups["cells"].items(), key=lambda item: int(item[0]))]},
+        }
+        for kind, colonne in COUNT_COLUMNS.items():
+            lignes = sorted(self.counts[kind].items(), key=lambda item: (-item[1][0], item[0]))
+            tables[kind] = {"generated": generated,
+                            "rows": [{colonne: ident, "count": n, "first_day": premier, "last_day": dernier}
+                                     for ident, (n, premier, dernier) in lignes]}
+        return tables
+
+def select_rows(kind, table, args):
+    """
+    Fonction : lignes d'une table de statistiques retenues par les paramètres d'une requête :
+    from/to (daily), bbox (cells), apparatusId/deviceUuid (plusieurs valeurs séparées par des virgules) et limit.
+
+    Arguments :
+    - kind : type de la table (voir STATS_KINDS)
+    - table : table publiée
+    - args : paramètres de la requête
+
+    Renvoie :
+    - rows : lignes retenues
+
+    Lève :
+    - ValueError si un paramètre est invalide
+    """
+    rows = table["rows"]
+    if kind == "daily" and (args.get("from") or args.get("to")):
+        lower, upper = parse_date_bounds(args.get("from"), args.get("to"))
+        # Une journée est retenue si une partie de la journée est dans la fenêtre de /api/data (voir time_index.in_bounds) :
+        # son début est comparé à la borne supérieure au même format ("AAAA-MM-JJTHH:MM:SS")
+        rows = [row for row in rows if (lower is None or row["day"] >= lower[:10])
+                and (upper is None or row["day"] + "T00:00:00" < upper)]
+    if kind == "cells" and args.get("bbox"):
+        min_lon, min_lat, max_lon, max_lat = parse_bbox(args["bbox"])
+
+        def touche(row):
+            t_min_lon, t_min_lat, t_max_lon, t_max_lat = row["bbox"]
+            if t_max_lat < min_lat or t_min_lat > max_lat:
+                return False
+            if min_lon <= max_lon:
+                return t_max_lon >= min_lon and t_min_lon <= max_lon
+            return t_max_lon >= min_lon or t_min_lon <= max_lon # Emprise traversant l'antiméridien
+
+        rows = [row for row in rows if touche(row)]
+    if kind in COUNT_COLUMNS and args.get(COUNT_COLUMNS[kind]):
+        colonne = COUNT_COLUMNS[kind]
+        valeurs = {v.strip().lower() for v in args[colonne].split(",") if v.strip()} # Identifiants en minuscules dans les tables
+        rows = [row for row in rows if row[colonne] in valeurs]
+    if args.get("limit"):
+        limit = int(args["limit"])
+        if limit < 1:
+            raise ValueError("limit doit être positif")
+        rows = rows[:limit]
+    return rows
+
+def read_state_s3(s3, bucket):
+    """
+    Fonction : récupère l'état cumulable publié par la dernière actualisation.
+
+    Renvoie :
+    - state : l'état, ou None s'il n'existe pas
+    """
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=STATS_STATE_KEY)['Body'].read())
+    except ClientError:
+        return None
@@ -6,12 +6,25 @@
 
 # Chargement des librairies
 import pandas as pd
-import boto3
+from s3_client import get_s3_client, get_transfer_config
 from pathlib import Path
 import os
 from logger_write import log_memory_usage
-from actualisation_donnees import convert_to_json
-from io import BytesIO, StringIO
+from actualisation_donnees import (convert_to_json, serialize_pool, profile_chunk, profile_dtypes, merge_profiles, load_manifest,
+                                   save_download_state_s3, UNCHANGED_FLAG, CHUNK_ROWS, S3_PROFILE_NAME, S3_DELTA_NAME, S3_MANIFEST_NAME, LOOKBACK_DAYS)
+from time_index import write_time_index, build_time_index, prepend_time_index
+from tile_index import build_tile_file, write_tile_index
+from content_encoding import available_encodings, compress_file, VARIANT_SUFFIXES
+from schema import apply_schema, restore_categories, to_jsonl
+from stats_tables import StatsAccumulator, read_state_s3, stats_key, STATS_KINDS, STATS_STATE_KEY
+from parquet_store import write_parquet_table, build_index, prepend_rows, index_key, partition_path, PARQUET_PREFIX
+from lookup_db import build_lookup_db, update_lookup_db, LOOKUP_DB_KEY
+from join_table import JoinEncoder, core_jsonl, read_join_s3, CORE_TABLE, JOIN_KEY
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+import json
+import sys
 
 # Création du cache
 LOCAL_DIR = Path("cache") # Dossier cache
@@ -21,57 +34,133 @@ S3_MEASUREMENTS = "data/measurements.jsonl"
 S3_DEVICE = "data/devices.jsonl"
 S3_APPARATUS = "data/apparatus.jsonl"
 S3_FLIGHT = "data/flight.jsonl"
+S3_OBJECT_INDEX = "data/openradiation.index.json" # Index temporel (date -> octets) des mesures détaillées
+S3_MEASUREMENTS_INDEX = "data/measurements.index.json" # Index temporel (date -> octets) des mesures
+S3_TILES = "data/measurements_tiles.jsonl" # Mesures triées par tuile de la grille (actualisation complète)
+S3_TILES_DELTA = "data/measurements_tiles_delta.jsonl" # Mesures ajoutées depuis, triées par tuile
+S3_TILES_INDEX = "data/measurements_tiles.index.json" # Index spatial (tuile -> octets) des deux fichiers précédents
+S3_CORE = f"data/{CORE_TABLE}.jsonl" # Mesures détaillées sans les colonnes des appareils et des vols (voir join_table.py)
+S3_CORE_INDEX = f"data/{CORE_TABLE}.index.json" # Index temporel (date -> octets) du fichier précédent
 MEASUREMENTS_FILE = LOCAL_DIR / "measurements.jsonl" # les mesures obtenus
 DEVICE_FILE = LOCAL_DIR / "devices.jsonl" # les appareils de renseignements
 APPARATUS_FILE = LOCAL_DIR / "apparatus.jsonl" # les appareils de mesures
 FLIGHT_FILE = LOCAL_DIR / "flight.jsonl" # les vols concernés
 ALL_FILE = LOCAL_DIR / "openradiation.jsonl" # les mesures obtenus avec tous le détails pour chaque ligne
+SOURCE_FILE = LOCAL_DIR / "openradiation_source.jsonl" # copie locale du fichier JSON brut récupéré du S3
+DELTA_SOURCE_FILE = LOCAL_DIR / "openradiation_delta_source.jsonl" # copie locale des nouvelles lignes (mode incrémental)
+MANIFEST_FILE = LOCAL_DIR / "manifest.json" # copie locale du manifeste de la dernière actualisation
+ALL_INDEX_FILE = LOCAL_DIR / "openradiation.index.json" # index temporel des mesures détaillées
+MEASUREMENTS_INDEX_FILE = LOCAL_DIR / "measurements.index.json" # index temporel des mesures
+TIME_INDEX_GRANULARITY = os.environ.get("TIME_INDEX_GRANULARITY", "day") # "day" ou "month"
+TILES_FILE = LOCAL_DIR / "measurements_tiles.jsonl" # mesures triées par tuile
+TILES_DELTA_FILE = LOCAL_DIR / "measurements_tiles_delta.jsonl" # nouvelles mesures triées par tuile
+TILES_DELTA_SOURCE_FILE = LOCAL_DIR / "measurements_tiles_delta_source.jsonl" # copie locale du fichier précédent
+TILES_INDEX_FILE = LOCAL_DIR / "measurements_tiles.index.json" # index spatial
+TILE_SIZE_DEG = float(os.environ.get("TILE_SIZE_DEG", 1.0)) # taille des tuiles de la grille en degrés
+PARQUET_MODE = os.environ.get("PARQUET_MODE", "true").lower() == "true" # jeux Parquet des tables en plus des fichiers JSON
+PARQUET_DIR = LOCAL_DIR / "parquet" # jeux Parquet des tables
+PARQUET_DELTA_DIR = LOCAL_DIR / "parquet_delta" # nouvelles lignes par partition (mode incrémental)
+COMPRESSED_VARIANTS = os.environ.get("COMPRESSED_VARIANTS", "true").lower() == "true" # variantes gzip/zstd des tables JSON
+STATS_MODE = os.environ.get("STATS_MODE", "true").lower() == "true" # statistiques précalculées des mesures (/api/stats)
+STATS_DIR = LOCAL_DIR / "stats" # tables de statistiques
+LOOKUP_DB_MODE = os.environ.get("LOOKUP_DB_MODE", "true").lower() == "true" # base SQLite des recherches par identifiant (/api/<table>/<id>)
+LOOKUP_DB_FILE = LOCAL_DIR / "openradiation.sqlite" # base des recherches par identifiant
+JOIN_MODE = os.environ.get("OPENRADIATION_JOIN", "true").lower() == "true" # table détaillée reconstruite par l'API au lieu d'être publiée en entier
+CORE_FILE = LOCAL_DIR / f"{CORE_TABLE}.jsonl" # mesures détaillées sans les colonnes des appareils et des vols
+CORE_INDEX_FILE = LOCAL_DIR / f"{CORE_TABLE}.index.json" # index temporel du fichier précédent
+JOIN_FILE = LOCAL_DIR / "openradiation.join.json" # références des appareils et des vols
+
+# Tables converties en jeux Parquet
+PARQUET_TABLES = {"measurements": MEASUREMENTS_FILE, "devices": DEVICE_FILE, "apparatus": APPARATUS_FILE,
+                  "flight": FLIGHT_FILE, "openradiation": ALL_FILE}
+
+# Fichiers des nouvelles lignes de chaque table (mode incrémental)
+DELTA_FILES = {
+    "measurements": LOCAL_DIR / "measurements_delta.jsonl",
+    "devices": LOCAL_DIR / "devices_delta.jsonl",
+    "apparatus": LOCAL_DIR / "apparatus_delta.jsonl",
+    "flight": LOCAL_DIR / "flight_delta.jsonl",
+    "openradiation": LOCAL_DIR / "openradiation_delta.jsonl",
+    CORE_TABLE: LOCAL_DIR / "openradiation_core_delta.jsonl",
+}
+
+# Téléversement multipart : taille minimale d'une partie et taille maximale d'une copie côté serveur
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_COPY_PART_SIZE = 5 * 1024 ** 3
+
+# Découpage en streaming (une seule lecture du fichier, mémoire bornée par la taille d'un morceau)
+STREAMING_MODE = os.environ.get("STREAMING_MODE", "true").lower() == "true"
+
+# Publications indépendantes (tables, variantes, index, statistiques, Parquet) faites en même temps.
+# La compression et la conversion Parquet occupent un cœur chacune : au-delà du nombre de cœurs, elles ne font que
+# se ralentir et additionner leur mémoire
+PUBLISH_WORKERS = int(os.environ.get("PUBLISH_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Colonnes de chaque table
+MEASUREMENTS_COLUMNS = ["reportUuid", "apparatusId", "temperature", "value", "hitsNumber",
+                        "startTime", "endTime", "latitude", "longitude", "deviceUuid", "userId",
+                        "measurementEnvironment", "rain", "storm", "flightId", "dateAndTimeOfCreation"]
+DEVICE_COLUMNS = ["deviceUuid", "devicePlatform", "deviceVersion", "deviceModel"]
+APPARATUS_COLUMNS = ["apparatusId", "apparatusVersion", "apparatusSensorType", "apparatusTubeType"]
+FLIGHT_COLUMNS = ["flightId", "flightNumber", "seatNumber", "windowSeat",
+                  "departureTime", "arrivalTime", "airportOrigin", "airportDestination",
+                  "aircraftType"]
 
 ## Création des différentes fct pour créer les 4 tables ################################# 
-def read_json_s3():
+def read_json_s3(chunksize=CHUNK_ROWS):
     """
-    Fonction : permet de lire le fichier JSON contenant toutes les informations concernant les mesures
+    Fonction : permet de lire le fichier JSON contenant toutes les informations concernant les mesures.
+    Le fichier est téléchargé sur le disque puis lu par morceaux (voir read_json_file).
+
+    Arguments :
+    - chunksize (par défaut : CHUNK_ROWS) : nombre de lignes par morceau
 
     Renvoie :
     - df : renvoie le DataFrame contenant ces données
     """
 
-    #nrows = 10000
+    download_json_s3()
+    return read_json_file(SOURCE_FILE, read_profile_s3(), chunksize)
 
-    # Client du S3 d'AWS
-    s3 = boto3.client("s3",
-                      aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-                      aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
-                      region_name=os.environ['AWS_REGION'])
-    
-    # Récupérer les données JSON en question
-    response = s3.get_object(Bucket=bucket_name, Key=S3_OBJECT_NAME)
-
-    # Lire seulement les N premières lignes
-    #lines = []
-    #for i, line in enumerate(response['Body'].iter_lines()):
-    #    if i >= nrows:
-    #        break
-    #    lines.append(line.decode('utf-8'))
-    
-    # Charger en DataFrame
-    #df = pd.read_json(StringIO("\n".join(lines)), lines=True)
+def read_json_file(path=SOURCE_FILE, profile=None, chunksize=CHUNK_ROWS):
+    """
+    Fonction : permet de lire un fichier JSON local des mesures par morceaux, chacun passé au schéma compact avant
+    d'être gardé : la mémoire n'a jamais à contenir tout le fichier en objets Python.
+
+    Arguments :
+    - path (par défaut : SOURCE_FILE) : chemin du fichier JSON brut
+    - profile (par défaut : None) : profil des colonnes du fichier (calculé s'il est absent ou ne correspond pas)
+    - chunksize (par défaut : CHUNK_ROWS) : nombre de lignes par morceau
 
-    # Lecture sous pandas
-    df = pd.read_json(BytesIO(response['Body'].read()), lines=True)
+    Renvoie :
+    - df : renvoie le DataFrame contenant ces données
+    """
 
-    # Nettoyages des ID
-    df["deviceUuid"] = df["deviceUuid"].str.lower()
-    df["deviceUuid"] = df["deviceUuid"].str.replace('"', '', regex=False)
-    df["deviceUuid"] = df["deviceUuid"].replace('', None)
-    df["deviceUuid"] = df["deviceUuid"].str.strip()
-    df["apparatusId"] = df["apparatusId"].str.lower()
-    df["apparatusId"] = df["apparatusId"].str.replace('"', '', regex=False)
-    df["apparatusId"] = df["apparatusId"].replace('', None)
-    df["apparatusId"] = df["apparatusId"].str.strip()
-    df["flightId"] = df["flightId"].astype("Int64")
+    # Types des colonnes identiques à ceux d'une lecture du fichier entier
+    profile = ensure_profile(path, profile, chunksize)
+    dtypes = profile_dtypes(profile["columns"])
 
-    return df
+    # Lecture sous pandas, morceau par morceau
+    with pd.read_json(path, lines=True, chunksize=chunksize, dtype=dtypes) as reader:
+        morceaux = [clean_ids(chunk) for chunk in reader]
+    df = pd.concat(morceaux, ignore_index=True) if morceaux else clean_ids(pd.DataFrame(columns=list(dtypes)))
+
+    return restore_categories(df)
+
+def clean_ids(df):
+    """
+    Fonction : permet de nettoyer les identifiants des appareils et des vols, et de passer les colonnes
+    aux types compacts du schéma commun (voir schema.py)
+
+    Arguments :
+    - df : DataFrame (ou morceau) contenant les mesures
+
+    Renvoie :
+    - df : le DataFrame nettoyé
+    """
+
+    # Nettoyage des ID en une passe (une fois par valeur distincte) et types compacts
+    return apply_schema(df)
 
 def create_measurements_table(df):
     """
@@ -81,14 +170,8 @@ def create_measurements_table(df):
     - df_measurements : renvoie le DataFrame contenant seulement les informations concernant ces mesures
     """
 
-    # Sélection des colonnes
-    df_measurements = df[["reportUuid", "apparatusId", "temperature", "value", "hitsNumber", 
-                    "startTime", "endTime", "latitude", "longitude", "deviceUuid", "userId", 
-                    "measurementEnvironment", "rain", "storm", "flightId", "dateAndTimeOfCreation"]]
-
-    # Remplir les valeurs nulles par 0
-    df_measurements["rain"] = df_measurements["rain"].fillna(0)  
-    df_measurements["storm"] = df_measurements["storm"].fillna(0)
+    # Sélection des colonnes et valeurs nulles remplies par 0 (nouvelles colonnes, sans modifier une copie de df)
+    df_measurements = df[MEASUREMENTS_COLUMNS].assign(rain=df["rain"].fillna(0), storm=df["storm"].fillna(0))
 
     return df_measurements
 
@@ -101,7 +184,7 @@ def create_device_table(df):
     """
 
     # Sélection des colonnes
-    df_device = df[["deviceUuid", "devicePlatform", "deviceVersion", "deviceModel"]]
+    df_device = df[DEVICE_COLUMNS]
 
     # Enlever les lignes NA de la colonne devieUuid
     df_device = df_device.dropna(subset=["deviceUuid"])
@@ -120,7 +203,7 @@ def create_apparatus_table(df):
     """
 
     # Sélection des colonnes
-    df_apparatus = df[["apparatusId", "apparatusVersion", "apparatusSensorType", "apparatusTubeType"]]
+    df_apparatus = df[APPARATUS_COLUMNS]
 
     # Enlever les lignes NA de la colonne devieUuid
     df_apparatus = df_apparatus.dropna(subset=["apparatusId"])
@@ -139,9 +222,7 @@ def create_flight_table(df):
     """
 
     # Sélection des colonnes
-    df_flight = df[["flightId", "flightNumber", "seatNumber", "windowSeat", 
-                    "departureTime", "arrivalTime", "airportOrigin", "airportDestination",
-                    "aircraftType"]]
+    df_flight = df[FLIGHT_COLUMNS]
     
     # Enlever les lignes manquantes
     df_flight = df_flight.dropna(subset=["flightId"])
@@ -150,17 +231,258 @@ def create_flight_table(df):
     df_flight = df_flight.drop_duplicates(subset=["flightId"])
     
     # Transformer la colonne windowSeat en integer
-    df_flight["windowSeat"] = df_flight["windowSeat"].astype("Int64")
+    df_flight = df_flight.assign(windowSeat=df_flight["windowSeat"].astype("Int8"))
 
     return df_flight
 
-def upload_to_s3(path_fichier, path_s3):
+def download_json_s3(path=SOURCE_FILE, path_s3=S3_OBJECT_NAME):
+    """
+    Fonction : permet de télécharger le fichier JSON contenant toutes les mesures sur le disque, sans le garder en mémoire
+
+    Arguments :
+    - path (par défaut : SOURCE_FILE) : chemin local où enregistrer le fichier
+    - path_s3 (par défaut : S3_OBJECT_NAME) : chemin du fichier dans le S3
+
+    Renvoie :
+    - path : le chemin du fichier téléchargé
+    """
+
+    msg = f"Téléchargement de {bucket_name}/{path_s3} vers {path}..."
+    log_memory_usage(msg)
+    print(msg)
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+
+    # Téléchargement en streaming vers le disque
+    s3.download_file(bucket_name, path_s3, str(path), Config=get_transfer_config())
+
+    return path
+
+def read_profile_s3():
+    """
+    Fonction : permet de récupérer le profil des colonnes généré par actualisation_donnees.py
+
+    Renvoie :
+    - profile : le profil (dictionnaire) ou None s'il n'existe pas
+    """
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+
+    try:
+        response = s3.get_object(Bucket=bucket_name, Key=S3_PROFILE_NAME)
+    except ClientError:
+        return None
+
+    return json.loads(response['Body'].read())
+
+def profile_jsonl(path, chunksize=CHUNK_ROWS):
+    """
+    Fonction : permet de calculer le profil des colonnes d'un fichier JSON quand il n'a pas été fourni (lecture supplémentaire)
+
+    Arguments :
+    - path : chemin du fichier JSON
+    - chunksize (par défaut : CHUNK_ROWS) : nombre de lignes par morceau
+
+    Renvoie :
+    - profile : le profil des colonnes
+    """
+
+    msg = "Profil des colonnes absent ou obsolète, calcul à partir du fichier JSON..."
+    log_memory_usage(msg)
+    print(msg)
+
+    profile = {}
+    nb_lignes = 0
+    with pd.read_json(path, lines=True, chunksize=chunksize) as reader:
+        for chunk in reader:
+            profile_chunk(chunk, profile)
+            nb_lignes += len(chunk)
+
+    return {"rows": nb_lignes, "columns": profile}
+
+def ensure_profile(path, profile=None, chunksize=CHUNK_ROWS):
+    """
+    Fonction : vérifie que le profil décrit bien le fichier JSON donné, et le recalcule sinon
+
+    Arguments :
+    - path : chemin du fichier JSON
+    - profile (par défaut : None) : profil fourni par actualisation_donnees.py
+    - chunksize (par défaut : CHUNK_ROWS) : nombre de lignes par morceau en cas de recalcul
+
+    Renvoie :
+    - profile : un profil valide pour ce fichier
+    """
+    if profile is None or profile.get("rows") != count_lines(path):
+        profile = profile_jsonl(path, chunksize)
+    return profile
+
+def track_watermark(watermark: dict, chunk, lookback_days=LOOKBACK_DAYS):
+    """
+    Fonction : met à jour la date maximale et les reportUuid récents (fenêtre de rattrapage) avec un morceau de mesures
+
+    Arguments :
+    - watermark : dictionnaire {"max_date": date ISO ou None, "recent": {reportUuid: date ISO}} (modifié sur place)
+    - chunk : morceau de mesures
+    - lookback_days (par défaut : LOOKBACK_DAYS) : taille de la fenêtre de rattrapage en jours
+    """
+
+    dates = pd.to_datetime(chunk["dateAndTimeOfCreation"], utc=True, errors="coerce", format="ISO8601")
+    chunk_max = dates.max()
+    if pd.notna(chunk_max) and (watermark["max_date"] is None or chunk_max > pd.Timestamp(watermark["max_date"])):
+        watermark["max_date"] = chunk_max.isoformat()
+    if watermark["max_date"] is None:
+        return
+
+    # Seuls les reportUuid de la fenêtre de rattrapage sont conservés
+    limite = pd.Timestamp(watermark["max_date"]) - pd.Timedelta(days=lookback_days)
+    mask = dates > limite
+    for uuid, date in zip(chunk.loc[mask, "reportUuid"], dates[mask]):
+        watermark["recent"][uuid] = date.isoformat()
+
+def save_manifest(columns: dict, watermark: dict, rows: int, last_full_refresh: str, lookback_days=LOOKBACK_DAYS):
+    """
+    Fonction : enregistre et téléverse le manifeste de l'actualisation, utilisé au prochain passage incrémental
+
+    Arguments :
+    - columns : profil des colonnes de toutes les données publiées
+    - watermark : date maximale et reportUuid récents (voir track_watermark)
+    - rows : nombre total de mesures publiées
+    - last_full_refresh : date ISO de la dernière actualisation complète
+    - lookback_days (par défaut : LOOKBACK_DAYS) : taille de la fenêtre de rattrapage en jours
+    """
+
+    # On ne garde que les reportUuid encore dans la fenêtre de rattrapage
+    recent = watermark["recent"]
+    if watermark["max_date"] is not None:
+        limite = pd.Timestamp(watermark["max_date"]) - pd.Timedelta(days=lookback_days)
+        recent = {uuid: date for uuid, date in recent.items() if pd.Timestamp(date) > limite}
+
+    manifest = {"max_date": watermark["max_date"], "recent": recent, "lookback_days": lookback_days,
+                "rows": rows, "last_full_refresh": last_full_refresh, "columns": columns}
+    contenu = json.dumps(manifest)
+    MANIFEST_FILE.write_text(contenu, encoding="utf-8")
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+    s3.put_object(Bucket=bucket_name, Key=S3_MANIFEST_NAME, Body=contenu.encode("utf-8"))
+
+    msg = f"Manifeste enregistré : date maximale {watermark['max_date']}, {rows} mesures"
+    log_memory_usage(msg)
+    print(msg)
+
+def count_lines(path):
+    """
+    Fonction : compte le nombre de lignes non vides d'un fichier JSON (lecture binaire, sans décodage)
+    """
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+def split_tables_streaming(path=SOURCE_FILE, profile=None, chunksize=CHUNK_ROWS, outputs=None, watermark=None, stats=None,
+                           executor=None, join=None):
+    """
+    Fonction : permet de créer les cinq tables en une seule lecture du fichier JSON, morceau par morceau.
+    Chaque morceau est envoyé vers les cinq fichiers en même temps, et les tables des appareils et des vols
+    sont dédoublonnées à l'aide des seuls identifiants déjà rencontrés.
+    Le résultat est identique à celui de read_json_s3() + create_*_table() + convert_to_json().
+
+    Arguments :
+    - path (par défaut : SOURCE_FILE) : chemin du fichier JSON brut
+    - profile (par défaut : None) : profil des colonnes du fichier (calculé s'il est absent ou ne correspond pas)
+    - chunksize (par défaut : CHUNK_ROWS) : nombre de lignes par morceau
+    - outputs (par défaut : None) : chemins des fichiers de sortie par table (par défaut les fichiers du cache)
+    - watermark (par défaut : None) : date maximale et reportUuid récents à mettre à jour (voir track_watermark)
+    - stats (par défaut : None) : statistiques des mesures à compléter avec chaque morceau (voir stats_tables.StatsAccumulator)
+    - executor (par défaut : None) : groupe de processus (voir serialize_pool) : les tables d'un morceau y sont converties
+      en JSON pendant la lecture du morceau suivant
+    - join (par défaut : None) : références des appareils et des vols (voir join_table.JoinEncoder) : la table détaillée
+      est alors aussi écrite sans leurs colonnes (table openradiation_core de outputs), et la table openradiation
+      seulement si outputs la contient
+
+    Renvoie :
+    - compteurs : nombre de lignes de chaque table
+    """
+
+    # Le profil doit décrire exactement ce fichier, sinon on le recalcule
+    profile = ensure_profile(path, profile, chunksize)
+
+    if outputs is None:
+        outputs = {"measurements": MEASUREMENTS_FILE, "devices": DEVICE_FILE, "apparatus": APPARATUS_FILE,
+                   "flight": FLIGHT_FILE, "openradiation": ALL_FILE}
+
+    # Types de la lecture complète : chaque morceau est lu avec les mêmes types que le fichier entier
+    dtypes = profile_dtypes(profile["columns"])
+
+    msg = f"Découpage en streaming des tables (morceaux de {chunksize} lignes)..."
+    log_memory_usage(msg)
+    print(msg)
+
+    # Identifiants déjà écrits dans les tables des appareils et des vols
+    seen = {"deviceUuid": set(), "apparatusId": set(), "flightId": set()}
+    compteurs = {"measurements": 0, "devices": 0, "apparatus": 0, "flight": 0, "openradiation": 0}
+
+    with ExitStack() as stack:
+        fichiers = {name: stack.enter_context(open(path_out, "w", encoding="utf-8")) for name, path_out in outputs.items()}
+        reader = stack.enter_context(pd.read_json(path, lines=True, chunksize=chunksize, dtype=dtypes))
+        en_cours = [] # Conversions du morceau précédent (avec un groupe de processus)
+
+        for chunk in reader:
+            chunk = clean_ids(chunk)
+            if watermark is not None:
+                track_watermark(watermark, chunk)
+
+            # Tables des appareils et des vols : on ne garde que les identifiants jamais rencontrés
+            tables = {}
+            for name, key, create in (("devices", "deviceUuid", create_device_table),
+                                      ("apparatus", "apparatusId", create_apparatus_table),
+                                      ("flight", "flightId", create_flight_table)):
+                table = create(chunk)
+                table = table[~table[key].isin(seen[key])]
+                seen[key].update(table[key].tolist())
+                tables[name] = table
+
+            tables["measurements"] = create_measurements_table(chunk)
+            tables["openradiation"] = chunk
+            if stats is not None:
+                stats.add(tables["measurements"])
+
+            for name in compteurs:
+                compteurs[name] += len(tables[name])
+
+            # Conversion de chaque table écrite : fonction et arguments
+            conversions = {name: (to_jsonl, tables[name]) for name in tables if name in fichiers and not tables[name].empty}
+            if join is not None and not chunk.empty:
+                conversions[CORE_TABLE] = (core_jsonl, chunk, join.add(chunk))
+
+            if executor is None:
+                for name, (convertir, *args) in conversions.items():
+                    fichiers[name].write(convertir(*args))
+                continue
+
+            # Les tables du morceau précédent sont écrites une fois celles-ci envoyées à la conversion
+            precedents = en_cours
+            en_cours = [(fichiers[name], executor.submit(convertir, *args)) for name, (convertir, *args) in conversions.items()]
+            for f, conversion in precedents:
+                f.write(conversion.result())
+
+        for f, conversion in en_cours:
+            f.write(conversion.result())
+
+    msg = f"Découpage terminé : {compteurs}"
+    log_memory_usage(msg)
+    print(msg)
+
+    return compteurs
+
+def upload_to_s3(path_fichier, path_s3, extra_args=None):
     """
     Fonction : Téléversement d'un fichier JSON vers le S3
 
     Arguments :
     - path_fichier : chemin du fichier JSON à trouver
     - path_s3 : chemin du fichier à téléverser vers le S3
+    - extra_args (par défaut : None) : paramètres de l'objet (ex : ContentType, ContentEncoding)
     """
 
     msg = f"Téléversement vers S3 ({bucket_name}/{path_s3})..."
@@ -168,25 +490,564 @@ def upload_to_s3(path_fichier, path_s3):
     print(msg)
 
     # Client du S3 d'AWS
-    s3 = boto3.client("s3",
-                      aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-                      aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
-                      region_name=os.environ['AWS_REGION'])
+    s3 = get_s3_client()
 
-    # Téléversement du fichier
-    with open(path_fichier, "rb") as f:
-        s3.upload_fileobj(f, bucket_name, path_s3)
+    # Téléversement du fichier (en parties lues sur le disque au fur et à mesure pour les gros fichiers)
+    s3.upload_file(str(path_fichier), bucket_name, path_s3, ExtraArgs=extra_args, Config=get_transfer_config())
     
     msg = "Fichier envoyé avec succès sur S3."
     log_memory_usage(msg)
     print(msg)
-#########################################################################################
 
-# Application des différentes étapes
-if __name__=="__main__":
+def prepend_to_s3(path_fichier, path_s3, extra_args=None):
+    """
+    Fonction : Ajoute les lignes d'un fichier JSON au début d'un fichier déjà présent dans le S3, en ne téléversant
+    que les nouvelles lignes (et les premiers 5 MB de l'ancien fichier) : le reste est copié côté serveur par le S3.
+
+    Arguments :
+    - path_fichier : chemin du fichier JSON contenant les nouvelles lignes
+    - path_s3 : chemin du fichier à compléter dans le S3
+    - extra_args (par défaut : None) : paramètres de l'objet réécrit (ex : ContentType, ContentEncoding)
+    """
+
+    msg = f"Ajout des nouvelles lignes au début de {bucket_name}/{path_s3}..."
+    log_memory_usage(msg)
+    print(msg)
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+
+    head = s3.head_object(Bucket=bucket_name, Key=path_s3)
+    size, etag = head["ContentLength"], head["ETag"]
+    with open(path_fichier, "rb") as f:
+        nouvelles = f.read()
+
+    # Petit fichier : on le réécrit simplement en entier
+    if size <= MIN_PART_SIZE:
+        ancien = s3.get_object(Bucket=bucket_name, Key=path_s3, IfMatch=etag)["Body"].read()
+        s3.put_object(Bucket=bucket_name, Key=path_s3, Body=nouvelles + ancien, **(extra_args or {}))
+        return
+
+    # Toutes les parties sauf la dernière doivent faire au moins 5 MB : la première contient les nouvelles lignes
+    # suivies du début de l'ancien fichier, les suivantes sont des copies côté serveur de la suite
+    debut = s3.get_object(Bucket=bucket_name, Key=path_s3, IfMatch=etag,
+                          Range=f"bytes=0-{MIN_PART_SIZE - 1}")["Body"].read()
+    upload_id = s3.create_multipart_upload(Bucket=bucket_name, Key=path_s3, **(extra_args or {}))["UploadId"]
+    try:
+        response = s3.upload_part(Bucket=bucket_name, Key=path_s3, UploadId=upload_id,
+                                  PartNumber=1, Body=nouvelles + debut)
+        parts = [{"ETag": response["ETag"], "PartNumber": 1}]
+
+        start = MIN_PART_SIZE
+        while start < size:
+            end = min(start + MAX_COPY_PART_SIZE, size) - 1
+            number = len(parts) + 1
+            response = s3.upload_part_copy(Bucket=bucket_name, Key=path_s3, UploadId=upload_id, PartNumber=number,
+                                           CopySource={"Bucket": bucket_name, "Key": path_s3},
+                                           CopySourceRange=f"bytes={start}-{end}", CopySourceIfMatch=etag)
+            parts.append({"ETag": response["CopyPartResult"]["ETag"], "PartNumber": number})
+            start = end + 1
+
+        s3.complete_multipart_upload(Bucket=bucket_name, Key=path_s3, UploadId=upload_id,
+                                     MultipartUpload={"Parts": parts})
+    except Exception:
+        s3.abort_multipart_upload(Bucket=bucket_name, Key=path_s3, UploadId=upload_id)
+        raise
+
+    msg = f"{len(nouvelles)} octets ajoutés, {size - MIN_PART_SIZE} octets copiés côté serveur."
+    log_memory_usage(msg)
+    print(msg)
+
+def publish_variants(path_fichier, path_s3, prepend=False):
+    """
+    Fonction : Compresse une table JSON en gzip (et zstd si disponible) et téléverse ces variantes à côté du fichier
+    (data/<type>.jsonl.gz, data/<type>.jsonl.zst), servies telles quelles par l'API aux clients qui les acceptent.
+    En mode incrémental, les nouvelles lignes compressées sont ajoutées au début de la variante : un fichier gzip
+    peut contenir plusieurs membres et un fichier zstd plusieurs trames, décompressés à la suite.
+
+    Arguments :
+    - path_fichier : chemin du fichier JSON (table complète, ou nouvelles lignes si prepend)
+    - path_s3 : chemin de la table JSON dans le S3
+    - prepend (par défaut : False) : ajoute les lignes au début des variantes au lieu de les remplacer
+    """
+
+    if not COMPRESSED_VARIANTS:
+        return
+
+    taille = os.path.getsize(path_fichier)
+    for encoding in available_encodings():
+        suffixe = VARIANT_SUFFIXES[encoding]
+        path_variante = Path(f"{path_fichier}{suffixe}")
+        taille_variante = compress_file(path_fichier, path_variante, encoding)
+
+        msg = f"Variante {encoding} de {path_fichier} : {taille_variante} octets ({taille_variante / max(taille, 1):.1%})"
+        log_memory_usage(msg)
+        print(msg)
+
+        extra_args = {"ContentType": "application/json", "ContentEncoding": encoding}
+        if not prepend:
+            upload_to_s3(path_variante, path_s3 + suffixe, extra_args)
+            continue
+        try:
+            prepend_to_s3(path_variante, path_s3 + suffixe, extra_args)
+        except ClientError:
+            msg = f"Variante {path_s3 + suffixe} absente, elle sera reconstruite à la prochaine actualisation complète."
+            log_memory_usage(msg)
+            print(msg)
+
+def publish_table(path_fichier, path_s3):
+    """
+    Fonction : Téléverse une table JSON complète puis ses variantes compressées
+
+    Arguments :
+    - path_fichier : chemin du fichier JSON
+    - path_s3 : chemin de la table JSON dans le S3
+    """
+    upload_to_s3(path_fichier, path_s3)
+    publish_variants(path_fichier, path_s3)
+
+def export_table(df, path_fichier, path_s3, executor=None):
+    """
+    Fonction : Convertit une table en JSON puis la téléverse
+
+    Arguments :
+    - df : DataFrame de la table
+    - path_fichier : chemin du fichier JSON à écrire
+    - path_s3 : chemin de la table JSON dans le S3
+    - executor (par défaut : None) : groupe de processus pour la conversion (voir serialize_pool)
+    """
+    convert_to_json(df, path_fichier, executor)
+    upload_to_s3(path_fichier, path_s3)
+
+def run_parallel(tasks, workers=PUBLISH_WORKERS):
+    """
+    Fonction : Exécute des étapes de publication indépendantes en même temps, dans un groupe de fils
+    (elles attendent surtout le S3, et la compression libère le GIL)
+
+    Arguments :
+    - tasks : liste de (fonction, arguments...)
+    - workers (par défaut : PUBLISH_WORKERS) : nombre d'étapes exécutées en même temps
+
+    Lève :
+    - la première erreur rencontrée, une fois toutes les étapes terminées
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="publish") as executor:
+        futures = [executor.submit(fonction, *arguments) for fonction, *arguments in tasks]
+    for future in futures:
+        future.result()
+
+def merge_dimension_s3(path_delta, path_s3, key, path_fichier):
+    """
+    Fonction : Fusionne les nouvelles lignes d'une table d'appareils ou de vols avec celle du S3 et la téléverse.
+    Comme pour le calcul complet, la première occurrence l'emporte : les nouvelles lignes passent devant et
+    remplacent les anciennes lignes de même identifiant.
+
+    Arguments :
+    - path_delta : chemin du fichier JSON des nouvelles lignes de la table
+    - path_s3 : chemin de la table dans le S3
+    - key : colonne identifiant de la table
+    - path_fichier : chemin local de la table fusionnée
+    """
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
 
-    # Lecture des données
-    df = read_json_s3()
+    # Ces tables sont petites (une ligne par appareil ou par vol)
+    anciennes = s3.get_object(Bucket=bucket_name, Key=path_s3)["Body"].read().splitlines()
+    with open(path_delta, "rb") as f:
+        nouvelles = [line for line in f.read().splitlines() if line]
+    cles = {json.loads(line)[key] for line in nouvelles}
+
+    with open(path_fichier, "wb") as f:
+        for line in nouvelles:
+            f.write(line + b"\n")
+        for line in anciennes:
+            if line and json.loads(line)[key] not in cles:
+                f.write(line + b"\n")
+
+    upload_to_s3(path_fichier, path_s3)
+    publish_variants(path_fichier, path_s3)
+
+def publish_time_index(path_fichier, path_index, path_s3):
+    """
+    Fonction : Construit et téléverse l'index temporel d'une table des mesures, utilisé par l'API pour ne lire
+    que les octets d'une fenêtre de dates.
+
+    Arguments :
+    - path_fichier : chemin du fichier JSON de la table
+    - path_index : chemin local de l'index
+    - path_s3 : chemin de l'index dans le S3
+    """
+    index = write_time_index(path_fichier, path_index, TIME_INDEX_GRANULARITY)
+    msg = f"Index temporel de {path_fichier} : {len(index['ranges'])} périodes"
+    log_memory_usage(msg)
+    print(msg)
+    upload_to_s3(path_index, path_s3)
+
+def publish_time_indexes(detailed=True):
+    """
+    Fonction : Construit et téléverse les index temporels des tables des mesures (openradiation et measurements).
+
+    Arguments :
+    - detailed (par défaut : True) : inclure la table détaillée (publiée en entier)
+    """
+    if detailed:
+        publish_time_index(ALL_FILE, ALL_INDEX_FILE, S3_OBJECT_INDEX)
+    publish_time_index(MEASUREMENTS_FILE, MEASUREMENTS_INDEX_FILE, S3_MEASUREMENTS_INDEX)
+
+def publish_core(join, prepend=False):
+    """
+    Fonction : Publie la table détaillée sans les colonnes des appareils et des vols retirées par le découpage,
+    avec son index temporel et les références avec lesquelles l'API la reconstruit (voir join_table.py).
+    Les références sont publiées en premier : elles ne font que s'enrichir d'une actualisation à l'autre,
+    l'API peut donc toujours reconstruire les lignes du fichier publié.
+
+    Arguments :
+    - join : références des appareils et des vols (JoinEncoder)
+    - prepend (par défaut : False) : ajoute les nouvelles lignes au début du fichier publié au lieu de le remplacer
+    """
+
+    if join.restarted:
+        msg = "Colonnes de la table détaillée modifiées : les références des appareils et des vols repartent de zéro."
+        log_memory_usage(msg)
+        print(msg)
+
+    with open(JOIN_FILE, "w", encoding="utf-8") as f:
+        json.dump(join.state(), f, separators=(",", ":"))
+    upload_to_s3(JOIN_FILE, JOIN_KEY, {"ContentType": "application/json"})
+
+    if prepend:
+        prepend_to_s3(DELTA_FILES[CORE_TABLE], S3_CORE)
+        prepend_time_index_s3(DELTA_FILES[CORE_TABLE], CORE_INDEX_FILE, S3_CORE_INDEX)
+    else:
+        upload_to_s3(CORE_FILE, S3_CORE)
+        publish_time_index(CORE_FILE, CORE_INDEX_FILE, S3_CORE_INDEX)
+
+    msg = (f"Table détaillée publiée sans les colonnes des appareils et des vols ({join.stats['rows']} lignes), "
+           f"colonnes retirées : {', '.join(f'{key} {n}' for key, n in join.stats.items() if key != 'rows')}")
+    log_memory_usage(msg)
+    print(msg)
+
+def delete_objects(keys):
+    """
+    Fonction : Supprime du S3 des fichiers qui ne sont plus publiés (un fichier absent est ignoré).
+
+    Arguments :
+    - keys : chemins des fichiers dans le S3
+    """
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+
+    for key in keys:
+        s3.delete_object(Bucket=bucket_name, Key=key)
+
+def remove_other_detailed(joined):
+    """
+    Fonction : Supprime du S3 la forme de la table détaillée publiée par une actualisation précédente
+    qui n'est plus celle de cette actualisation (table entière et ses variantes, ou table sans les colonnes des appareils
+    et des vols et ses références). Les références sont supprimées en premier : l'API sert alors la table entière.
+
+    Arguments :
+    - joined : la table détaillée vient d'être publiée sans les colonnes des appareils et des vols
+    """
+    if joined:
+        delete_objects([S3_OBJECT_NAME, S3_OBJECT_INDEX] + [S3_OBJECT_NAME + suffixe for suffixe in VARIANT_SUFFIXES.values()])
+    else:
+        delete_objects([JOIN_KEY, S3_CORE, S3_CORE_INDEX])
+
+def publish_tile_index():
+    """
+    Fonction : Trie les mesures par tuile de la grille et téléverse ce fichier avec son index spatial,
+    utilisé par l'API pour ne lire que les tuiles d'une emprise (bbox).
+    """
+
+    entry = build_tile_file([MEASUREMENTS_FILE], TILES_FILE, TILE_SIZE_DEG)
+    write_tile_index([dict(entry, key=S3_TILES)], TILES_INDEX_FILE, TILE_SIZE_DEG)
+
+    msg = f"Index spatial des mesures : {len(entry['ranges'])} tuiles de {TILE_SIZE_DEG}°"
+    log_memory_usage(msg)
+    print(msg)
+
+    upload_to_s3(TILES_FILE, S3_TILES)
+    upload_to_s3(TILES_INDEX_FILE, S3_TILES_INDEX)
+
+def publish_stats(stats):
+    """
+    Fonction : Écrit et téléverse les tables de statistiques des mesures (par jour, par tuile, par appareil),
+    servies telles quelles par /api/stats, ainsi que l'état cumulable repris par la prochaine actualisation incrémentale.
+
+    Arguments :
+    - stats : statistiques cumulées (StatsAccumulator)
+    """
+
+    STATS_DIR.mkdir(parents=True, exist_ok=True)
+    tables = stats.tables(pd.Timestamp.now(tz="UTC").isoformat())
+    for kind in STATS_KINDS:
+        path_fichier = STATS_DIR / f"{kind}.json"
+        with open(path_fichier, "w", encoding="utf-8") as f:
+            json.dump(tables[kind], f, separators=(",", ":"))
+        upload_to_s3(path_fichier, stats_key(kind), {"ContentType": "application/json"})
+
+    msg = ("Statistiques des mesures : " + ", ".join(f"{len(tables[kind]['rows'])} {kind}" for kind in STATS_KINDS))
+    log_memory_usage(msg)
+    print(msg)
+
+    # L'état est publié en dernier : une actualisation interrompue repart de l'état précédent, cohérent avec les tables
+    path_state = STATS_DIR / "_state.json"
+    with open(path_state, "w", encoding="utf-8") as f:
+        json.dump(stats.state(), f, separators=(",", ":"))
+    upload_to_s3(path_state, STATS_STATE_KEY, {"ContentType": "application/json"})
+
+def publish_lookup_db():
+    """
+    Fonction : Construit et téléverse la base SQLite des recherches par identifiant (mesures d'un appareil, d'un vol
+    ou d'un utilisateur, détails d'un appareil ou d'un vol), téléchargée et interrogée par l'API.
+    """
+
+    compteurs = build_lookup_db({"measurements": MEASUREMENTS_FILE, "devices": DEVICE_FILE,
+                                 "apparatus": APPARATUS_FILE, "flight": FLIGHT_FILE}, LOOKUP_DB_FILE)
+
+    msg = f"Base des recherches : {compteurs}, {os.path.getsize(LOOKUP_DB_FILE)} octets"
+    log_memory_usage(msg)
+    print(msg)
+
+    upload_to_s3(LOOKUP_DB_FILE, LOOKUP_DB_KEY, {"ContentType": "application/vnd.sqlite3"})
+
+def update_lookup_db_s3(paths: dict):
+    """
+    Fonction : Ajoute les nouvelles lignes des tables à la base des recherches du S3 (téléchargée, complétée puis téléversée).
+
+    Arguments :
+    - paths : dictionnaire table -> chemin du fichier JSON des nouvelles lignes
+    """
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+
+    try:
+        s3.download_file(bucket_name, LOOKUP_DB_KEY, str(LOOKUP_DB_FILE), Config=get_transfer_config())
+    except ClientError:
+        msg = "Base des recherches absente, elle sera reconstruite à la prochaine actualisation complète."
+        log_memory_usage(msg)
+        print(msg)
+        return
+
+    compteurs = update_lookup_db(paths, LOOKUP_DB_FILE)
+    msg = f"Base des recherches complétée : {compteurs}"
+    log_memory_usage(msg)
+    print(msg)
+
+    upload_to_s3(LOOKUP_DB_FILE, LOOKUP_DB_KEY, {"ContentType": "application/vnd.sqlite3"})
+
+def update_tile_index_s3(path_delta):
+    """
+    Fonction : Ajoute les nouvelles mesures à l'index spatial. Elles sont réunies avec celles des précédents passages
+    incrémentaux dans un petit fichier trié par tuile, lu avant le fichier de la dernière actualisation complète.
+
+    Arguments :
+    - path_delta : chemin du fichier JSON des nouvelles mesures
+    """
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+
+    try:
+        index = json.loads(s3.get_object(Bucket=bucket_name, Key=S3_TILES_INDEX)["Body"].read())
+    except ClientError:
+        msg = "Index spatial absent, il sera reconstruit à la prochaine actualisation complète."
+        log_memory_usage(msg)
+        print(msg)
+        return
+
+    # Nouvelles mesures d'abord, puis celles des passages incrémentaux précédents
+    paths = [path_delta]
+    if any(entry["key"] == S3_TILES_DELTA for entry in index["files"]):
+        s3.download_file(bucket_name, S3_TILES_DELTA, str(TILES_DELTA_SOURCE_FILE), Config=get_transfer_config())
+        paths.append(TILES_DELTA_SOURCE_FILE)
+
+    entry = build_tile_file(paths, TILES_DELTA_FILE, index["tile_size"])
+    base = [entry for entry in index["files"] if entry["key"] != S3_TILES_DELTA]
+    write_tile_index([dict(entry, key=S3_TILES_DELTA)] + base, TILES_INDEX_FILE, index["tile_size"])
+
+    upload_to_s3(TILES_DELTA_FILE, S3_TILES_DELTA)
+    upload_to_s3(TILES_INDEX_FILE, S3_TILES_INDEX)
+
+def prepend_time_index_s3(path_delta, path_index, path_s3):
+    """
+    Fonction : Met à jour l'index temporel d'une table du S3 après l'ajout de nouvelles lignes à son début.
+
+    Arguments :
+    - path_delta : chemin du fichier JSON des nouvelles lignes
+    - path_index : chemin local de l'index mis à jour
+    - path_s3 : chemin de l'index dans le S3
+    """
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+
+    try:
+        index = json.loads(s3.get_object(Bucket=bucket_name, Key=path_s3)["Body"].read())
+    except ClientError:
+        # Sans ancien index, l'API retombe sur un parcours complet jusqu'à la prochaine actualisation complète
+        msg = f"Index temporel {path_s3} absent, il sera reconstruit à la prochaine actualisation complète."
+        log_memory_usage(msg)
+        print(msg)
+        return
+
+    index = prepend_time_index(build_time_index(path_delta, index["granularity"]), index)
+    with open(path_index, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    upload_to_s3(path_index, path_s3)
+
+def upload_parquet_index(table, index):
+    """
+    Fonction : enregistre et téléverse l'index d'un jeu Parquet (utilisé par l'API pour choisir les partitions à lire).
+    """
+    path_index = PARQUET_DIR / table / "_index.json"
+    path_index.parent.mkdir(parents=True, exist_ok=True)
+    with open(path_index, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    upload_to_s3(path_index, index_key(table))
+
+def publish_parquet(columns: dict, tables=None):
+    """
+    Fonction : Convertit les tables JSON en jeux Parquet (partitions année/mois pour les mesures) et les téléverse,
+    puis supprime du S3 les fichiers de partitions qui n'existent plus.
+
+    Arguments :
+    - columns : profil des colonnes (types de la lecture du JSON)
+    - tables (par défaut : None) : dictionnaire table -> fichier JSON local (par défaut les cinq tables)
+    """
+
+    if tables is None:
+        tables = PARQUET_TABLES
+    dtypes = profile_dtypes(columns)
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+
+    for table, path_fichier in tables.items():
+        schema, files = write_parquet_table(path_fichier, table, dtypes, PARQUET_DIR, CHUNK_ROWS)
+        if schema is None:
+            continue # Table vide
+        index = build_index(table, schema, files)
+
+        msg = f"Jeu Parquet {table} : {len(files)} fichier(s), {sum(f['size'] for f in index['files'])} octets"
+        log_memory_usage(msg)
+        print(msg)
+
+        for f, entry in zip(files, index["files"]):
+            upload_to_s3(f["path"], entry["key"])
+        upload_parquet_index(table, index)
+
+        # Partitions d'une précédente actualisation qui n'existent plus
+        cles = {entry["key"] for entry in index["files"]} | {index_key(table)}
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket_name, Prefix=f"{PARQUET_PREFIX}/{table}/"):
+            for objet in page.get("Contents", []):
+                if objet["Key"] not in cles:
+                    s3.delete_object(Bucket=bucket_name, Key=objet["Key"])
+
+def update_parquet_s3(columns: dict, table, path_delta):
+    """
+    Fonction : Ajoute les nouvelles lignes d'une table des mesures à son jeu Parquet : seules les partitions
+    (mois) qui reçoivent des lignes sont téléchargées, réécrites et téléversées.
+
+    Arguments :
+    - columns : profil des colonnes (types de la lecture du JSON)
+    - table : nom de la table
+    - path_delta : chemin du fichier JSON des nouvelles lignes
+    """
+
+    # Client du S3 d'AWS
+    s3 = get_s3_client()
+
+    try:
+        index = json.loads(s3.get_object(Bucket=bucket_name, Key=index_key(table))["Body"].read())
+    except ClientError:
+        msg = f"Jeu Parquet {table} absent, il sera reconstruit à la prochaine actualisation complète."
+        log_memory_usage(msg)
+        print(msg)
+        return
+
+    schema, files = write_parquet_table(path_delta, table, profile_dtypes(columns), PARQUET_DELTA_DIR, CHUNK_ROWS)
+    entries = {entry["partition"]: entry for entry in index["files"]}
+    for f in files:
+        key = f"{PARQUET_PREFIX}/{partition_path(table, f['partition'])}"
+        path_out = PARQUET_DIR / partition_path(table, f["partition"])
+        path_out.parent.mkdir(parents=True, exist_ok=True)
+
+        # Partition déjà publiée : nouvelles lignes devant les anciennes
+        if f["partition"] in entries:
+            path_old = Path(f["path"]).with_name("old.parquet")
+            s3.download_file(bucket_name, key, str(path_old), Config=get_transfer_config())
+            rows = prepend_rows(f["path"], path_old, path_out)
+        else:
+            Path(f["path"]).replace(path_out)
+            rows = f["rows"]
+
+        upload_to_s3(path_out, key)
+        entries[f["partition"]] = {"partition": f["partition"], "key": key, "rows": rows, "size": os.path.getsize(path_out)}
+
+    index["files"] = sorted(entries.values(), key=lambda entry: entry["partition"] or "", reverse=True)
+    upload_parquet_index(table, index)
+
+def refresh_full(source=SOURCE_FILE, profile=None):
+    """
+    Fonction : Actualisation complète : découpe le fichier brut en une seule lecture puis publie toutes les tables
+
+    Arguments :
+    - source (par défaut : SOURCE_FILE) : chemin local du fichier JSON brut
+    - profile (par défaut : None) : profil des colonnes du fichier (calculé s'il est absent ou ne correspond pas)
+    """
+
+    profile = ensure_profile(source, profile)
+    watermark = {"max_date": None, "recent": {}}
+    stats = StatsAccumulator(TILE_SIZE_DEG) if STATS_MODE else None
+
+    # Table détaillée reconstruite par l'API : écrite sans les colonnes des appareils et des vols
+    # (et en entier seulement pour son jeu Parquet)
+    outputs, join = None, None
+    if JOIN_MODE:
+        join = JoinEncoder(read_join_s3(get_s3_client(), bucket_name))
+        outputs = {"measurements": MEASUREMENTS_FILE, "devices": DEVICE_FILE, "apparatus": APPARATUS_FILE,
+                   "flight": FLIGHT_FILE, CORE_TABLE: CORE_FILE}
+        if PARQUET_MODE:
+            outputs["openradiation"] = ALL_FILE
+
+    with serialize_pool() as processes:
+        compteurs = split_tables_streaming(source, profile, outputs=outputs, watermark=watermark, stats=stats,
+                                           executor=processes, join=join)
+
+    # Téléversement dans le S3 (les publications sont indépendantes les unes des autres)
+    tables = [(MEASUREMENTS_FILE, S3_MEASUREMENTS), (DEVICE_FILE, S3_DEVICE), (APPARATUS_FILE, S3_APPARATUS), (FLIGHT_FILE, S3_FLIGHT)]
+    if join is None:
+        tables.insert(0, (ALL_FILE, S3_OBJECT_NAME))
+    tasks = [(publish_table, path_fichier, path_s3) for path_fichier, path_s3 in tables]
+    if join is not None:
+        tasks.insert(0, (publish_core, join))
+    tasks += [(publish_time_indexes, join is None), (publish_tile_index,)]
+    if stats is not None:
+        tasks.append((publish_stats, stats))
+    if LOOKUP_DB_MODE:
+        tasks.append((publish_lookup_db,))
+    if PARQUET_MODE:
+        tasks += [(publish_parquet, profile["columns"], {table: path_fichier}) for table, path_fichier in PARQUET_TABLES.items()]
+    run_parallel(tasks)
+    remove_other_detailed(join is not None)
+
+    # Manifeste pour les prochaines actualisations incrémentales, une fois tout publié
+    save_manifest(profile["columns"], watermark, compteurs["openradiation"],
+                  pd.Timestamp.now(tz="UTC").isoformat())
+
+def refresh_legacy(df, profile=None):
+    """
+    Fonction : Actualisation sans streaming : crée les tables à partir du DataFrame complet puis les publie
+
+    Arguments :
+    - df : DataFrame contenant toutes les mesures (voir read_json_s3)
+    - profile (par défaut : None) : profil des colonnes (pour les jeux Parquet, qui ne sont pas créés sans lui)
+    """
 
     print(df.head())
 
@@ -203,16 +1064,161 @@ if __name__=="__main__":
     print("Les cinq premières lignes pour les appareils de mesures : ", df_apparatus.head())
     print("Les cinq premières lignes pour les vols : ", df_flight.head())
 
-    # Conversion vers le JSON de ces différentes tables
-    chemin_measure = convert_to_json(df_measure, MEASUREMENTS_FILE)
-    chemin_device = convert_to_json(df_device, DEVICE_FILE)
-    chemin_apparatus = convert_to_json(df_apparatus, APPARATUS_FILE)
-    chemin_flight = convert_to_json(df_flight, FLIGHT_FILE)
-    chemin_all = convert_to_json(df, ALL_FILE)
-    
-    # Téléversement dans le S3
-    upload_to_s3(MEASUREMENTS_FILE, S3_MEASUREMENTS)
-    upload_to_s3(DEVICE_FILE, S3_DEVICE)
-    upload_to_s3(APPARATUS_FILE, S3_APPARATUS)
-    upload_to_s3(FLIGHT_FILE, S3_FLIGHT)
-    upload_to_s3(ALL_FILE, S3_OBJECT_NAME)
\ No newline at end of file
+    stats = None
+    if STATS_MODE:
+        stats = StatsAccumulator(TILE_SIZE_DEG)
+        stats.add(df_measure)
+
+    # Table détaillée reconstruite par l'API : écrite sans les colonnes des appareils et des vols
+    join = None
+    if JOIN_MODE:
+        join = JoinEncoder(read_join_s3(get_s3_client(), bucket_name))
+        with open(CORE_FILE, "w", encoding="utf-8") as f:
+            for debut in range(0, len(df), CHUNK_ROWS):
+                tranche = df.iloc[debut:debut + CHUNK_ROWS]
+                f.write(core_jsonl(tranche, join.add(tranche)))
+
+    # Conversion vers le JSON de ces différentes tables (les tranches dans le groupe de processus, les plus grandes
+    # tables d'abord) et téléversement de chacune dès qu'elle est écrite
+    exports = [(df_measure, MEASUREMENTS_FILE, S3_MEASUREMENTS), (df_device, DEVICE_FILE, S3_DEVICE),
+               (df_apparatus, APPARATUS_FILE, S3_APPARATUS), (df_flight, FLIGHT_FILE, S3_FLIGHT)]
+    if join is None:
+        exports.insert(0, (df, ALL_FILE, S3_OBJECT_NAME))
+    with serialize_pool() as processes:
+        tasks = [(export_table, table, path_fichier, path_s3, processes) for table, path_fichier, path_s3 in exports]
+        if join is not None and PARQUET_MODE and profile is not None:
+            # La table détaillée entière n'est écrite que pour son jeu Parquet
+            tasks.insert(0, (convert_to_json, df, ALL_FILE, processes))
+        run_parallel(tasks)
+
+    # Publications construites à partir des fichiers écrits (indépendantes les unes des autres)
+    tasks = [(publish_variants, path_fichier, path_s3) for table, path_fichier, path_s3 in exports]
+    if join is not None:
+        tasks.insert(0, (publish_core, join))
+    tasks += [(publish_time_indexes, join is None), (publish_tile_index,)]
+    if stats is not None:
+        tasks.append((publish_stats, stats))
+    if LOOKUP_DB_MODE:
+        tasks.append((publish_lookup_db,))
+    if PARQUET_MODE and profile is not None:
+        tasks += [(publish_parquet, profile["columns"], {table: path_fichier}) for table, path_fichier in PARQUET_TABLES.items()]
+    run_parallel(tasks)
+    remove_other_detailed(join is not None)
+
+def refresh_incremental(profile, manifest, source=None):
+    """
+    Fonction : Actualisation incrémentale : découpe seulement les nouvelles lignes puis les fusionne avec les tables du S3
+
+    Arguments :
+    - profile : profil des nouvelles lignes (généré par actualisation_donnees.py en mode incrémental)
+    - manifest : manifeste de l'actualisation précédente
+    - source (par défaut : None) : chemin local des nouvelles lignes (téléchargées du S3 si absent)
+    """
+
+    if manifest is None or manifest["max_date"] != profile.get("watermark"):
+        raise RuntimeError("Le manifeste ne correspond pas aux nouvelles lignes, relancer une actualisation complète.")
+
+    # Les nouvelles lignes sont écrites avec les types de l'ensemble des données publiées
+    columns = merge_profiles(manifest["columns"], profile["columns"])
+    watermark = {"max_date": manifest["max_date"], "recent": dict(manifest["recent"])}
+
+    # Les statistiques publiées sont complétées avec les nouvelles mesures (sans état publié, elles attendent la prochaine actualisation complète)
+    stats = None
+    if STATS_MODE:
+        state = read_state_s3(get_s3_client(), bucket_name)
+        if state is not None:
+            stats = StatsAccumulator(TILE_SIZE_DEG, state)
+        else:
+            msg = "Pas d'état des statistiques dans le S3 : elles seront calculées à la prochaine actualisation complète."
+            log_memory_usage(msg)
+            print(msg)
+
+    # La table détaillée garde la forme publiée par la dernière actualisation complète : sans les colonnes des appareils
+    # et des vols si des références sont publiées (les nouvelles lignes complètent alors ces références)
+    join, outputs = None, dict(DELTA_FILES)
+    state = read_join_s3(get_s3_client(), bucket_name)
+    if state is not None:
+        join = JoinEncoder(state)
+        if not PARQUET_MODE:
+            del outputs["openradiation"]
+    else:
+        del outputs[CORE_TABLE]
+
+    if source is None:
+        source = download_json_s3(DELTA_SOURCE_FILE, S3_DELTA_NAME)
+    with serialize_pool() as processes:
+        compteurs = split_tables_streaming(source, {"rows": profile["rows"], "columns": columns},
+                                           outputs=outputs, watermark=watermark, stats=stats, executor=processes, join=join)
+    if join is not None and join.restarted:
+        raise RuntimeError("Les colonnes de la table détaillée ont changé, relancer une actualisation complète.")
+
+    # Téléversement des seules parties modifiées
+    if compteurs["openradiation"]:
+        prepend_to_s3(DELTA_FILES["measurements"], S3_MEASUREMENTS)
+        publish_variants(DELTA_FILES["measurements"], S3_MEASUREMENTS, prepend=True)
+        prepend_time_index_s3(DELTA_FILES["measurements"], MEASUREMENTS_INDEX_FILE, S3_MEASUREMENTS_INDEX)
+        if join is not None:
+            publish_core(join, prepend=True)
+        else:
+            prepend_to_s3(DELTA_FILES["openradiation"], S3_OBJECT_NAME)
+            publish_variants(DELTA_FILES["openradiation"], S3_OBJECT_NAME, prepend=True)
+            prepend_time_index_s3(DELTA_FILES["openradiation"], ALL_INDEX_FILE, S3_OBJECT_INDEX)
+        update_tile_index_s3(DELTA_FILES["measurements"])
+        if PARQUET_MODE:
+            update_parquet_s3(columns, "measurements", DELTA_FILES["measurements"])
+            update_parquet_s3(columns, "openradiation", DELTA_FILES["openradiation"])
+        if stats is not None:
+            publish_stats(stats)
+    if compteurs["devices"]:
+        merge_dimension_s3(DELTA_FILES["devices"], S3_DEVICE, "deviceUuid", DEVICE_FILE)
+    if compteurs["apparatus"]:
+        merge_dimension_s3(DELTA_FILES["apparatus"], S3_APPARATUS, "apparatusId", APPARATUS_FILE)
+    if compteurs["flight"]:
+        merge_dimension_s3(DELTA_FILES["flight"], S3_FLIGHT, "flightId", FLIGHT_FILE)
+
+    # Base des recherches : nouvelles mesures et nouveaux appareils ou vols (ceux déjà présents sont ignorés)
+    if LOOKUP_DB_MODE and any(compteurs[name] for name in ("measurements", "devices", "apparatus", "flight")):
+        update_lookup_db_s3({name: DELTA_FILES[name] for name in ("measurements", "devices", "apparatus", "flight")})
+
+    # Les tables des appareils et des vols sont petites : leur jeu Parquet est réécrit à partir de la table fusionnée
+    if PARQUET_MODE:
+        publish_parquet(columns, {name: path for name, path, n in (("devices", DEVICE_FILE, compteurs["devices"]),
+                                                                   ("apparatus", APPARATUS_FILE, compteurs["apparatus"]),
+                                                                   ("flight", FLIGHT_FILE, compteurs["flight"])) if n})
+
+    save_manifest(columns, watermark, manifest["rows"] + compteurs["openradiation"], manifest["last_full_refresh"])
+
+#########################################################################################
+
+# Application des différentes étapes
+if __name__=="__main__" and UNCHANGED_FLAG.exists():
+
+    # actualisation_donnees.py n'a trouvé aucune nouvelle donnée en amont
+    msg = "Aucune nouvelle donnée, les tables ne sont pas recalculées."
+    log_memory_usage(msg)
+    print(msg)
+    sys.exit(0)
+
+if __name__=="__main__" and STREAMING_MODE:
+
+    profile = read_profile_s3()
+
+    # Seules les nouvelles lignes ont été préparées par actualisation_donnees.py
+    if profile is not None and profile.get("mode") == "incremental":
+        refresh_incremental(profile, load_manifest())
+
+    else:
+        # Téléchargement du fichier brut, découpage en une seule lecture et publication
+        download_json_s3()
+        refresh_full(SOURCE_FILE, profile)
+
+    # Le fichier en amont est marqué comme traité seulement une fois tout publié
+    save_download_state_s3()
+
+elif __name__=="__main__":
+
+    # Lecture des données, création et publication des tables
+    refresh_legacy(read_json_s3(), read_profile_s3())
+
+    # Le fichier en amont est marqué comme traité seulement une fois tout publié
+    save_download_state_s3()
@@ -0,0 +1,202 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Index spatial (grille de tuiles latitude/longitude -> positions en octets) des mesures
+###################-
+
+# Chargement des librairies
+import re
+import math
+import json
+from array import array
+
+# Position d'une mesure, lue directement dans la ligne JSON (sans la décoder)
+LATITUDE_PATTERN = re.compile(rb'"latitude":(-?[0-9][0-9.eE+-]*)')
+LONGITUDE_PATTERN = re.compile(rb'"longitude":(-?[0-9][0-9.eE+-]*)')
+
+def extract_position(line: bytes):
+    """
+    Fonction : récupère la latitude et la longitude d'une ligne JSON sans la décoder entièrement.
+
+    Arguments :
+    - line : la ligne JSON (en octets)
+
+    Renvoie :
+    - (latitude, longitude) : la position, ou None si elle est absente ou invalide
+    """
+    lat = LATITUDE_PATTERN.search(line)
+    lon = LONGITUDE_PATTERN.search(line)
+    if not lat or not lon:
+        return None
+    lat, lon = float(lat.group(1)), float(lon.group(1))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+def tile_of(lat, lon, tile_size):
+    """
+    Fonction : numéro de la tuile de la grille contenant une position (les tuiles sont numérotées ligne par ligne,
+    du sud au nord puis d'ouest en est, pour que les tuiles voisines d'une même ligne soient contiguës dans le fichier).
+
+    Arguments :
+    - lat, lon : la position
+    - tile_size : taille d'une tuile en degrés
+
+    Renvoie :
+    - tile : numéro de la tuile
+    """
+    nb_colonnes = math.ceil(360 / tile_size)
+    ligne = min(int((lat + 90) // tile_size), math.ceil(180 / tile_size) - 1)
+    colonne = min(int((lon + 180) // tile_size), nb_colonnes - 1)
+    return ligne * nb_colonnes + colonne
+
+def tile_bounds(tile, tile_size):
+    """
+    Fonction : emprise (min_lon, min_lat, max_lon, max_lat) d'une tuile de la grille.
+    """
+    nb_colonnes = math.ceil(360 / tile_size)
+    ligne, colonne = divmod(tile, nb_colonnes)
+    min_lat = ligne * tile_size - 90
+    min_lon = colonne * tile_size - 180
+    return min_lon, min_lat, min_lon + tile_size, min_lat + tile_size
+
+def build_tile_file(paths, path_out, tile_size=1.0):
+    """
+    Fonction : réécrit des fichiers JSON de mesures triés par tuile de la grille (l'ordre d'origine, par date
+    décroissante, est conservé à l'intérieur de chaque tuile) et renvoie les intervalles d'octets de chaque tuile.
+    Seuls les numéros de tuile et les positions des lignes sont gardés en mémoire (quelques octets par ligne).
+
+    Arguments :
+    - paths : chemins des fichiers JSON à réunir, dans l'ordre
+    - path_out : chemin du fichier trié par tuile
+    - tile_size (par défaut : 1.0) : taille d'une tuile en degrés
+
+    Renvoie :
+    - entry : dictionnaire {"size", "ranges": {tuile: [début, fin]}} décrivant le fichier écrit
+    """
+    import numpy as np
+
+    # Premier passage : tuile, fichier, position et longueur de chaque ligne
+    tiles, sources, offsets, lengths = array("i"), array("b"), array("q"), array("I")
+    for numero, path in enumerate(paths):
+        offset = 0
+        with open(path, "rb") as f:
+            for line in f:
+                position = extract_position(line) if line.strip() else None
+                if position is not None:
+                    tiles.append(tile_of(position[0], position[1], tile_size))
+                    sources.append(numero)
+                    offsets.append(offset)
+                    lengths.append(len(line))
+                offset += len(line)
+
+    # Tri stable par tuile, puis second passage pour écrire les lignes dans cet ordre
+    tiles = np.frombuffer(tiles, dtype=np.int32)
+    ordre = np.argsort(tiles, kind="stable")
+    ranges = {}
+    fichiers = [open(path, "rb") for path in paths]
+    try:
+        with open(path_out, "wb") as out:
+            position = 0
+            for i in ordre:
+                f = fichiers[sources[i]]
+                f.seek(offsets[i])
+                line = f.read(lengths[i])
+                if not line.endswith(b"\n"):
+                    line += b"\n"
+                out.write(line)
+                tile = str(int(tiles[i]))
+                if tile in ranges:
+                    ranges[tile][1] = position + len(line)
+                else:
+                    ranges[tile] = [position, position + len(line)]
+                position += len(line)
+    finally:
+        for f in fichiers:
+            f.close()
+
+    return {"size": position, "ranges": ranges}
+
+def write_tile_index(files, path_index, tile_size=1.0):
+    """
+    Fonction : enregistre l'index spatial : taille des tuiles et, pour chaque fichier trié par tuile
+    (nouvelles mesures d'abord), sa taille et les intervalles d'octets de ses tuiles.
+
+    Arguments :
+    - files : liste de dictionnaires {"key": chemin dans le S3, "size", "ranges"}
+    - path_index : chemin du fichier de l'index
+    - tile_size (par défaut : 1.0) : taille d'une tuile en degrés
+
+    Renvoie :
+    - index : l'index enregistré
+    """
+    index = {"tile_size": tile_size, "files": files}
+    with open(path_index, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    return index
+
+def parse_bbox(value):
+    """
+    Fonction : lit une emprise "min_lon,min_lat,max_lon,max_lat" (min_lon > max_lon si elle traverse l'antiméridien).
+
+    Renvoie :
+    - bbox : tuple (min_lon, min_lat, max_lon, max_lat)
+
+    Lève :
+    - ValueError si l'emprise est invalide
+    """
+    bbox = tuple(float(v) for v in value.split(","))
+    if len(bbox) != 4:
+        raise ValueError("bbox attend 4 valeurs")
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox hors limites")
+    return bbox
+
+def in_bbox(position, bbox):
+    """
+    Fonction : indique si une position (latitude, longitude) est dans l'emprise donnée.
+    """
+    if position is None:
+        return False
+    lat, lon = position
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if not min_lat <= lat <= max_lat:
+        return False
+    if min_lon <= max_lon:
+        return min_lon <= lon <= max_lon
+    return lon >= min_lon or lon <= max_lon # Emprise traversant l'antiméridien
+
+def ranges_for_bbox(entry, bbox, tile_size):
+    """
+    Fonction : intervalles d'octets d'un fichier trié par tuile à lire pour couvrir une emprise.
+
+    Arguments :
+    - entry : description du fichier dans l'index ({"size", "ranges"})
+    - bbox : emprise (min_lon, min_lat, max_lon, max_lat)
+    - tile_size : taille d'une tuile en degrés
+
+    Renvoie :
+    - ranges : liste triée d'intervalles [début, fin[ fusionnés quand ils se touchent
+    """
+
+    min_lon, min_lat, max_lon, max_lat = bbox
+    selection = []
+    for tile, intervalle in entry["ranges"].items():
+        t_min_lon, t_min_lat, t_max_lon, t_max_lat = tile_bounds(int(tile), tile_size)
+        if t_max_lat < min_lat or t_min_lat > max_lat:
+            continue
+        if min_lon <= max_lon:
+            touche = t_max_lon >= min_lon and t_min_lon <= max_lon
+        else:
+            touche = t_max_lon >= min_lon or t_min_lon <= max_lon
+        if touche:
+            selection.append(intervalle)
+
+    ranges = []
+    for start, end in sorted(selection):
+        if ranges and ranges[-1][1] >= start:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    return ranges
@@ -0,0 +1,198 @@
+###################-
+# Auteur : Julien RENOULT
+# Date : 17/10/2026
+# Sujet : Index temporel (date -> positions en octets) des fichiers JSON des mesures
+###################-
+
+# Chargement des librairies
+import re
+import json
+import datetime
+
+# Granularité de l'index : "day" (AAAA-MM-JJ) ou "month" (AAAA-MM), et complément pour obtenir le début de la période
+GRANULARITIES = {"day": 10, "month": 7}
+PERIOD_START = {"day": "T00:00:00", "month": "-01T00:00:00"}
+
+# Date de création d'une mesure, lue directement dans la ligne JSON (sans la décoder)
+DATE_PATTERN = re.compile(rb'"dateAndTimeOfCreation":"([^"]*)"')
+
+def extract_date(line: bytes):
+    """
+    Fonction : récupère la date de création d'une ligne JSON sans la décoder entièrement.
+
+    Arguments :
+    - line : la ligne JSON (en octets)
+
+    Renvoie :
+    - date : la date au format texte (ex : "2025-08-09T10:20:30.000Z") ou None si absente
+    """
+    match = DATE_PATTERN.search(line)
+    return match.group(1).decode("ascii") if match else None
+
+def add_range(ranges: list, start: int, end: int):
+    """
+    Fonction : ajoute l'intervalle d'octets [start, end[ à une liste d'intervalles, en le fusionnant avec le dernier s'ils se touchent.
+    """
+    if ranges and ranges[-1][1] == start:
+        ranges[-1][1] = end
+    else:
+        ranges.append([start, end])
+
+def build_time_index(path, granularity="day"):
+    """
+    Fonction : construit l'index temporel d'un fichier JSON (une mesure par ligne) : pour chaque jour (ou mois),
+    les intervalles d'octets des lignes correspondantes. Les données étant triées par date décroissante,
+    chaque jour tient en général en un seul intervalle.
+
+    Arguments :
+    - path : chemin du fichier JSON
+    - granularity (par défaut : "day") : "day" ou "month"
+
+    Renvoie :
+    - index : dictionnaire {"granularity", "size", "sorted_desc", "ranges": {clé: [[début, fin], ...]}}
+    """
+
+    longueur = GRANULARITIES[granularity]
+    ranges = {}
+    offset = 0
+    sorted_desc = True
+    precedente = None
+
+    with open(path, "rb") as f:
+        for line in f:
+            start, offset = offset, offset + len(line)
+            if not line.strip():
+                continue
+
+            date = extract_date(line)
+            cle = date[:longueur] if date else ""
+            add_range(ranges.setdefault(cle, []), start, offset)
+
+            # Ordre décroissant vérifié au passage (permet d'arrêter un parcours dès la première date trop ancienne)
+            if date:
+                if precedente is not None and date > precedente:
+                    sorted_desc = False
+                precedente = date
+
+    return {"granularity": granularity, "size": offset, "sorted_desc": sorted_desc, "ranges": ranges}
+
+def write_time_index(path, path_index, granularity="day"):
+    """
+    Fonction : construit et enregistre l'index temporel d'un fichier JSON.
+
+    Arguments :
+    - path : chemin du fichier JSON
+    - path_index : chemin du fichier de l'index
+    - granularity (par défaut : "day") : "day" ou "month"
+
+    Renvoie :
+    - index : l'index construit
+    """
+    index = build_time_index(path, granularity)
+    with open(path_index, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    return index
+
+def prepend_time_index(delta: dict, index: dict):
+    """
+    Fonction : index d'un fichier obtenu en ajoutant des lignes au début d'un fichier déjà indexé.
+    Les intervalles de l'ancien index sont décalés de la taille des nouvelles lignes.
+
+    Arguments :
+    - delta : index des nouvelles lignes
+    - index : index de l'ancien fichier
+
+    Renvoie :
+    - merged : index du fichier complet
+    """
+
+    decalage = delta["size"]
+    ranges = {cle: [list(r) for r in intervalles] for cle, intervalles in delta["ranges"].items()}
+    for cle, intervalles in index["ranges"].items():
+        cible = ranges.setdefault(cle, [])
+        for start, end in intervalles:
+            add_range(cible, start + decalage, end + decalage)
+
+    # Le fichier reste trié si la dernière date des nouvelles lignes n'est pas antérieure à la première des anciennes
+    cles_delta = [cle for cle in delta["ranges"] if cle]
+    cles_index = [cle for cle in index["ranges"] if cle]
+    sorted_desc = delta["sorted_desc"] and index["sorted_desc"] and \
+        (not cles_delta or not cles_index or min(cles_delta) >= max(cles_index))
+
+    return {"granularity": index["granularity"], "size": decalage + index["size"],
+            "sorted_desc": sorted_desc, "ranges": ranges}
+
+def parse_date_bounds(date_from=None, date_to=None):
+    """
+    Fonction : convertit les bornes d'une requête (date "AAAA-MM-JJ" ou date et heure ISO) en bornes comparables
+    directement aux dates des lignes JSON (texte "AAAA-MM-JJTHH:MM:SS", en UTC).
+    Une date seule en borne supérieure inclut toute la journée.
+
+    Arguments :
+    - date_from (par défaut : None) : borne inférieure incluse
+    - date_to (par défaut : None) : borne supérieure incluse
+
+    Renvoie :
+    - (lower, upper) : borne inférieure incluse et borne supérieure exclue (None si absente)
+
+    Lève :
+    - ValueError si une date n'est pas au format ISO
+    """
+
+    def to_utc(value):
+        date = datetime.datetime.fromisoformat(value)
+        if date.tzinfo is not None:
+            date = date.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return date
+
+    lower = upper = None
+    if date_from:
+        lower = to_utc(date_from).strftime("%Y-%m-%dT%H:%M:%S")
+    if date_to:
+        fin = to_utc(date_to)
+        # Date seule : jusqu'à la fin de la journée, sinon jusqu'à la seconde indiquée
+        fin += datetime.timedelta(days=1) if len(date_to) <= 10 else datetime.timedelta(seconds=1)
+        upper = fin.strftime("%Y-%m-%dT%H:%M:%S")
+    return lower, upper
+
+def in_bounds(date, lower, upper):
+    """
+    Fonction : indique si une date de mesure (texte ISO) est comprise dans les bornes données par parse_date_bounds.
+    """
+    if date is None:
+        return False
+    date = date[:19]
+    return (lower is None or date >= lower) and (upper is None or date < upper)
+
+def ranges_for_window(index: dict, lower=None, upper=None):
+    """
+    Fonction : intervalles d'octets du fichier à lire pour couvrir une fenêtre de dates.
+
+    Arguments :
+    - index : index temporel du fichier
+    - lower (par défaut : None) : borne inférieure incluse (voir parse_date_bounds)
+    - upper (par défaut : None) : borne supérieure exclue (voir parse_date_bounds)
+
+    Renvoie :
+    - ranges : liste triée d'intervalles [début, fin[ fusionnés quand ils se touchent
+    """
+
+    longueur = GRANULARITIES[index["granularity"]]
+    complement = PERIOD_START[index["granularity"]]
+    debut = lower[:longueur] if lower else None
+
+    selection = []
+    for cle, intervalles in index["ranges"].items():
+        if not cle:
+            continue # Lignes sans date : jamais dans une fenêtre de dates
+        # La période doit finir après la borne inférieure et commencer avant la borne supérieure
+        if (debut is None or cle >= debut) and (upper is None or cle + complement < upper):
+            selection.extend(intervalles)
+
+    ranges = []
+    for start, end in sorted(selection):
+        if ranges and ranges[-1][1] >= start:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    return ranges